@@ -26,6 +26,84 @@ def create_app():
     # Set upload folder configuration
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
 
+    # SMS audit logging: 'sync' commits every row, 'write_behind' batches them
+    app.config['SMS_LOG_MODE'] = os.environ.get('SMS_LOG_MODE', 'sync')
+    app.config['SMS_LOG_BATCH_SIZE'] = int(os.environ.get('SMS_LOG_BATCH_SIZE', 200))
+    app.config['SMS_LOG_FLUSH_INTERVAL_MS'] = int(os.environ.get('SMS_LOG_FLUSH_INTERVAL_MS', 250))
+    app.config['SMS_LOG_MAX_BUFFER'] = int(os.environ.get('SMS_LOG_MAX_BUFFER', 5000))
+
+    # Outbound SMS: 'off' records replies only, 'queue' dispatches them through SMS_GATEWAY
+    app.config['SMS_DISPATCH_MODE'] = os.environ.get('SMS_DISPATCH_MODE', 'off')
+    app.config['SMS_DISPATCH_WORKERS'] = int(os.environ.get('SMS_DISPATCH_WORKERS', 2))
+    app.config['SMS_DISPATCH_BATCH_SIZE'] = int(os.environ.get('SMS_DISPATCH_BATCH_SIZE', 100))
+    app.config['SMS_DISPATCH_POLL_INTERVAL_MS'] = int(os.environ.get('SMS_DISPATCH_POLL_INTERVAL_MS', 500))
+    app.config['SMS_DISPATCH_MAX_ATTEMPTS'] = int(os.environ.get('SMS_DISPATCH_MAX_ATTEMPTS', 5))
+    app.config['SMS_GATEWAY'] = os.environ.get('SMS_GATEWAY', 'log')
+    app.config['SMS_GATEWAY_URL'] = os.environ.get('SMS_GATEWAY_URL')
+    app.config['SMS_GATEWAY_API_KEY'] = os.environ.get('SMS_GATEWAY_API_KEY')
+
+    # Registered-user counter used in welcome SMS: full recount at most this often
+    app.config['USER_COUNT_RECONCILE_S'] = int(os.environ.get('USER_COUNT_RECONCILE_S', 300))
+
+    # Town gazetteer: in-memory reload interval and minimum similarity for fuzzy town matches
+    app.config['LOCATION_REFRESH_S'] = int(os.environ.get('LOCATION_REFRESH_S', 300))
+    app.config['LOCATION_FUZZY_THRESHOLD'] = float(os.environ.get('LOCATION_FUZZY_THRESHOLD', 0.45))
+    # Match area: 'town' searches the named town, 'radius' every town within match_radius_km (admin setting)
+    app.config['MATCH_LOCATION_MODE'] = os.environ.get('MATCH_LOCATION_MODE', 'town')
+    # Radius search: 'grid' in memory, or 'earthdistance' / 'postgis' in Postgres when the extension is installed
+    app.config['GEO_BACKEND'] = os.environ.get('GEO_BACKEND', 'grid')
+
+    # Match candidate index: 'memory' answers searches in-process, 'off' queries users every time
+    app.config['CANDIDATE_INDEX_MODE'] = os.environ.get('CANDIDATE_INDEX_MODE', 'memory')
+    app.config['CANDIDATE_INDEX_REFRESH_S'] = int(os.environ.get('CANDIDATE_INDEX_REFRESH_S', 60))
+    # Match ordering: 'compatibility' ranks candidates best first, 'recent' keeps newest first
+    app.config['MATCH_RANKING'] = os.environ.get('MATCH_RANKING', 'compatibility')
+    app.config['MATCH_RANKING_REFRESH_S'] = int(os.environ.get('MATCH_RANKING_REFRESH_S', 300))
+
+    # Shared search results per (gender, age range, town): lifetime and number kept (0 disables)
+    app.config['CANDIDATE_CACHE_TTL_S'] = int(os.environ.get('CANDIDATE_CACHE_TTL_S', 120))
+    app.config['CANDIDATE_CACHE_SIZE'] = int(os.environ.get('CANDIDATE_CACHE_SIZE', 1000))
+
+    # Profiles already shown to each user, skipped by new MATCH# searches: 'bloom' or 'off'
+    app.config['SEEN_SET_MODE'] = os.environ.get('SEEN_SET_MODE', 'bloom')
+    app.config['SEEN_SET_CAPACITY'] = int(os.environ.get('SEEN_SET_CAPACITY', 256))
+    app.config['SEEN_SET_ERROR_RATE'] = float(os.environ.get('SEEN_SET_ERROR_RATE', 0.01))
+    app.config['SEEN_SET_CACHE_SIZE'] = int(os.environ.get('SEEN_SET_CACHE_SIZE', 10000))
+    app.config['SEEN_SET_CACHE_TTL_S'] = float(os.environ.get('SEEN_SET_CACHE_TTL_S', 60))
+
+    # Candidate counts by gender/town/age behind match previews and COUNT: full recount at most this often
+    app.config['DEMOGRAPHICS_RECONCILE_S'] = int(os.environ.get('DEMOGRAPHICS_RECONCILE_S', 300))
+
+    # Recent gateway message IDs kept in memory for duplicate webhook detection
+    app.config['SMS_DEDUP_CACHE_SIZE'] = int(os.environ.get('SMS_DEDUP_CACHE_SIZE', 10000))
+    # Seconds after which a gateway message claimed but never answered may be processed again
+    app.config['SMS_DEDUP_CLAIM_LEASE_S'] = int(os.environ.get('SMS_DEDUP_CLAIM_LEASE_S', 300))
+
+    # Gateway bulk callbacks (/api/sms/process-batch)
+    app.config['SMS_BATCH_MAX_SIZE'] = int(os.environ.get('SMS_BATCH_MAX_SIZE', 500))
+    app.config['SMS_BATCH_WORKERS'] = int(os.environ.get('SMS_BATCH_WORKERS', 4))
+
+    # Web client swipe batches (/api/matching/swipes)
+    app.config['SWIPE_BATCH_MAX_SIZE'] = int(os.environ.get('SWIPE_BATCH_MAX_SIZE', 100))
+
+    # Inbound processing lanes: 'off' (in the request thread), 'thread' or 'process'
+    app.config['SMS_ENGINE_MODE'] = os.environ.get('SMS_ENGINE_MODE', 'off')
+    app.config['SMS_ENGINE_LANES'] = int(os.environ.get('SMS_ENGINE_LANES', 4))
+    app.config['SMS_ENGINE_TIMEOUT_S'] = float(os.environ.get('SMS_ENGINE_TIMEOUT_S', 30))
+
+    # Unanswered interest expiry: 'off' (run handle_expired_interests manually) or 'schedule'
+    app.config['INTEREST_EXPIRY_MODE'] = os.environ.get('INTEREST_EXPIRY_MODE', 'off')
+    app.config['INTEREST_EXPIRY_INTERVAL_S'] = float(os.environ.get('INTEREST_EXPIRY_INTERVAL_S', 60))
+    app.config['INTEREST_EXPIRY_CHUNK_SIZE'] = int(os.environ.get('INTEREST_EXPIRY_CHUNK_SIZE', 500))
+
+    # Precomputed recommendation decks: 'off', or rebuilt by a background 'thread' or 'process' pool
+    app.config['DECK_BUILDER_MODE'] = os.environ.get('DECK_BUILDER_MODE', 'off')
+    app.config['DECK_SIZE'] = int(os.environ.get('DECK_SIZE', 200))
+    app.config['DECK_BUILDER_INTERVAL_S'] = float(os.environ.get('DECK_BUILDER_INTERVAL_S', 30))
+    app.config['DECK_BUILDER_WORKERS'] = int(os.environ.get('DECK_BUILDER_WORKERS', 2))
+    app.config['DECK_BUILDER_BATCH_SIZE'] = int(os.environ.get('DECK_BUILDER_BATCH_SIZE', 200))
+    app.config['DECK_MAX_AGE_S'] = int(os.environ.get('DECK_MAX_AGE_S', 3600))
+
     # Initialize extensions
     try:
         from app.extensions import db, migrate, ma, cors, jwt
@@ -41,7 +119,8 @@ def create_app():
                     "https://penzi.vercel.app"
                 ],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization"]
+                "allow_headers": ["Content-Type", "Authorization"],
+                "expose_headers": ["X-Next-Cursor"]
             },
             r"/uploads/*": {
                 "origins": [
@@ -81,7 +160,8 @@ def create_app():
     try:
         from app.models import (
             User, MatchRequest, Match, SmsMessage, UserInterest,
-            UserPhoto, AdminSettings, ChatMessage, PaymentTransaction
+            UserPhoto, AdminSettings, ChatMessage, PaymentTransaction, Town, TownAlias,
+            RecommendationDeck
         )
     except ImportError as e:
         logger.error(f"Failed to import models: {str(e)}")
@@ -93,6 +173,81 @@ def create_app():
         logger.error(f"Failed to initialize migration: {str(e)}")
         raise
 
+    try:
+        from app.services.locationService import location_service
+        from app.services.geoService import geo_index
+        location_service.init_app(app)
+        geo_index.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize location service: {str(e)}")
+        raise
+
+    # User change feed and the caches fed by it
+    try:
+        from app.services.userEvents import user_events
+        from app.services.userCounterService import registered_user_counter
+        from app.services.candidateIndexService import candidate_index
+        from app.services.matchRankingService import match_ranker
+        from app.services.demographicsService import demographic_histogram
+        user_events.init_app(app)
+        registered_user_counter.init_app(app)
+        candidate_index.init_app(app)
+        match_ranker.init_app(app)
+        demographic_histogram.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize user change feed: {str(e)}")
+        raise
+
+    try:
+        from app.services.seenSetService import seen_sets
+        seen_sets.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize seen sets: {str(e)}")
+        raise
+
+    try:
+        from app.services.smsDedupService import sms_deduplicator
+        sms_deduplicator.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize SMS deduplicator: {str(e)}")
+        raise
+
+    # Start background services
+    try:
+        from app.services.smsLogService import sms_log_writer
+        sms_log_writer.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize SMS log writer: {str(e)}")
+        raise
+
+    try:
+        from app.services.smsDispatchService import sms_dispatcher
+        sms_dispatcher.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize SMS dispatcher: {str(e)}")
+        raise
+
+    try:
+        from app.services.smsEngineService import sms_engine
+        sms_engine.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize SMS processing engine: {str(e)}")
+        raise
+
+    try:
+        from app.services.interestExpiryService import interest_expiry_scheduler
+        interest_expiry_scheduler.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize interest expiry scheduler: {str(e)}")
+        raise
+
+    try:
+        from app.services.deckBuilderService import deck_builder
+        deck_builder.init_app(app)
+    except Exception as e:
+        logger.error(f"Failed to initialize recommendation deck builder: {str(e)}")
+        raise
+
     # Register blueprints
     try:
         from app.routes.userRoutes import user_bp
@@ -109,6 +264,7 @@ def create_app():
         from app.routes.chatRoutes import chat_bp
         from app.routes.registrationRoutes import registration_bp
         from app.routes.adminRoutes import admin_bp
+        from app.routes.locationRoutes import location_bp
 
         app.register_blueprint(user_bp)
         app.register_blueprint(match_bp)
@@ -124,6 +280,7 @@ def create_app():
         app.register_blueprint(chat_bp)
         app.register_blueprint(registration_bp)
         app.register_blueprint(admin_bp)
+        app.register_blueprint(location_bp)
         
         # Try to register upload blueprint
         try:
@@ -4,8 +4,10 @@ from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 
+from app.utils.transaction_scope import ScopedSession
+
 # shared instances
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ScopedSession})
 migrate = Migrate()
 ma = Marshmallow()
 cors = CORS()
@@ -7,10 +7,14 @@ from .userPhotoModel import UserPhoto
 from .adminSettingsModel import AdminSettings
 from .chatMessageModel import ChatMessage
 from .paymentTransactionModel import PaymentTransaction
+from .townModel import Town, TownAlias
+from .recommendationDeckModel import RecommendationDeck
+from .userSeenSetModel import UserSeenSet
 from app.extensions import db
 
 # Make models available when importing from models package
 __all__ = [
     'User', 'MatchRequest', 'Match', 'SmsMessage', 'UserInterest',
-    'UserPhoto', 'AdminSettings', 'ChatMessage', 'PaymentTransaction', 'db'
+    'UserPhoto', 'AdminSettings', 'ChatMessage', 'PaymentTransaction', 'Town', 'TownAlias',
+    'RecommendationDeck', 'UserSeenSet', 'db'
 ]
\ No newline at end of file
@@ -5,6 +5,13 @@ from app.extensions import db
 
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        # Latest message of a match (conversation list) and a match's messages newest first
+        db.Index('ix_chat_messages_match_created', 'match_id', 'created_at'),
+        # Unread counts per receiver
+        db.Index('ix_chat_messages_receiver_unread', 'receiver_id', 'match_id',
+                 postgresql_where=db.text('is_read = false AND is_deleted = false')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     match_id = db.Column(db.Integer, db.ForeignKey('matches.id', ondelete='CASCADE'), nullable=False)
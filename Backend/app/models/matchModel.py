@@ -4,13 +4,18 @@ from app.extensions import db
 
 class Match(db.Model):
     __tablename__ = 'matches'
+    __table_args__ = (
+        # A user's matches are those on either side; each index serves one half and pair lookups
+        db.Index('ix_matches_requester_matched', 'requester_id', 'matched_user_id'),
+        db.Index('ix_matches_matched_requester', 'matched_user_id', 'requester_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     request_id = db.Column(db.Integer, db.ForeignKey('match_requests.id', ondelete='CASCADE'), nullable=True)
     requester_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     matched_user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     position = db.Column(db.Integer, nullable=True)
-    is_sent = db.Column(db.Boolean, server_default='false', nullable=False)
+    is_sent = db.Column(db.Boolean, server_default=db.false(), nullable=False)
     status = db.Column(db.String(20), nullable=False, default='active')
     
     # Payment fields for web app
@@ -1,6 +1,25 @@
+import sys
+from array import array
 from datetime import datetime
 from app.extensions import db
 
+
+def pack_user_ids(user_ids):
+    """Ordered user IDs as little-endian uint32 bytes"""
+    packed = array('I', user_ids)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_user_ids(data):
+    unpacked = array('I')
+    unpacked.frombytes(data or b'')
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
 class MatchRequest(db.Model):
     __tablename__ = 'match_requests'
     
@@ -9,7 +28,13 @@ class MatchRequest(db.Model):
     age_min = db.Column(db.Integer, nullable=False)
     age_max = db.Column(db.Integer, nullable=False)
     preferred_town = db.Column(db.String(100), nullable=False)
+    # Gazetteer town the free-text preferred_town resolved to (None if it resolved to nothing)
+    town_id = db.Column(db.Integer, db.ForeignKey('towns.id'), nullable=True, index=True)
     status = db.Column(db.String(20), default='active', nullable=False)
+    # Snapshot of the ordered candidate IDs (see set_candidates); Match rows exist only for sent ones
+    candidate_ids = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    total_matches_found = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    current_position = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # For NEXT command
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # The relationship is already defined in User model with backref='user'
@@ -34,7 +59,10 @@ class MatchRequest(db.Model):
             'age_min': self.age_min,
             'age_max': self.age_max,
             'preferred_town': self.preferred_town,
+            'town_id': self.town_id,
             'status': self.status,
+            'total_matches_found': self.total_matches_found,
+            'current_position': self.current_position,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
@@ -46,8 +74,24 @@ class MatchRequest(db.Model):
         return self.status == 'completed'
     
     def has_more_matches(self):
-        """Placeholder method (no matches tracked)"""
-        return False  # Since matches are removed
+        return self.has_snapshot() and (self.current_position or 0) < (self.total_matches_found or 0)
     
-    def increment_position(self):
-        pass
\ No newline at end of file
+    def increment_position(self, count=1):
+        self.current_position = (self.current_position or 0) + count
+
+    def has_snapshot(self):
+        """False for requests made before candidates were snapshotted (their Match rows hold the list)"""
+        return self.candidate_ids is not None
+
+    def set_candidates(self, user_ids):
+        """Store the ordered candidate IDs and rewind the cursor"""
+        self.candidate_ids = pack_user_ids(user_ids)
+        self.total_matches_found = len(user_ids)
+        self.current_position = 0
+
+    def take_next(self, count):
+        """Advance the cursor by up to ``count``; returns [(position, user_id)] with 1-based positions"""
+        start = self.current_position or 0
+        user_ids = unpack_user_ids(self.candidate_ids[start * 4:(start + count) * 4])
+        self.current_position = start + len(user_ids)
+        return list(enumerate(user_ids, start + 1))
\ No newline at end of file
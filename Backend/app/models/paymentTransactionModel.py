@@ -65,7 +65,12 @@ class PaymentTransaction(db.Model):
         from datetime import timedelta
         self.expires_at = datetime.utcnow() + timedelta(minutes=30)
     
-    def to_dict(self):
+    def to_dict(self, target_profiles=None):
+        """Serialize the payment; ``target_profiles`` ({user_id: swipe profile}) comes from to_dict_list"""
+        if target_profiles is not None:
+            target_profile = target_profiles.get(self.target_user_id)
+        else:
+            target_profile = self.target_user.to_swipe_profile() if self.target_user else None
         return {
             'id': self.id,
             'userId': self.user_id,
@@ -83,9 +88,18 @@ class PaymentTransaction(db.Model):
             'completedAt': self.completed_at.isoformat() if self.completed_at else None,
             'expiresAt': self.expires_at.isoformat() if self.expires_at else None,
             'isExpired': self.is_expired(),
-            'targetUser': self.target_user.to_swipe_profile() if self.target_user else None
+            'targetUser': target_profile
         }
     
+    @classmethod
+    def to_dict_list(cls, payments):
+        """Serialize several payments, loading target users and their photos in one query each"""
+        from app.models.userModel import User
+        target_ids = {payment.target_user_id for payment in payments if payment.target_user_id}
+        targets = User.query.filter(User.id.in_(target_ids)).all() if target_ids else []
+        profiles = {user.id: profile for user, profile in zip(targets, User.to_swipe_profiles(targets))}
+        return [payment.to_dict(target_profiles=profiles) for payment in payments]
+    
     def is_expired(self):
         """Check if payment has expired"""
         if not self.expires_at:
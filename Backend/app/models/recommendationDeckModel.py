@@ -0,0 +1,68 @@
+import sys
+from array import array
+from datetime import datetime
+from app.extensions import db
+
+# Low bits of a ranking key hold the user ID (see MatchRanker)
+_ID_MASK = (1 << 32) - 1
+
+
+def pack_keys(keys):
+    """Ranking keys as little-endian int64 bytes"""
+    packed = array('q', keys)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_keys(data):
+    unpacked = array('q')
+    unpacked.frombytes(data or b'')
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class RecommendationDeck(db.Model):
+    """Precomputed, ranked candidate queue of one user for their latest match request criteria.
+
+    Built in the background by DeckBuilder; request handlers read it instead
+    of searching and ranking on the request path.
+    """
+    __tablename__ = 'recommendation_decks'
+    __table_args__ = (
+        db.Index('ix_recommendation_decks_criteria', 'town_id', 'age_min', 'age_max'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    age_min = db.Column(db.Integer, nullable=False)
+    age_max = db.Column(db.Integer, nullable=False)
+    # normalize_place() of the request's preferred_town, and the gazetteer town it resolved to
+    town_key = db.Column(db.String(100), nullable=False)
+    town_id = db.Column(db.Integer, nullable=True)
+    # Ranking keys (score << 32 | user_id) of the best candidates, best first
+    candidate_keys = db.Column(db.LargeBinary, nullable=False)
+    # All candidates matching the criteria; more than the deck holds when it is truncated
+    total_candidates = db.Column(db.Integer, nullable=False, default=0)
+    is_stale = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RecommendationDeck user {self.user_id}: {self.size} of {self.total_candidates}>'
+
+    @property
+    def size(self):
+        return len(self.candidate_keys or b'') // 8
+
+    def keys(self):
+        return unpack_keys(self.candidate_keys)
+
+    def user_ids(self):
+        return [key & _ID_MASK for key in self.keys()]
+
+    def is_complete(self):
+        """True when the deck holds every candidate, not just the best ones"""
+        return self.size >= self.total_candidates
+
+    def covers(self, age_min, age_max, town_key):
+        return self.age_min == age_min and self.age_max == age_max and self.town_key == town_key
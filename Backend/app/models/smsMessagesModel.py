@@ -10,9 +10,25 @@ class SmsMessage(db.Model):
     message_body = db.Column(db.Text, nullable=False)
     direction = db.Column(db.String(10), nullable=False)  # 'incoming', 'outgoing'
     message_type = db.Column(db.String(50))  # 'activation', 'registration', 'match_request', etc.
-    status = db.Column(db.String(20), default='processed')  # 'pending', 'processed', 'sent', 'failed'
+    status = db.Column(db.String(20), default='processed')  # 'pending', 'sending', 'processed', 'sent', 'failed'
     related_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Inbound idempotency: provider message ID and the reply we generated for it
+    gateway_message_id = db.Column(db.String(100), unique=True, index=True)
+    response_body = db.Column(db.Text)
+    claimed_at = db.Column(db.DateTime)  # when processing of gateway_message_id started; expires after a lease
+
+    # Outbound dispatch queue (see app/services/smsDispatchService.py)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime)  # retry time for 'pending', lease expiry for 'sending'
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_sms_messages_dispatch_queue', 'status', 'next_attempt_at',
+                 postgresql_where=db.text("status IN ('pending', 'sending')")),
+    )
     
     # Relationship to users table
     user = db.relationship("User", back_populates="sms_messages")
@@ -27,5 +43,9 @@ class SmsMessage(db.Model):
             'message_type': self.message_type,
             'status': self.status,
             'related_user_id': self.related_user_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'gateway_message_id': self.gateway_message_id,
+            'attempts': self.attempts,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'last_error': self.last_error
         }
\ No newline at end of file
@@ -0,0 +1,73 @@
+import re
+from datetime import datetime
+from sqlalchemy import DDL, event
+from app.extensions import db
+
+
+def normalize_place(name):
+    """Lowercase, punctuation-free, single-spaced form used for town/county lookups"""
+    return ' '.join(re.sub(r"[^\w\s]", ' ', (name or '').lower()).split())
+
+
+class Town(db.Model):
+    """Canonical town in the gazetteer; users and match requests point at it via town_id"""
+    __tablename__ = 'towns'
+    __table_args__ = (
+        db.UniqueConstraint('normalized_name', 'normalized_county', name='uq_towns_name_county'),
+        # Fuzzy lookups (similarity / %) on Postgres; a plain index elsewhere
+        db.Index('ix_towns_normalized_name_trgm', 'normalized_name',
+                 postgresql_using='gin', postgresql_ops={'normalized_name': 'gin_trgm_ops'}),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    county = db.Column(db.String(100))
+    normalized_name = db.Column(db.String(100), nullable=False)
+    normalized_county = db.Column(db.String(100), nullable=False, server_default='')
+    # Town centre (WGS84) for radius matching; None when the bundled gazetteer does not know the town
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    aliases = db.relationship('TownAlias', backref='town', lazy=True, cascade='all, delete-orphan')
+
+    def __init__(self, name, county=None):
+        self.name = name.strip()
+        self.county = county.strip() if county else None
+        self.normalized_name = normalize_place(name)
+        self.normalized_county = normalize_place(county)
+
+    def __repr__(self):
+        return f'<Town {self.id}: {self.name}, {self.county}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'county': self.county,
+            'latitude': self.latitude,
+            'longitude': self.longitude
+        }
+
+
+class TownAlias(db.Model):
+    """Alternative spelling or abbreviation that resolves to a town (e.g. 'nbi' -> Nairobi)"""
+    __tablename__ = 'town_aliases'
+
+    id = db.Column(db.Integer, primary_key=True)
+    alias = db.Column(db.String(100), nullable=False, unique=True)
+    town_id = db.Column(db.Integer, db.ForeignKey('towns.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    def __init__(self, alias, town_id):
+        self.alias = normalize_place(alias)
+        self.town_id = town_id
+
+    def __repr__(self):
+        return f'<TownAlias {self.alias} -> {self.town_id}>'
+
+
+# The trigram operator class needs the extension before db.create_all() can build the index
+event.listen(
+    Town.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
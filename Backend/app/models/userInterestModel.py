@@ -1,4 +1,5 @@
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -7,22 +8,38 @@ from app.extensions import db
 
 class UserInterest(db.Model):
     __tablename__ = 'user_interests'
-    __table_args__ = {'extend_existing': True}  
+    __table_args__ = (
+        db.Index('ix_user_interests_pending_expiry', 'expires_at',
+                 postgresql_where=db.text('response_received = false AND expired_notification_sent = false')),
+        # One current interest per pair: expressing interest again renews it (see ``renew``).
+        # Superseded rows are older duplicates kept as history
+        db.Index('ix_user_interests_current_pair', 'interested_user_id', 'target_user_id', unique=True,
+                 postgresql_where=db.text('superseded_at IS NULL'), sqlite_where=db.text('superseded_at IS NULL')),
+        # "Has this user already swiped on that one?" probes and both sides of the mutual-match self-join
+        db.Index('ix_user_interests_interested_target_response', 'interested_user_id', 'target_user_id', 'response'),
+        {'extend_existing': True}
+    )
+
+    # Hours a target has to answer YES/NO before the interest expires
+    TTL_HOURS = 24
     
     id = Column(Integer, primary_key=True)
     interested_user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     target_user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     interest_type = Column(String(20), server_default='details', nullable=False)
     
-    notification_sent = Column(Boolean, server_default='false', nullable=False)
+    notification_sent = Column(Boolean, server_default=db.false(), nullable=False)
     notification_sent_at = Column(DateTime)
-    response_received = Column(Boolean, server_default='false', nullable=False)
+    response_received = Column(Boolean, server_default=db.false(), nullable=False)
     response = Column(String(10))
     response_at = Column(DateTime)
-    feedback_sent = Column(Boolean, server_default='false', nullable=False)
-    expired_notification_sent = Column(Boolean, server_default='false', nullable=False)
+    feedback_sent = Column(Boolean, server_default=db.false(), nullable=False)
+    expired_notification_sent = Column(Boolean, server_default=db.false(), nullable=False)
     payment_transaction_id = Column(Integer, ForeignKey('payment_transactions.id'), nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    # Set on the older rows of a pair that had several before interests became one per pair
+    superseded_at = Column(DateTime, nullable=True)
 
     # Relationships 
     interested_user = relationship(
@@ -40,6 +57,7 @@ class UserInterest(db.Model):
         self.interested_user_id = interested_user_id
         self.target_user_id = target_user_id
         self.interest_type = interest_type
+        self.expires_at = datetime.utcnow() + timedelta(hours=self.TTL_HOURS)
 
     def __repr__(self):
         return f'<UserInterest {self.id}: User {self.interested_user_id} -> User {self.target_user_id}>'
@@ -56,6 +74,7 @@ class UserInterest(db.Model):
             'response_at': self.response_at.isoformat() if self.response_at else None, # type: ignore
             'feedback_sent': self.feedback_sent,
             'created_at': self.created_at.isoformat() if self.created_at else None, # type: ignore
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None, # type: ignore
             'status': self.get_status()
         }
 
@@ -92,10 +111,56 @@ class UserInterest(db.Model):
     
     def is_pending_response(self):
         return self.notification_sent and not self.response_received # type: ignore
+
+    def is_expired(self, now=None):
+        return not self.response_received and self.expires_at <= (now or datetime.utcnow()) # type: ignore
+
+    def hours_remaining(self, now=None):
+        remaining = (self.expires_at - (now or datetime.utcnow())).total_seconds() # type: ignore
+        return max(0, math.ceil(remaining / 3600))
     
     def is_complete(self):
         return self.notification_sent and self.response_received and self.feedback_sent
     
+    @classmethod
+    def renewal_values(cls, now=None):
+        """Column values that start an unanswered interest over: new timestamps and expiry, not yet notified"""
+        now = now or datetime.utcnow()
+        return {
+            'created_at': now,
+            'expires_at': now + timedelta(hours=cls.TTL_HOURS),
+            'notification_sent': False,
+            'notification_sent_at': None,
+            'expired_notification_sent': False
+        }
+
+    @classmethod
+    def renew(cls, interested_user_id, target_user_id, interest_type='details', **values):
+        """The pair's current interest set to ``interest_type``, added to the session if the pair has none.
+
+        A pair has one current interest row, so expressing interest again
+        reuses it. An unanswered (pending or expired) interest starts over
+        with ``renewal_values``; an answered one keeps its response and
+        timestamps. ``values`` sets further columns, e.g.
+        ``payment_transaction_id``. Does not commit.
+        """
+        interest = cls.query.filter_by(
+            interested_user_id=interested_user_id,
+            target_user_id=target_user_id,
+            superseded_at=None
+        ).first()
+        if interest is None:
+            interest = cls(interested_user_id, target_user_id, interest_type)
+            db.session.add(interest)
+        else:
+            if not interest.response_received:
+                for column, value in cls.renewal_values().items():
+                    setattr(interest, column, value)
+            interest.interest_type = interest_type
+        for column, value in values.items():
+            setattr(interest, column, value)
+        return interest
+
     @classmethod
     def create_interest(cls, interested_user_id, target_user_id, interest_type='details'):
        
@@ -107,13 +172,7 @@ class UserInterest(db.Model):
         if existing_interest:
             raise ValueError("Interest already exists between these users")
         
-        interest = cls(
-            interested_user_id=interested_user_id,
-            target_user_id=target_user_id,
-            interest_type=interest_type
-        )
-        
-        db.session.add(interest)
+        interest = cls.renew(interested_user_id, target_user_id, interest_type)
         db.session.commit()
         return interest
     
@@ -121,7 +180,8 @@ class UserInterest(db.Model):
     def check_existing_interest(interested_user_id, target_user_id):
         return UserInterest.query.filter_by(
             interested_user_id=interested_user_id,
-            target_user_id=target_user_id
+            target_user_id=target_user_id,
+            superseded_at=None
         ).filter(
             # Either pending notification, awaiting response, or pending feedback
             db.or_(
@@ -34,6 +34,8 @@ class User(db.Model):
     name = db.Column(db.String(255))
     county = db.Column(db.String(100))
     town = db.Column(db.String(100))
+    # Canonical gazetteer entry for town/county, kept in sync by LocationService on flush
+    town_id = db.Column(db.Integer, db.ForeignKey('towns.id'), nullable=True, index=True)
     level_of_education = db.Column(db.String(100))
     profession = db.Column(db.String(100))
     marital_status = db.Column(db.String(50))
@@ -66,7 +68,7 @@ class User(db.Model):
     )
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     match_requests = db.relationship(
@@ -156,22 +158,26 @@ class User(db.Model):
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
 
-    def to_swipe_profile(self):
-        """Return user data for swiping interface"""
+    def to_swipe_profile(self, photos=None):
+        """Return user data for swiping interface
+
+        ``photos`` (photo URLs) skips the photo query when the caller already
+        fetched them, see ``to_swipe_profiles``.
+        """
         try:
             interests_list = []
             if self.interests:
                 interests_list = [interest.strip() for interest in self.interests.split(',') if interest.strip()]
             
             # Get user photos
-            photos = []
-            try:
-                from app.models.userPhotoModel import UserPhoto
-                user_photos = UserPhoto.get_user_photos(self.id)
-                photos = [photo.photo_url for photo in user_photos]
-            except Exception as photo_error:
-                print(f"Error loading photos for user {self.id}: {photo_error}")
-                photos = []
+            if photos is None:
+                try:
+                    from app.models.userPhotoModel import UserPhoto
+                    user_photos = UserPhoto.get_user_photos(self.id)
+                    photos = [photo.photo_url for photo in user_photos]
+                except Exception as photo_error:
+                    print(f"Error loading photos for user {self.id}: {photo_error}")
+                    photos = []
             
             # Handle cases where users might not have all fields (SMS users vs web users)
             first_name = self.first_name or (self.name.split(' ')[0] if self.name else 'Unknown')
@@ -221,28 +227,64 @@ class User(db.Model):
                 'isPremium': False
             }
 
+    @classmethod
+    def to_swipe_profiles(cls, users):
+        """Swipe profiles for several users, with all their photos fetched in one query"""
+        from app.models.userPhotoModel import UserPhoto
+        users = [user for user in users if user is not None]
+        try:
+            photos = UserPhoto.get_photos_for_users([user.id for user in users])
+        except Exception as photo_error:
+            print(f"Error loading photos for {len(users)} users: {photo_error}")
+            photos = {}
+        return [
+            user.to_swipe_profile(photos=[photo.photo_url for photo in photos.get(user.id, [])])
+            for user in users
+        ]
+
     @staticmethod
     def find_by_phone(phone_number):
         """Find user by phone number - handles both +254... and 254... formats"""
-        # Try exact match first
-        user = User.query.filter_by(phone_number=phone_number).first()
-        if user:
-            return user
-        
-        # Try with + prefix if not found
-        if not phone_number.startswith('+'):
-            user = User.query.filter_by(phone_number=f'+{phone_number}').first()
-            if user:
-                return user
-        
-        # Try without + prefix if not found
+        # Exact format first, then the same number with/without the + prefix
         if phone_number.startswith('+'):
-            user = User.query.filter_by(phone_number=phone_number[1:]).first()
-            if user:
-                return user
-        
+            variants = [phone_number, phone_number[1:]]
+        else:
+            variants = [phone_number, f'+{phone_number}']
+
+        # One query for both formats instead of one query per format
+        users = User.query.filter(User.phone_number.in_(variants)).all()
+        for variant in variants:
+            for user in users:
+                if user.phone_number == variant:
+                    return user
+
         return None
 
+    @staticmethod
+    def find_by_phones(phone_numbers):
+        """Batch version of find_by_phone: one query, returns {phone_number: user or None}"""
+        variants_by_phone = {}
+        for phone_number in phone_numbers:
+            if phone_number.startswith('+'):
+                variants_by_phone[phone_number] = [phone_number, phone_number[1:]]
+            else:
+                variants_by_phone[phone_number] = [phone_number, f'+{phone_number}']
+
+        all_variants = {variant for variants in variants_by_phone.values() for variant in variants}
+        if not all_variants:
+            return {}
+
+        users_by_number = {
+            user.phone_number: user
+            for user in User.query.filter(User.phone_number.in_(all_variants)).all()
+        }
+
+        return {
+            phone_number: next((users_by_number[variant] for variant in variants
+                                if variant in users_by_number), None)
+            for phone_number, variants in variants_by_phone.items()
+        }
+
     @staticmethod
     def find_by_id(user_id):
         """Find user by ID"""
@@ -630,24 +672,20 @@ class User(db.Model):
     @classmethod
     def get_potential_matches(cls, requester_id, age_min, age_max, preferred_town, gender_preference=None):
         """Get potential matches for a user"""
+        from app.services.candidateIndexService import candidate_index
+        return candidate_index.load_users(
+            cls.get_potential_match_ids(requester_id, age_min, age_max, preferred_town, gender_preference))
+
+    @classmethod
+    def get_potential_match_ids(cls, requester_id, age_min, age_max, preferred_town, gender_preference=None):
+        """IDs of potential matches for a user, newest first (answered by the candidate index)"""
+        from app.services.candidateIndexService import candidate_index, opposite_gender
         requester = cls.find_by_id(requester_id)
         if not requester:
             return []
 
-        # Determine opposite gender for matching
-        opposite_gender = Gender.FEMALE if requester.gender == Gender.MALE else Gender.MALE
-
-        query = cls.query.filter(
-            cls.id != requester_id,  # Not the same user
-            cls.age >= age_min,
-            cls.age <= age_max,
-            cls.town.ilike(f'%{preferred_town}%'),
-            cls.gender == opposite_gender,  # Opposite gender
-            cls.is_active == True,
-            cls.registration_stage == RegistrationStage.COMPLETED
-        )
-
-        return query.all()
+        return candidate_index.search(opposite_gender(requester.gender), age_min, age_max, preferred_town,
+                                      exclude_user_id=requester.id)
 
     @classmethod
     def get_activated_users_count(cls):
@@ -62,6 +62,19 @@ class UserPhoto(db.Model):
             query = query.filter_by(is_verified=True)
         return query.order_by(desc(cls.is_primary), asc(cls.upload_order)).all()
     
+    @classmethod
+    def get_photos_for_users(cls, user_ids, verified_only=False):
+        """Photos of several users with one IN query: {user_id: [photos]} in get_user_photos order"""
+        photos = {user_id: [] for user_id in user_ids}
+        if not photos:
+            return photos
+        query = cls.query.filter(cls.user_id.in_(list(photos)), cls.is_deleted.is_(False))
+        if verified_only:
+            query = query.filter_by(is_verified=True)
+        for photo in query.order_by(cls.user_id, desc(cls.is_primary), asc(cls.upload_order)).all():
+            photos[photo.user_id].append(photo)
+        return photos
+    
     @classmethod
     def get_primary_photo(cls, user_id):
         """Get the primary photo for a user"""
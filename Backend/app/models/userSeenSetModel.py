@@ -0,0 +1,25 @@
+from datetime import datetime
+from app.extensions import db
+
+
+class UserSeenSet(db.Model):
+    """Bloom filter of the profiles a user has already been shown.
+
+    Maintained by SeenSetStore: profiles sent in SMS match batches and
+    users the user expressed interest in or swiped on. New searches skip
+    them. ``reset_at`` marks an admin reset; history before it is ignored
+    when the filter is rebuilt.
+    """
+    __tablename__ = 'user_seen_sets'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bits = db.Column(db.LargeBinary, nullable=False)
+    num_hashes = db.Column(db.Integer, nullable=False)
+    # IDs the filter is sized for, and (approximately) how many it holds
+    capacity = db.Column(db.Integer, nullable=False)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    reset_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserSeenSet user {self.user_id}: {self.item_count} of {self.capacity}>'
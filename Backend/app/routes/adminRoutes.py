@@ -7,6 +7,7 @@ from app.models.adminSettingsModel import AdminSettings
 from app.models.paymentTransactionModel import PaymentTransaction
 from app.models.matchModel import Match
 from app.models.userPhotoModel import UserPhoto
+from app.services.seenSetService import seen_sets
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -222,7 +223,7 @@ def get_user_details(user_id):
         user_data.update({
             'registrationStage': user.registration_stage.value if user.registration_stage else None,
             'photos': [photo.to_dict() for photo in photos],
-            'payments': [payment.to_dict() for payment in payments],
+            'payments': PaymentTransaction.to_dict_list(payments),
             'matchCount': len(matches),
             'canAccessNairobi': user.can_access_nairobi_matches()
         })
@@ -288,6 +289,30 @@ def toggle_user_premium(user_id):
         db.session.rollback()
         return jsonify({'message': f'Failed to toggle premium status: {str(e)}'}), 500
 
+@admin_bp.route('/users/<int:user_id>/reset-seen', methods=['POST'])
+@jwt_required()
+def reset_seen_profiles(user_id):
+    """Forget the profiles a user has been sent, so new searches show them again"""
+    try:
+        admin_check = require_admin()
+        if admin_check:
+            return admin_check
+        
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        
+        seen_sets.reset(user_id)
+        
+        return jsonify({
+            'message': 'Seen profiles reset successfully',
+            'userId': user_id
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Failed to reset seen profiles: {str(e)}'}), 500
+
 @admin_bp.route('/payments', methods=['GET'])
 @jwt_required()
 def get_payments():
@@ -312,7 +337,7 @@ def get_payments():
             error_out=False
         )
         
-        payments_data = [payment.to_dict() for payment in payments.items]
+        payments_data = PaymentTransaction.to_dict_list(payments.items)
         
         return jsonify({
             'payments': payments_data,
@@ -642,8 +667,7 @@ def get_match_fee_payments():
         )
         
         payments_data = []
-        for payment in payments.items:
-            payment_dict = payment.to_dict()
+        for payment, payment_dict in zip(payments.items, PaymentTransaction.to_dict_list(payments.items)):
             # Add user details
             if payment.user:
                 payment_dict['user'] = {
@@ -5,75 +5,69 @@ from app.extensions import db
 from app.models.userModel import User
 from app.models.matchModel import Match
 from app.models.chatMessageModel import ChatMessage
+from app.services.conversationService import ConversationService, decode_cursor
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
 
 @chat_bp.route('/conversations', methods=['GET'])
 @jwt_required()
 def get_conversations():
-    """Get all conversations for the current user"""
+    """Get the current user's conversations, most recent activity first"""
     try:
         current_user_id = int(get_jwt_identity())
         
-        # Get all matches for the current user (these represent conversations)
-        matches = Match.query.filter(
-            (Match.requester_id == current_user_id) | 
-            (Match.matched_user_id == current_user_id)
-        ).all()
+        # Keyset pagination: pass the X-Next-Cursor header back as `after`; without `limit` everything is returned
+        after = request.args.get('after')
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({'message': 'limit must be positive'}), 400
+        try:
+            cursor = decode_cursor(after) if after else None
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        
+        # Matches represent conversations; one query brings the other user, latest message and unread count
+        rows, next_cursor = ConversationService.get_conversations(current_user_id, after=cursor, limit=limit)
         
         conversations = []
-        for match in matches:
-            # Determine the other user in the conversation
-            other_user_id = match.matched_user_id if match.requester_id == current_user_id else match.requester_id
-            other_user = User.query.get(other_user_id)
+        for row in rows:
+            match, other_user = row.Match, row.User
             
-            if other_user:
-                # Get latest message for this conversation
-                latest_message = ChatMessage.get_latest_message_for_match(match.id)
-                
-                # Get unread count
-                unread_count = ChatMessage.query.filter_by(
-                    match_id=match.id,
-                    receiver_id=current_user_id,
-                    is_read=False,
-                    is_deleted=False
-                ).count()
-                
+            last_message_data = {
+                'text': 'Start a conversation!',
+                'timestamp': match.created_at.isoformat(),
+                'isRead': True
+            }
+            
+            if row.message_at is not None:
                 last_message_data = {
-                    'text': 'Start a conversation!',
-                    'timestamp': match.created_at.isoformat(),
-                    'isRead': True
+                    'text': row.message_text,
+                    'timestamp': row.message_at.isoformat(),
+                    'isRead': row.message_is_read,
+                    'senderId': row.message_sender_id
                 }
-                
-                if latest_message:
-                    last_message_data = {
-                        'text': latest_message.message_text,
-                        'timestamp': latest_message.created_at.isoformat(),
-                        'isRead': latest_message.is_read,
-                        'senderId': latest_message.sender_id
-                    }
-                
-                conversations.append({
-                    'id': str(match.id),
-                    'userId': str(other_user_id),
-                    'user': {
-                        'id': str(other_user.id),
-                        'firstName': other_user.first_name,
-                        'lastName': other_user.last_name,
-                        'profilePicture': other_user.profile_picture,
-                        'isOnline': False,  # TODO: Implement online status
-                        'lastSeen': None    # TODO: Implement last seen
-                    },
-                    'lastMessage': last_message_data,
-                    'unreadCount': unread_count,
-                    'isPaid': getattr(match, 'is_paid', False),
-                    'canChat': getattr(match, 'is_paid', False)
-                })
-        
-        # Sort by latest message timestamp
-        conversations.sort(key=lambda x: x['lastMessage']['timestamp'], reverse=True)
-        
-        return jsonify(conversations), 200
+            
+            conversations.append({
+                'id': str(match.id),
+                'userId': str(other_user.id),
+                'user': {
+                    'id': str(other_user.id),
+                    'firstName': other_user.first_name,
+                    'lastName': other_user.last_name,
+                    'profilePicture': other_user.profile_picture,
+                    'isOnline': False,  # TODO: Implement online status
+                    'lastSeen': None    # TODO: Implement last seen
+                },
+                'lastMessage': last_message_data,
+                'unreadCount': row.unread_count,
+                'isPaid': getattr(match, 'is_paid', False),
+                'canChat': getattr(match, 'is_paid', False)
+            })
+        
+        response = jsonify(conversations)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
         
     except Exception as e:
         return jsonify({'message': f'Failed to get conversations: {str(e)}'}), 500
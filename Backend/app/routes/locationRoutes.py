@@ -0,0 +1,59 @@
+from flask import Blueprint, request
+from app.services.geoService import geo_index
+from app.services.locationService import location_service
+from app.utils.response_helper import success_response, error_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+location_bp = Blueprint('locations', __name__, url_prefix='/api/locations')
+
+MAX_SUGGESTIONS = 25
+MAX_RADIUS_KM = 500
+
+
+@location_bp.route('/suggest', methods=['GET'])
+def suggest_towns():
+    """Type-ahead for town fields: ?q=<partial town>&limit=<n>"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_SUGGESTIONS)
+
+        if not query:
+            return success_response({'query': query, 'suggestions': []}, "No query given")
+
+        suggestions = location_service.suggest(query, limit)
+        return success_response({'query': query, 'suggestions': suggestions},
+                                f"Found {len(suggestions)} towns")
+
+    except Exception as e:
+        logger.error(f"Error suggesting towns: {str(e)}")
+        return error_response("Internal server error", 500)
+
+
+@location_bp.route('/nearby', methods=['GET'])
+def nearby_towns():
+    """Towns within a radius of a town, nearest first: ?town=<town>&radius_km=<km, default match_radius_km>"""
+    try:
+        town = request.args.get('town', '').strip()
+        radius_km = request.args.get('radius_km', type=float)
+
+        if not town:
+            return error_response("town is required", 400)
+        if radius_km is not None and not 0 < radius_km <= MAX_RADIUS_KM:
+            return error_response(f"radius_km must be between 0 and {MAX_RADIUS_KM}", 400)
+
+        towns = []
+        for town_id, km in geo_index.towns_near(town, radius_km):
+            place = location_service.town(town_id)
+            if place is not None:
+                towns.append({'id': town_id, 'name': place[0], 'county': place[1], 'distanceKm': round(km, 1)})
+        return success_response({
+            'town': town,
+            'radiusKm': radius_km if radius_km is not None else geo_index.radius_km,
+            'towns': towns
+        }, f"Found {len(towns)} towns")
+
+    except Exception as e:
+        logger.error(f"Error finding nearby towns: {str(e)}")
+        return error_response("Internal server error", 500)
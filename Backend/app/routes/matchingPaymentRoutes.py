@@ -273,13 +273,10 @@ def verify_match_payment():
                 payment.mark_as_completed(mpesa_receipt_number=mpesa_receipt)
                 
                 # Create user interest record
-                interest = UserInterest(
-                    interested_user_id=current_user_id,
-                    target_user_id=payment.target_user_id,
-                    interest_type='paid_match',
+                interest = UserInterest.renew(
+                    current_user_id, payment.target_user_id, 'paid_match',
                     payment_transaction_id=payment.id
                 )
-                db.session.add(interest)
                 
                 # Send notification to target user
                 target_user = User.query.get(payment.target_user_id)
@@ -391,13 +388,10 @@ def mpesa_callback():
             payment.mark_as_completed(mpesa_receipt_number=mpesa_receipt, callback_data=data)
             
             # Create user interest record
-            interest = UserInterest(
-                interested_user_id=payment.user_id,
-                target_user_id=payment.target_user_id,
-                interest_type='paid_match',
+            interest = UserInterest.renew(
+                payment.user_id, payment.target_user_id, 'paid_match',
                 payment_transaction_id=payment.id
             )
-            db.session.add(interest)
             
             # Send notification to target user
             user = User.query.get(payment.user_id)
@@ -446,7 +440,7 @@ def get_payment_history():
             error_out=False
         )
         
-        payments_data = [payment.to_dict() for payment in payments.items]
+        payments_data = PaymentTransaction.to_dict_list(payments.items)
         
         return jsonify({
             'payments': payments_data,
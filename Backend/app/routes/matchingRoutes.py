@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db
 from app.models.userModel import User
 from app.models.matchRequestModel import MatchRequest
 from app.models.matchModel import Match
 from app.models.userInterestModel import UserInterest
+from app.services.matchService import MatchService
+from app.services.candidateIndexService import opposite_gender
+from app.services.conversationService import ConversationService, decode_cursor
+from app.services.demographicsService import demographic_histogram
 from datetime import datetime
 
 matching_bp = Blueprint('matching', __name__, url_prefix='/api/matching')
@@ -61,7 +65,7 @@ def create_match_request():
         db.session.commit()
         
         # Find potential matches
-        potential_matches = User.get_potential_matches(
+        potential_matches = User.get_potential_match_ids(
             requester_id=current_user_id,
             age_min=age_min,
             age_max=age_max,
@@ -113,59 +117,27 @@ def get_match_profiles():
         
         print(f"Match request found: age {match_request.age_min}-{match_request.age_max}, town: {match_request.preferred_town}")
         
-        # Get potential matches
+        # One page of the deck; swiped profiles are excluded in SQL
+        cursor = request.args.get('cursor', type=int)
         try:
-            potential_matches = User.get_potential_matches(
-                requester_id=current_user_id,
-                age_min=match_request.age_min,
-                age_max=match_request.age_max,
-                preferred_town=match_request.preferred_town
-            )
-            print(f"Found {len(potential_matches)} potential matches")
+            deck = MatchService.get_swipe_deck(user, match_request, cursor=cursor, limit=20,
+                                               include_swiped=include_swiped)
+            print(f"Found {len(deck['users'])} profiles, {deck['total_unswiped']} unswiped in total")
         except Exception as e:
             print(f"Error getting potential matches: {str(e)}")
             return jsonify({'message': f'Error finding matches: {str(e)}'}), 500
         
-        # Get users that have already been swiped on
-        swiped_user_ids = set()
-        swiped_user_info = {}
-        
-        try:
-            # Get existing interests (swipes)
-            existing_interests = UserInterest.query.filter_by(interested_user_id=current_user_id).all()
-            for interest in existing_interests:
-                swiped_user_ids.add(interest.target_user_id)
-                swiped_user_info[interest.target_user_id] = {
-                    'action': 'like' if interest.interest_type == 'details' else 'pass',
-                    'swipedAt': interest.created_at.isoformat()
-                }
-            print(f"User has already swiped on {len(swiped_user_ids)} users")
-        except Exception as e:
-            print(f"Error getting existing interests: {str(e)}")
-            # Continue without filtering swiped users
-        
-        # Filter profiles based on include_swiped parameter
-        if include_swiped:
-            # Include all profiles, but mark which ones were swiped
-            filtered_matches = potential_matches
-            print(f"Including all {len(filtered_matches)} profiles (swiped and unswiped)")
-        else:
-            # Only include unswiped profiles (default behavior)
-            filtered_matches = [
-                match for match in potential_matches 
-                if match.id not in swiped_user_ids
-            ]
-            print(f"Found {len(filtered_matches)} unswiped matches")
-        
-        # Convert to swipe profile format
+        # Convert to swipe profile format (photos for the whole page in one query)
         profiles = []
-        for match in filtered_matches[:20]:  # Limit to 20 profiles
+        for match, profile in zip(deck['users'], User.to_swipe_profiles(deck['users'])):
             try:
-                profile = match.to_swipe_profile()
-                
                 # Add swipe history if profile was previously swiped
-                if match.id in swiped_user_info:
-                    profile['previousSwipe'] = swiped_user_info[match.id]
+                interest = deck['swipes'].get(match.id)
+                if interest:
+                    profile['previousSwipe'] = {
+                        'action': 'like' if interest.interest_type == 'details' else 'pass',
+                        'swipedAt': interest.created_at.isoformat()
+                    }
                     profile['isRevisit'] = True
                 else:
                     profile['isRevisit'] = False
@@ -183,10 +155,11 @@ def get_match_profiles():
         return jsonify({
             'profiles': profiles,
             'total': len(profiles),
-            'hasMore': len(filtered_matches) > 20,
+            'hasMore': deck['has_more'],
+            'nextCursor': deck['next_cursor'],
             'includeSwiped': include_swiped,
-            'totalSwiped': len(swiped_user_ids),
-            'totalUnswiped': len(potential_matches) - len(swiped_user_ids)
+            'totalSwiped': deck['total_swiped'],
+            'totalUnswiped': deck['total_unswiped']
         }), 200
         
     except Exception as e:
@@ -240,144 +213,18 @@ def record_swipe():
         
         print(f"Target user found: {target_user.first_name or target_user.name} (ID: {target_user_id})")
         
-        # Check if already swiped on this user
-        existing_interest = UserInterest.query.filter_by(
-            interested_user_id=current_user_id,
-            target_user_id=target_user_id
-        ).first()
-        
-        if existing_interest:
-            print(f"User {current_user_id} already swiped on user {target_user_id}, updating existing swipe")
-            # Update existing swipe instead of creating new one
-            old_interest_type = existing_interest.interest_type
-            new_interest_type = 'details' if action == 'like' else 'describe'
-            
-            # If changing from like to pass, remove any existing match
-            if old_interest_type == 'details' and new_interest_type == 'describe':
-                existing_match = Match.query.filter(
-                    ((Match.requester_id == current_user_id) & (Match.matched_user_id == target_user_id)) |
-                    ((Match.requester_id == target_user_id) & (Match.matched_user_id == current_user_id))
-                ).first()
-                if existing_match:
-                    print(f"Removing match due to swipe change")
-                    db.session.delete(existing_match)
-            
-            # Update the existing interest
-            existing_interest.interest_type = new_interest_type
-            existing_interest.created_at = datetime.utcnow()  # Update timestamp
-            print(f"Updated existing swipe: {old_interest_type} -> {new_interest_type}")
-        else:
-            # Create new swipe as before
-            try:
-                print(f"About to create UserInterest with action: {action}")
-                print(f"UserInterest constructor signature: interested_user_id, target_user_id, interest_type")
-                
-                if action == 'like':
-                    # Only create UserInterest for likes, not for passes
-                    # Use 'details' for likes (allowed by database constraint)
-                    print(f"Creating like UserInterest: {current_user_id}, {target_user_id}, 'details'")
-                    user_interest = UserInterest(
-                        current_user_id,
-                        target_user_id,
-                        'details'  # Use 'details' for likes (allowed value)
-                    )
-                    db.session.add(user_interest)
-                    print(f"Created UserInterest: {current_user_id} -> {target_user_id} (like)")
-                else:
-                    # For passes, we still need to track that we've seen this user
-                    # Use 'describe' for passes (allowed by database constraint)
-                    print(f"Creating pass UserInterest: {current_user_id}, {target_user_id}, 'describe'")
-                    user_interest = UserInterest(
-                        current_user_id,
-                        target_user_id,
-                        'describe'  # Use 'describe' for passes (allowed value)
-                    )
-                    db.session.add(user_interest)
-                    print(f"Created UserInterest: {current_user_id} -> {target_user_id} (pass)")
-            except Exception as e:
-                print(f"Error creating UserInterest: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return jsonify({'message': f'Failed to create user interest: {str(e)}'}), 500
-        
-        # Record the swipe
+        # A single swipe is a batch of one: same interest, match and seen-set rules as /swipes
         try:
-            print(f"About to create UserInterest with action: {action}")
-            print(f"UserInterest constructor signature: interested_user_id, target_user_id, interest_type")
-            
-            if action == 'like':
-                # Only create UserInterest for likes, not for passes
-                # Use 'details' for likes (allowed by database constraint)
-                print(f"Creating like UserInterest: {current_user_id}, {target_user_id}, 'details'")
-                user_interest = UserInterest(
-                    current_user_id,
-                    target_user_id,
-                    'details'  # Use 'details' for likes (allowed value)
-                )
-                db.session.add(user_interest)
-                print(f"Created UserInterest: {current_user_id} -> {target_user_id} (like)")
-            else:
-                # For passes, we still need to track that we've seen this user
-                # Use 'describe' for passes (allowed by database constraint)
-                print(f"Creating pass UserInterest: {current_user_id}, {target_user_id}, 'describe'")
-                user_interest = UserInterest(
-                    current_user_id,
-                    target_user_id,
-                    'describe'  # Use 'describe' for passes (allowed value)
-                )
-                db.session.add(user_interest)
-                print(f"Created UserInterest: {current_user_id} -> {target_user_id} (pass)")
-        except Exception as e:
-            print(f"Error creating UserInterest: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'message': f'Failed to create user interest: {str(e)}'}), 500
-        
-        is_match = False
-        
-        # If it's a like, check for mutual interest (match)
-        if action == 'like':
-            try:
-                # Check if the target user has also liked this user (details type interest)
-                mutual_interest = UserInterest.query.filter_by(
-                    interested_user_id=target_user_id,
-                    target_user_id=current_user_id,
-                    interest_type='details'  # Only check for likes (details), not passes (describe)
-                ).first()
-                
-                if mutual_interest:
-                    print(f"Mutual interest found! Creating match between {current_user_id} and {target_user_id}")
-                    
-                    # It's a match! Create match record
-                    existing_match = Match.query.filter(
-                        ((Match.requester_id == current_user_id) & (Match.matched_user_id == target_user_id)) |
-                        ((Match.requester_id == target_user_id) & (Match.matched_user_id == current_user_id))
-                    ).first()
-                    
-                    if not existing_match:
-                        match = Match(
-                            requester_id=current_user_id,
-                            matched_user_id=target_user_id
-                        )
-                        db.session.add(match)
-                        is_match = True
-                        print(f"Match created successfully")
-                    else:
-                        print(f"Match already exists")
-                        is_match = True  # Still consider it a match
-                else:
-                    print(f"No mutual interest found")
-            except Exception as e:
-                print(f"Error checking for mutual interest: {str(e)}")
-                # Continue without creating match
-        
-        try:
-            db.session.commit()
+            result = MatchService.record_swipes(user.id, {target_user_id: action})
             print(f"Swipe recorded successfully")
         except Exception as e:
-            print(f"Error committing to database: {str(e)}")
-            db.session.rollback()
+            print(f"Error recording swipe: {str(e)}")
             return jsonify({'message': f'Failed to save swipe: {str(e)}'}), 500
+
+        # A like is a match whenever the target likes this user back, new match or not
+        is_match = target_user_id in result['mutual']
+        if is_match:
+            print(f"Mutual interest between {current_user_id} and {target_user_id}")
         
         # Prepare response
         response_data = {
@@ -404,10 +251,73 @@ def record_swipe():
         db.session.rollback()
         return jsonify({'message': f'Failed to record swipe: {str(e)}'}), 500
 
+@matching_bp.route('/swipes', methods=['POST'])
+@jwt_required()
+def record_swipes():
+    """Record a batch of swipes: {"swipes": [{"targetUserId", "action"}, ...]} (or a bare list)
+
+    Later swipes on the same target win. Returns the matches the batch created.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+
+        data = request.get_json()
+        swipes = data.get('swipes') if isinstance(data, dict) else data
+        if not swipes or not isinstance(swipes, list):
+            return jsonify({'message': 'swipes must be a non-empty list'}), 400
+
+        max_size = current_app.config.get('SWIPE_BATCH_MAX_SIZE', 100)
+        if len(swipes) > max_size:
+            return jsonify({
+                'message': f'Batch too large: {len(swipes)} swipes (max {max_size})',
+                'maxBatchSize': max_size
+            }), 413
+
+        actions = {}
+        for index, swipe in enumerate(swipes):
+            if not isinstance(swipe, dict) or 'targetUserId' not in swipe or 'action' not in swipe:
+                return jsonify({'message': f'Swipe {index}: targetUserId and action are required'}), 400
+            try:
+                target_user_id = int(swipe['targetUserId'])
+            except (ValueError, TypeError):
+                return jsonify({'message': f'Swipe {index}: invalid target user ID'}), 400
+            if swipe['action'] not in ['like', 'pass']:
+                return jsonify({'message': f'Swipe {index}: action must be "like" or "pass"'}), 400
+            if target_user_id == current_user_id:
+                return jsonify({'message': f'Swipe {index}: cannot swipe on yourself'}), 400
+            actions[target_user_id] = swipe['action']
+
+        if not User.query.filter(User.id == current_user_id).count():
+            return jsonify({'message': 'User not found'}), 404
+
+        result = MatchService.record_swipes(current_user_id, actions)
+
+        matched_users = User.query.filter(User.id.in_([target for _, target in result['matches']])).all()
+        profiles = {
+            matched.id: profile for matched, profile in zip(matched_users, User.to_swipe_profiles(matched_users))
+        }
+        return jsonify({
+            'message': 'Swipes recorded successfully',
+            'recorded': len(actions) - len(result['missing']),
+            'missingUserIds': result['missing'],
+            'matches': [{
+                'matchId': match_id,
+                'userId': target_user_id,
+                'user': profiles.get(target_user_id)
+            } for match_id, target_user_id in result['matches']]
+        }), 200
+
+    except Exception as e:
+        print(f"Error in record_swipes: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        return jsonify({'message': f'Failed to record swipes: {str(e)}'}), 500
+
 @matching_bp.route('/matches', methods=['GET'])
 @jwt_required()
 def get_user_matches():
-    """Get user's matches"""
+    """Get user's matches, most recent activity first"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -415,28 +325,31 @@ def get_user_matches():
         if not user:
             return jsonify({'message': 'User not found'}), 404
         
-        # Get all matches for this user
-        matches = Match.query.filter(
-            (Match.requester_id == current_user_id) | (Match.matched_user_id == current_user_id)
-        ).all()
+        # Keyset pagination: pass next_cursor back as `after`; without `limit` everything is returned
+        after = request.args.get('after')
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({'message': 'limit must be positive'}), 400
+        try:
+            cursor = decode_cursor(after) if after else None
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
         
-        match_profiles = []
-        for match in matches:
-            # Get the other user in the match
-            other_user_id = match.matched_user_id if match.requester_id == current_user_id else match.requester_id
-            other_user = User.query.get(other_user_id)
-            
-            if other_user:
-                match_profiles.append({
-                    'matchId': match.id,
-                    'user': other_user.to_swipe_profile(),
-                    'matchedAt': match.created_at.isoformat(),
-                    'isMutual': True  # All matches in our system are mutual
-                })
+        # Matches with the other user's row in one query, then their photos in one more
+        rows, next_cursor = ConversationService.get_conversations(user.id, after=cursor, limit=limit)
+        profiles = User.to_swipe_profiles([row.User for row in rows])
+        
+        match_profiles = [{
+            'matchId': row.Match.id,
+            'user': profile,
+            'matchedAt': row.Match.created_at.isoformat(),
+            'isMutual': True  # All matches in our system are mutual
+        } for row, profile in zip(rows, profiles)]
         
         return jsonify({
             'matches': match_profiles,
-            'total': len(match_profiles)
+            'total': len(match_profiles),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -457,7 +370,8 @@ def undo_last_swipe():
         
         # Get the most recent UserInterest for this user
         last_interest = UserInterest.query.filter_by(
-            interested_user_id=current_user_id
+            interested_user_id=current_user_id,
+            superseded_at=None
         ).order_by(UserInterest.created_at.desc()).first()
         
         if not last_interest:
@@ -517,7 +431,8 @@ def can_undo_swipe():
         
         # Get the most recent UserInterest for this user
         last_interest = UserInterest.query.filter_by(
-            interested_user_id=current_user_id
+            interested_user_id=current_user_id,
+            superseded_at=None
         ).order_by(UserInterest.created_at.desc()).first()
         
         can_undo = last_interest is not None
@@ -560,4 +475,52 @@ def get_registration_status():
         }), 200
         
     except Exception as e:
-        return jsonify({'message': f'Failed to get registration status: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Failed to get registration status: {str(e)}'}), 500
+
+
+@matching_bp.route('/preview', methods=['GET'])
+@jwt_required()
+def preview_match_count():
+    """How many candidates a match request would find, without making it"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+
+        town = (request.args.get('town') or '').strip()
+        if not town:
+            return jsonify({'message': 'town is required'}), 400
+
+        age_min = int(request.args.get('ageMin', 18))
+        age_max = int(request.args.get('ageMax', 100))
+        if age_min < 18 or age_max > 100:
+            return jsonify({'message': 'Age must be between 18 and 100'}), 400
+        if age_min > age_max:
+            return jsonify({'message': 'Minimum age must not exceed maximum age'}), 400
+
+        gender = opposite_gender(user.gender)
+        ages = demographic_histogram.ages(gender, age_min, age_max, town)
+        count = sum(ages)
+        suggestion = None
+        if not count:
+            nearest = demographic_histogram.suggest_range(gender, age_min, age_max, town)
+            if nearest:
+                suggestion = {'ageMin': nearest[0], 'ageMax': nearest[1], 'matchCount': nearest[2]}
+
+        return jsonify({
+            'matchCount': count,
+            'byAge': {str(age_min + offset): n for offset, n in enumerate(ages) if n},
+            'suggestion': suggestion,
+            'request': {
+                'ageMin': age_min,
+                'ageMax': age_max,
+                'town': town
+            }
+        }), 200
+
+    except ValueError:
+        return jsonify({'message': 'Invalid age values'}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to preview matches: {str(e)}'}), 500
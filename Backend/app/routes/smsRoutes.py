@@ -1,5 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.services.smsMessagesService import SmsService
+from app.services.smsBatchService import SmsBatchService
+from app.services.smsEngineService import sms_engine
+from app.services.smsDedupService import sms_deduplicator
+from app.services.smsContext import SmsContext
 import logging
 
 # Reduce logging verbosity
@@ -13,6 +17,98 @@ def normalize_phone(phone):
         return phone[1:]
     return phone
 
+def _handle_message(data, context):
+    """Validate the sender and run one SMS through SmsService; returns (body, status_code)"""
+    from_phone = data['from_phone']
+    to_phone = data['to_phone']
+    message_body = data['message_body']
+    direction = data['direction']
+    
+    # Check if this is a PENZI activation command - these should bypass user validation
+    is_penzi_command = message_body.strip().upper() == 'PENZI'
+    
+    # Only validate user existence for non-PENZI commands
+    if not is_penzi_command and direction == 'incoming':
+        try:
+            user = context.user
+            user_message = context.lookup_message
+            
+            if not user:
+                return {
+                    'success': False,
+                    'from_phone': from_phone,
+                    'to_phone': to_phone,
+                    'message_body': message_body,
+                    'direction': direction,
+                    'error': f'User not found: {user_message}. Please send PENZI to 22141 to activate service first.',
+                    'debug_info': {
+                        'searched_phone': from_phone,
+                        'normalized_phone': context.normalized_phone
+                    },
+                    'status': 'user_not_found'
+                }, 404
+            
+        except Exception as user_check_error:
+            return {
+                'success': False,
+                'from_phone': from_phone,
+                'to_phone': to_phone,
+                'message_body': message_body,
+                'direction': direction,
+                'error': f'User validation failed: {str(user_check_error)}',
+                'error_type': type(user_check_error).__name__,
+                'status': 'user_validation_failed'
+            }, 500
+    
+    # Initialize SMS service
+    sms_service = SmsService()
+    
+    # Process the incoming SMS with detailed error handling
+    if direction == 'incoming':
+        try:
+            response = sms_service.process_incoming_sms(from_phone, message_body, context)
+            
+            # Check if the response indicates success or failure
+            response_success = response.get('success', True) if isinstance(response, dict) else True
+            
+            if not response_success:
+                return {
+                    'success': False,
+                    'from_phone': from_phone,
+                    'to_phone': to_phone,
+                    'message_body': message_body,
+                    'direction': direction,
+                    'error': response.get('message', 'SMS processing failed'),
+                    'sms_service_response': response,
+                    'status': 'sms_processing_failed'
+                }, 400
+            
+        except Exception as sms_error:
+            return {
+                'success': False,
+                'from_phone': from_phone,
+                'to_phone': to_phone,
+                'message_body': message_body,
+                'direction': direction,
+                'error': str(sms_error),
+                'error_type': type(sms_error).__name__,
+                'status': 'sms_service_exception'
+            }, 500
+    else:
+        # Handle outgoing messages if needed
+        response = sms_service.send_response(to_phone, message_body)
+    
+    # Return successful response
+    return {
+        'success': True,
+        'from_phone': from_phone,
+        'to_phone': to_phone,
+        'message_body': message_body,
+        'direction': direction,
+        'response': response,
+        'status': 'processed'
+    }, 200
+
 @sms_bp.route('/process-incoming', methods=['POST'])
 def process_incoming_sms():
     """Process incoming SMS messages with enhanced error handling"""
@@ -49,92 +145,23 @@ def process_incoming_sms():
                 'error': 'Direction must be either "incoming" or "outgoing"'
             }), 400
         
-        # Check if this is a PENZI activation command - these should bypass user validation
-        is_penzi_command = message_body.strip().upper() == 'PENZI'
+        # Hand off to the per-phone ordered lanes when the processing engine is running
+        if sms_engine.enabled and direction == 'incoming':
+            message = SmsBatchService.message_fields(data)
+            result = sms_engine.process(message)
+            if result is None:
+                return jsonify(dict(message, success=True, status='queued')), 202
+            status_code = result.pop('status_code', 200)
+            return jsonify(result), status_code
         
-        # Only validate user existence for non-PENZI commands
-        if not is_penzi_command and direction == 'incoming':
-            try:
-                from app.services.userService import UserService
-                from app.models.userModel import RegistrationStage
-                
-                user, user_message = UserService.get_user_by_phone(from_phone)
-                
-                if not user:
-                    return jsonify({
-                        'success': False,
-                        'from_phone': from_phone,
-                        'to_phone': to_phone,
-                        'message_body': message_body,
-                        'direction': direction,
-                        'error': f'User not found: {user_message}. Please send PENZI to 22141 to activate service first.',
-                        'debug_info': {
-                            'searched_phone': from_phone,
-                            'normalized_phone': UserService.validate_phone_number(from_phone)
-                        },
-                        'status': 'user_not_found'
-                    }), 404
-                
-            except Exception as user_check_error:
-                return jsonify({
-                    'success': False,
-                    'from_phone': from_phone,
-                    'to_phone': to_phone,
-                    'message_body': message_body,
-                    'direction': direction,
-                    'error': f'User validation failed: {str(user_check_error)}',
-                    'error_type': type(user_check_error).__name__,
-                    'status': 'user_validation_failed'
-                }), 500
+        # Optional provider message ID: retried webhooks get the stored reply back
+        gateway_message_id = data.get('gateway_message_id') if direction == 'incoming' else None
         
-        # Initialize SMS service
-        sms_service = SmsService()
+        # Sender identity is resolved once here and shared with the SMS service
+        context = SmsContext(from_phone, message_body, gateway_message_id)
         
-        # Process the incoming SMS with detailed error handling
-        if direction == 'incoming':
-            try:
-                response = sms_service.process_incoming_sms(from_phone, message_body)
-                
-                # Check if the response indicates success or failure
-                response_success = response.get('success', True) if isinstance(response, dict) else True
-                
-                if not response_success:
-                    return jsonify({
-                        'success': False,
-                        'from_phone': from_phone,
-                        'to_phone': to_phone,
-                        'message_body': message_body,
-                        'direction': direction,
-                        'error': response.get('message', 'SMS processing failed'),
-                        'sms_service_response': response,
-                        'status': 'sms_processing_failed'
-                    }), 400
-                
-            except Exception as sms_error:
-                return jsonify({
-                    'success': False,
-                    'from_phone': from_phone,
-                    'to_phone': to_phone,
-                    'message_body': message_body,
-                    'direction': direction,
-                    'error': str(sms_error),
-                    'error_type': type(sms_error).__name__,
-                    'status': 'sms_service_exception'
-                }), 500
-        else:
-            # Handle outgoing messages if needed
-            response = sms_service.send_response(to_phone, message_body)
-        
-        # Return successful response
-        return jsonify({
-            'success': True,
-            'from_phone': from_phone,
-            'to_phone': to_phone,
-            'message_body': message_body,
-            'direction': direction,
-            'response': response,
-            'status': 'processed'
-        }), 200
+        body, status_code = sms_deduplicator.run_once(context, to_phone, lambda: _handle_message(data, context))
+        return jsonify(body), status_code
         
     except Exception as e:
         # Handle any errors
@@ -148,6 +175,66 @@ def process_incoming_sms():
             'status': 'general_exception'
         }), 500
 
+@sms_bp.route('/process-batch', methods=['POST'])
+def process_batch_sms():
+    """Process a batch of incoming SMS (gateway backlog replay)
+
+    Accepts {"messages": [...]} (or a bare list) where each item has the same
+    fields as /process-incoming. Messages from the same phone are processed in
+    order; results come back in input order.
+    """
+    try:
+        data = request.get_json()
+
+        messages = data.get('messages') if isinstance(data, dict) else data
+        if not messages or not isinstance(messages, list):
+            return jsonify({
+                'success': False,
+                'message': 'No messages provided'
+            }), 400
+
+        max_size = current_app.config.get('SMS_BATCH_MAX_SIZE', 500)
+        if len(messages) > max_size:
+            return jsonify({
+                'success': False,
+                'error': f'Batch too large: {len(messages)} messages (max {max_size})',
+                'max_batch_size': max_size
+            }), 413
+
+        if sms_engine.enabled:
+            results = sms_engine.process_batch(messages)
+        else:
+            batch_service = SmsBatchService(max_workers=current_app.config.get('SMS_BATCH_WORKERS', 4))
+            results = batch_service.process_batch(messages)
+
+        processed = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'total': len(results),
+            'processed': processed,
+            'failed': len(results) - processed,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        from app.extensions import db
+        db.session.rollback()
+
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__,
+            'status': 'general_exception'
+        }), 500
+
+@sms_bp.route('/engine/metrics', methods=['GET'])
+def get_engine_metrics():
+    """Lane depth, throughput and latency of the SMS processing engine"""
+    return jsonify({
+        'success': True,
+        'data': sms_engine.metrics()
+    }), 200
+
 @sms_bp.route('/send-message', methods=['POST'])
 def send_message():
     """Send SMS message"""
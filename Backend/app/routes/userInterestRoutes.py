@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.services.userInterestService import UserInterestService
+from app.services.mutualMatchService import MutualMatchService
 from app.utils.validators import validate_phone_number, normalize_phone_number
 from app.utils.response_helper import success_response, error_response
 import logging
@@ -232,11 +233,18 @@ def get_mutual_matches():
         if not user:
             return error_response("User not found", 404)
 
-        mutual_matches = UserInterestService.get_mutual_matches(user.id)
+        # Keyset pagination: pass next_cursor back as `after`; without `limit` everything is returned
+        after = request.args.get('after', type=int)
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return error_response("limit must be positive", 400)
+
+        mutual_matches, next_cursor = MutualMatchService.get_mutual_matches(user.id, after=after, limit=limit)
 
         response_data = {
             'matches': mutual_matches,
-            'total': len(mutual_matches)
+            'total': len(mutual_matches),
+            'next_cursor': next_cursor
         }
 
         return success_response(response_data, "Mutual matches retrieved successfully")
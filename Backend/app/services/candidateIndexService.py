@@ -0,0 +1,417 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from app.extensions import db
+from app.models.townModel import normalize_place
+from app.models.userModel import User, Gender, RegistrationStage
+from app.services.geoService import geo_index
+from app.services.locationService import location_service
+from app.services.userEvents import user_events
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+_FIELDS = ('gender', 'town_id', 'town', 'age', 'is_active', 'registration_stage', 'created_at')
+
+
+def opposite_gender(gender):
+    return Gender.FEMALE if gender == Gender.MALE else Gender.MALE
+
+
+def town_key(values):
+    """Town a candidate is counted under: their ``town_id``, else their normalized town text (None if neither)"""
+    if values.get('town_id') is not None:
+        return values['town_id']
+    return normalize_place(values.get('town')) or None
+
+
+def town_clause(town_ids, town):
+    """SQL filter for users living in ``town_ids``, or unplaced users whose town text contains ``town``"""
+    unplaced = and_(User.town_id.is_(None), User.town.ilike(f'%{town.strip()}%'))
+    return or_(User.town_id.in_(town_ids), unplaced) if town_ids else unplaced
+
+
+def _created_key(created_at):
+    return (created_at - _EPOCH).total_seconds() if created_at else 0.0
+
+
+class _Bucket:
+    """Candidates of one gender in one town as parallel arrays sorted by age"""
+    __slots__ = ('ages', 'ids', 'created')
+
+    def __init__(self):
+        self.ages = array('i')
+        self.ids = array('q')
+        self.created = array('d')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, user_id, age, created):
+        pos = bisect_right(self.ages, age)
+        self.ages.insert(pos, age)
+        self.ids.insert(pos, user_id)
+        self.created.insert(pos, created)
+
+    def remove(self, user_id, age):
+        for pos in range(bisect_left(self.ages, age), bisect_right(self.ages, age)):
+            if self.ids[pos] == user_id:
+                del self.ages[pos]
+                del self.ids[pos]
+                del self.created[pos]
+                return True
+        return False
+
+    def select(self, age_min, age_max):
+        lo = bisect_left(self.ages, age_min)
+        hi = bisect_right(self.ages, age_max)
+        return zip(self.created[lo:hi], self.ids[lo:hi])
+
+
+class CandidateIndex:
+    """In-memory index of match candidates: completed, active users.
+
+    Candidates are bucketed by gender and ``town_id``; each bucket keeps
+    ages, IDs and creation times in sorted arrays so an age range is two
+    bisects. The searched town is resolved through the gazetteer
+    (LocationService.covering), so a search is a lookup of the matching town
+    buckets. Users whose town did not resolve are bucketed by their
+    normalized town text and found with the old substring test on those
+    (few) keys.
+
+    The index is loaded with one query and then kept current from the user
+    change feed. Writes the feed cannot see (bulk updates, other processes
+    such as lane workers) are picked up by a full rebuild at most every
+    ``refresh_interval_s`` seconds. With ``CANDIDATE_INDEX_MODE=off`` every
+    search goes to the database instead.
+
+    Popular searches are answered from a shared result cache keyed by
+    (gender, age range, resolved towns) holding the ordered ID list. Entries
+    live ``cache_ttl_s`` seconds in an LRU of ``cache_size``; a user change
+    from the feed drops the entries whose gender, town and age range it
+    falls in, and the TTL bounds staleness from writes the feed cannot see.
+    The requester is filtered out when reading, so everyone shares entries.
+    """
+
+    def __init__(self, refresh_interval_s=60, cache_ttl_s=120, cache_size=1000):
+        self.refresh_interval_s = refresh_interval_s
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_size = cache_size
+        self.enabled = True
+        self._towns = {}    # gender -> {town_id or unplaced town text: _Bucket}
+        self._members = {}  # user_id -> (gender, town key, age)
+        self._dirty = set()
+        self._rebuilding = None
+        self._built_at = None
+        self._results = OrderedDict()  # (gender, age_min, age_max, town_ids, text) -> (expires, IDs)
+        self._result_keys = {}         # (gender, town_id) -> cache keys covering that town
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {'searches': 0, 'rebuilds': 0, 'refreshed': 0, 'cache_hits': 0, 'cache_misses': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CANDIDATE_INDEX_MODE', 'memory') == 'memory'
+        self.refresh_interval_s = int(app.config.get('CANDIDATE_INDEX_REFRESH_S', self.refresh_interval_s))
+        self.cache_ttl_s = int(app.config.get('CANDIDATE_CACHE_TTL_S', self.cache_ttl_s))
+        self.cache_size = int(app.config.get('CANDIDATE_CACHE_SIZE', self.cache_size))
+        user_events.subscribe(self.on_user_change)
+
+    def search(self, gender, age_min, age_max, town, exclude_user_id=None, limit=None):
+        """IDs of candidates of ``gender`` aged age_min..age_max living in ``town``.
+
+        Newest registrations first, like the ``ORDER BY created_at DESC`` scans
+        this replaces. In radius mode (GeoIndex) ``town`` covers every town
+        within the match radius and candidates come nearest town first, then
+        newest first. Must be called inside an app context.
+        """
+        text = normalize_place(town)
+        if not text:
+            return []
+        town_ids = self.resolve_towns(town)
+        if self.enabled:
+            self._ensure_fresh()
+
+        # Radius results are in distance order, so the town order is part of the key
+        by_distance = geo_index.enabled
+        key = (gender, age_min, age_max, tuple(town_ids) if by_distance else tuple(sorted(town_ids)), text)
+        cached = self._cached(key)
+        if cached is None:
+            with self._lock:
+                generation = self._generation
+            if self.enabled:
+                cached = self._search_memory(gender, age_min, age_max, town_ids, text, by_distance)
+            else:
+                cached = array('q', self._search_db(gender, age_min, age_max, town_ids, town,
+                                                    by_distance=by_distance))
+            self._store(key, cached, generation)
+
+        user_ids = [user_id for user_id in cached if user_id != exclude_user_id]
+        return user_ids[:limit] if limit else user_ids
+
+    @staticmethod
+    def resolve_towns(town):
+        """Town IDs a search for ``town`` covers: the towns it names, or every town within the radius of them"""
+        town_ids = location_service.covering(town)
+        if geo_index.enabled:
+            return [town_id for town_id, _ in geo_index.towns_around(town_ids)]
+        return town_ids
+
+    def search_for(self, user, age_min, age_max, town, limit=None):
+        """Candidates of the opposite gender for ``user``"""
+        return self.search(opposite_gender(user.gender), age_min, age_max, town,
+                           exclude_user_id=user.id, limit=limit)
+
+    @staticmethod
+    def load_users(user_ids):
+        """User objects for ``user_ids`` in the same order, with one IN query"""
+        if not user_ids:
+            return []
+        users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+        return [users[user_id] for user_id in user_ids if user_id in users]
+
+    def rebuild(self):
+        """Reload every candidate from the database"""
+        with self._lock:
+            self._rebuilding = set()
+
+        rows = db.session.query(
+            User.id, User.gender, User.town_id, User.town, User.age, User.created_at
+        ).filter(
+            User.is_active.is_(True),
+            User.registration_stage == RegistrationStage.COMPLETED,
+            User.gender.isnot(None),
+            User.age.isnot(None),
+            or_(User.town_id.isnot(None), User.town.isnot(None))
+        ).order_by(User.age).all()
+
+        towns = {}
+        members = {}
+        for row in rows:
+            key = town_key(row._asdict())
+            if key is None:
+                continue
+            bucket = towns.setdefault(row.gender, {}).get(key)
+            if bucket is None:
+                bucket = towns[row.gender][key] = _Bucket()
+            bucket.ages.append(row.age)
+            bucket.ids.append(row.id)
+            bucket.created.append(_created_key(row.created_at))
+            members[row.id] = (row.gender, key, row.age)
+
+        with self._lock:
+            self._towns = towns
+            self._members = members
+            # Changes published while the query ran may predate its snapshot
+            self._dirty |= self._rebuilding
+            self._rebuilding = None
+            self._built_at = time.monotonic()
+            self._stats['rebuilds'] += 1
+        logger.info(f"Candidate index rebuilt with {len(members)} users")
+        return len(members)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+            self._clear_results()
+
+    def refresh_users(self, user_ids):
+        """Re-read these users on the next search (changes made by other processes)"""
+        with self._lock:
+            self._dirty.update(user_ids)
+            self._clear_results()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, candidates=len(self._members), cached_searches=len(self._results),
+                        towns=sum(len(towns) for towns in self._towns.values()))
+
+    def on_user_change(self, change):
+        with self._lock:
+            if self._rebuilding is not None:
+                self._rebuilding.add(change.user_id)
+            if change.op == 'update' and not any(change.changed(field) for field in _FIELDS):
+                return
+            # Cached results that held the user before the change or should hold it after
+            self._invalidate_results(change.before)
+            self._invalidate_results(change.after)
+            if change.after is None:
+                self._remove(change.user_id)
+            elif all(field in change.after for field in _FIELDS):
+                self._apply(change.user_id, change.after)
+            else:
+                self._dirty.add(change.user_id)
+
+    def _ensure_fresh(self):
+        stale = self._built_at is None or time.monotonic() - self._built_at >= self.refresh_interval_s
+        if stale:
+            # Only the first caller rebuilds; the rest keep serving the current index
+            if self._refresh_lock.acquire(blocking=self._built_at is None):
+                try:
+                    if self._built_at is None or time.monotonic() - self._built_at >= self.refresh_interval_s:
+                        self.rebuild()
+                finally:
+                    self._refresh_lock.release()
+        if self._dirty:
+            self._refresh_dirty()
+
+    def _refresh_dirty(self):
+        with self._lock:
+            user_ids, self._dirty = self._dirty, set()
+        if not user_ids:
+            return
+
+        rows = db.session.query(
+            User.id, User.gender, User.town_id, User.town, User.age, User.is_active,
+            User.registration_stage, User.created_at
+        ).filter(User.id.in_(user_ids)).all()
+
+        with self._lock:
+            found = set()
+            for row in rows:
+                found.add(row.id)
+                self._apply(row.id, row._asdict())
+            for user_id in user_ids - found:
+                self._remove(user_id)
+            self._stats['refreshed'] += len(user_ids)
+
+    def _search_memory(self, gender, age_min, age_max, town_ids, text, by_distance=False):
+        rows = []
+        with self._lock:
+            self._stats['searches'] += 1
+            buckets = self._towns.get(gender, {})
+            for rank, town_id in enumerate(town_ids):
+                bucket = buckets.get(town_id)
+                if bucket is not None:
+                    # town_ids come nearest first; negated, nearer towns lead the descending sort
+                    rows.extend((-rank if by_distance else 0, created, user_id)
+                                for created, user_id in bucket.select(age_min, age_max))
+            # Unplaced users have no distance, so they come after every town in the radius
+            for key, bucket in buckets.items():
+                if isinstance(key, str) and text in key:
+                    rows.extend((-len(town_ids) if by_distance else 0, created, user_id)
+                                for created, user_id in bucket.select(age_min, age_max))
+        rows.sort(reverse=True)
+        return array('q', (user_id for _, _, user_id in rows))
+
+    def _cached(self, key):
+        if self.cache_ttl_s <= 0:
+            return None
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._results.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                return entry[1]
+            self._stats['cache_misses'] += 1
+            if entry is not None:
+                self._drop_result(key)
+        return None
+
+    def _store(self, key, user_ids, generation):
+        if self.cache_ttl_s <= 0:
+            return
+        with self._lock:
+            # A user change landed while searching: the result may already be stale
+            if generation != self._generation:
+                return
+            if key in self._results:
+                self._drop_result(key)
+            self._results[key] = (time.monotonic() + self.cache_ttl_s, user_ids)
+            for town_id in key[3]:
+                self._result_keys.setdefault((key[0], town_id), set()).add(key)
+            while len(self._results) > self.cache_size:
+                self._drop_result(next(iter(self._results)))
+
+    def _drop_result(self, key):
+        self._results.pop(key, None)
+        for town_id in key[3]:
+            keys = self._result_keys.get((key[0], town_id))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._result_keys[(key[0], town_id)]
+
+    def _invalidate_results(self, values):
+        if values is None:
+            return
+        self._generation += 1
+        if not self._results:
+            return
+        if not all(field in values for field in ('gender', 'town_id', 'town', 'age')):
+            # Partial snapshot: the affected entries are unknown
+            self._clear_results()
+            return
+        gender, town, age = values['gender'], town_key(values), values['age']
+        if gender is None or town is None or age is None:
+            return
+        if isinstance(town, str):
+            # Unplaced users are in every cached search whose text their town contains
+            keys = [key for key in self._results if key[0] == gender and key[4] in town]
+        else:
+            keys = list(self._result_keys.get((gender, town), ()))
+        for key in keys:
+            if key[1] <= age <= key[2]:
+                self._drop_result(key)
+
+    def _clear_results(self):
+        self._results.clear()
+        self._result_keys.clear()
+        self._generation += 1
+
+    def _apply(self, user_id, values):
+        self._remove(user_id)
+        town = town_key(values)
+        if (values.get('is_active') and values.get('registration_stage') == RegistrationStage.COMPLETED
+                and values.get('gender') is not None and values.get('age') is not None
+                and town is not None):
+            gender, age = values['gender'], values['age']
+            bucket = self._towns.setdefault(gender, {}).get(town)
+            if bucket is None:
+                bucket = self._towns[gender][town] = _Bucket()
+            bucket.add(user_id, age, _created_key(values.get('created_at')))
+            self._members[user_id] = (gender, town, age)
+
+    def _remove(self, user_id):
+        member = self._members.pop(user_id, None)
+        if member is None:
+            return
+        gender, town, age = member
+        buckets = self._towns.get(gender, {})
+        bucket = buckets.get(town)
+        if bucket is not None:
+            bucket.remove(user_id, age)
+            if not len(bucket):
+                del buckets[town]
+
+    @staticmethod
+    def _search_db(gender, age_min, age_max, town_ids, town, exclude_user_id=None, limit=None, by_distance=False):
+        query = db.session.query(User.id, User.town_id).filter(
+            User.gender == gender,
+            User.age >= age_min,
+            User.age <= age_max,
+            town_clause(town_ids, town),
+            User.is_active.is_(True),
+            User.registration_stage == RegistrationStage.COMPLETED
+        )
+        if exclude_user_id is not None:
+            query = query.filter(User.id != exclude_user_id)
+        query = query.order_by(User.created_at.desc(), User.id.desc())
+        if by_distance:
+            # Nearest town first; the sort is stable, so newest first within a town
+            rank = {town_id: position for position, town_id in enumerate(town_ids)}
+            rows = sorted(query.all(), key=lambda row: rank.get(row.town_id, len(town_ids)))
+            return [row.id for row in (rows[:limit] if limit else rows)]
+        if limit:
+            query = query.limit(limit)
+        return [row.id for row in query.all()]
+
+
+candidate_index = CandidateIndex()
@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_, select, true
+
+from app.extensions import db
+from app.models.chatMessageModel import ChatMessage
+from app.models.matchModel import Match
+from app.models.userModel import User
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(last_message_at, match_id):
+    return f"{last_message_at.isoformat()},{match_id}"
+
+
+def decode_cursor(cursor):
+    """(last_message_at, match_id) from a cursor; raises ValueError for a malformed one"""
+    last_message_at, _, match_id = cursor.rpartition(',')
+    return datetime.fromisoformat(last_message_at), int(match_id)
+
+
+class ConversationService:
+    """A user's matches as a conversation list, most recent activity first.
+
+    One query returns each match with the other user's row, the latest
+    message and the unread count: the latest message comes from a LATERAL
+    join on Postgres (a correlated lookup of the latest message ID
+    elsewhere), both served by the (match_id, created_at) index, and the
+    unread counts are aggregated in a joined subquery. Rows are sorted in
+    SQL by (last activity, match ID), which is also the keyset cursor, so a
+    page costs one round trip however many matches the user has.
+    """
+
+    @staticmethod
+    def get_conversations(user_id, after=None, limit=None):
+        """Conversations of ``user_id``, newest activity first.
+
+        A conversation without messages counts its match's creation as its
+        last activity. ``after`` is the ``next_cursor`` of the previous page;
+        without ``limit`` every remaining conversation is returned. Returns
+        (rows, next cursor or None); each row has ``match``, ``user`` (the
+        other party), ``message_text``, ``message_at``, ``message_is_read``,
+        ``message_sender_id`` (None without messages), ``unread_count`` and
+        ``last_message_at``.
+        """
+        user_id = int(user_id)
+        other_user_id = case((Match.requester_id == user_id, Match.matched_user_id), else_=Match.requester_id)
+
+        visible = and_(ChatMessage.match_id == Match.id, ChatMessage.is_deleted.is_(False))
+        newest_first = (ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        if db.session.get_bind().dialect.name == 'postgresql':
+            latest = select(
+                ChatMessage.message_text, ChatMessage.created_at, ChatMessage.is_read, ChatMessage.sender_id
+            ).where(visible).order_by(*newest_first).limit(1).correlate(Match).lateral('latest_message')
+            latest_on = true()
+        else:
+            latest = ChatMessage.__table__.alias('latest_message')
+            latest_on = latest.c.id == select(ChatMessage.id).where(visible).order_by(
+                *newest_first).limit(1).correlate(Match).scalar_subquery()
+
+        unread = db.session.query(
+            ChatMessage.match_id, func.count(ChatMessage.id).label('unread_count')
+        ).filter(
+            ChatMessage.receiver_id == user_id,
+            ChatMessage.is_read.is_(False),
+            ChatMessage.is_deleted.is_(False)
+        ).group_by(ChatMessage.match_id).subquery()
+
+        last_message_at = func.coalesce(latest.c.created_at, Match.created_at)
+        query = db.session.query(
+            Match,
+            User,
+            latest.c.message_text,
+            latest.c.created_at.label('message_at'),
+            latest.c.is_read.label('message_is_read'),
+            latest.c.sender_id.label('message_sender_id'),
+            func.coalesce(unread.c.unread_count, 0).label('unread_count'),
+            last_message_at.label('last_message_at')
+        ).join(
+            User, User.id == other_user_id
+        ).outerjoin(
+            latest, latest_on
+        ).outerjoin(
+            unread, unread.c.match_id == Match.id
+        ).filter(
+            or_(Match.requester_id == user_id, Match.matched_user_id == user_id)
+        )
+        if after is not None:
+            after_at, after_id = after
+            query = query.filter(or_(
+                last_message_at < after_at,
+                and_(last_message_at == after_at, Match.id < after_id)
+            ))
+
+        query = query.order_by(last_message_at.desc(), Match.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if limit is not None else rows
+        logger.info(f"Loaded {len(rows)} conversations for user {user_id}")
+        return rows, encode_cursor(rows[-1].last_message_at, rows[-1].Match.id) if has_more else None
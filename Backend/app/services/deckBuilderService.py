@@ -0,0 +1,378 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import and_, bindparam, delete, or_, select, update
+
+from app.extensions import db
+from app.models.matchRequestModel import MatchRequest
+from app.models.recommendationDeckModel import RecommendationDeck, pack_keys
+from app.models.townModel import normalize_place
+from app.models.userInterestModel import UserInterest
+from app.models.userModel import User, RegistrationStage
+from app.services.candidateIndexService import candidate_index, opposite_gender, town_key
+from app.services.matchRankingService import match_ranker
+from app.utils.bulk_writes import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+_ID_MASK = (1 << 32) - 1
+
+# Set in each pool worker by _worker_init
+_worker_app = None
+
+
+def build_decks(user_ids, deck_size):
+    """Rebuild the decks of ``user_ids`` from their latest match request; returns the number built.
+
+    Runs in the current app context and commits. Users who are no longer
+    active, completed or searching lose their deck.
+    """
+    users = {
+        user.id: user for user in User.query.filter(
+            User.id.in_(user_ids),
+            User.is_active.is_(True),
+            User.registration_stage == RegistrationStage.COMPLETED
+        ).all()
+    }
+    latest = {}
+    for match_request in MatchRequest.query.filter(MatchRequest.user_id.in_(list(users))).order_by(
+            MatchRequest.user_id, MatchRequest.created_at.desc(), MatchRequest.id.desc()).all():
+        latest.setdefault(match_request.user_id, match_request)
+
+    now = datetime.utcnow()
+    rows = []
+    for user_id, match_request in latest.items():
+        user = users[user_id]
+        candidate_ids = candidate_index.search_for(user, match_request.age_min, match_request.age_max,
+                                                   match_request.preferred_town)
+        keys = match_ranker.keys(user, np.asarray(candidate_ids, dtype=np.int64))
+        rows.append({
+            'user_id': user_id,
+            'age_min': match_request.age_min,
+            'age_max': match_request.age_max,
+            'town_key': normalize_place(match_request.preferred_town),
+            'town_id': match_request.town_id,
+            'candidate_keys': pack_keys(match_ranker.top(keys, deck_size).tolist()),
+            'total_candidates': len(candidate_ids),
+            'is_stale': False,
+            'built_at': now
+        })
+
+    try:
+        table = RecommendationDeck.__table__
+        db.session.execute(delete(table).where(table.c.user_id.in_(list(user_ids))))
+        bulk_insert(RecommendationDeck, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+def _covering_criteria(rows):
+    """user ID -> (town_id, town_key) criteria of the decks whose searches can include that user"""
+    criteria = db.session.query(RecommendationDeck.town_id, RecommendationDeck.town_key).distinct().all()
+    # Each searched town covers what the live search covers: the towns it names, their namesakes and
+    # towns containing the name, and in radius mode every town around them
+    by_town = {}
+    for criterion in criteria:
+        for town_id in candidate_index.resolve_towns(criterion.town_key):
+            by_town.setdefault(town_id, []).append(tuple(criterion))
+
+    covering = {}
+    for row in rows:
+        key = town_key(row._asdict())
+        if isinstance(key, str):
+            # Unplaced users are found by their town text containing the searched one
+            covering[row.id] = [tuple(criterion) for criterion in criteria
+                                if criterion.town_key and criterion.town_key in key]
+        else:
+            covering[row.id] = by_town.get(key, [])
+    return covering
+
+
+def _worker_init():
+    """Pool worker start-up: its own app (and so its own candidate index and ranker)"""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app()
+
+
+def _build_in_worker(user_ids, changed_user_ids, deck_size):
+    with _worker_app.app_context():
+        # The worker's index and ranker have no change feed from the web processes
+        candidate_index.refresh_users(changed_user_ids)
+        match_ranker.refresh_users(changed_user_ids)
+        return build_decks(user_ids, deck_size)
+
+
+class DeckBuilder:
+    """Precomputed recommendation decks, refreshed in the background.
+
+    For every active, completed user with a match request the builder keeps
+    a ``RecommendationDeck``: the ``deck_size`` best candidates for their
+    latest request, ranked by MatchRanker. Every ``interval_s`` seconds it
+
+    * marks decks stale whose criteria cover a user registered or changed
+      since the last pass (``users.updated_at``), or whose owner made a new
+      match request,
+    * picks up to ``max_per_cycle`` stale, missing or older than
+      ``max_age_s`` decks and rebuilds them in batches of ``batch_size``,
+      on a process pool (``DECK_BUILDER_MODE=process``) or in the builder
+      thread (``thread``).
+
+    Request handlers read decks through ``deck_page`` and ``snapshot``
+    whenever the mode is not ``off``, falling back to searching live when
+    the deck is missing, built for other criteria or used up. Stale decks
+    are still served: they only miss the newest candidates until rebuilt.
+    """
+
+    def __init__(self, deck_size=200, interval_s=30, workers=2, batch_size=200,
+                 max_per_cycle=2000, max_age_s=3600):
+        self.deck_size = deck_size
+        self.interval_s = interval_s
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_per_cycle = max_per_cycle
+        self.max_age_s = max_age_s
+        self.mode = 'off'
+        self._app = None
+        self._pool = None
+        self._thread = None
+        self._stopping = False
+        self._watermark = None
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stats = {'cycles': 0, 'built': 0, 'marked_stale': 0, 'served': 0, 'fallbacks': 0}
+
+    def init_app(self, app):
+        """Configure the builder from app config and start it if enabled"""
+        self._app = app
+        self.mode = app.config.get('DECK_BUILDER_MODE', 'off')
+        self.deck_size = int(app.config.get('DECK_SIZE', self.deck_size))
+        self.interval_s = float(app.config.get('DECK_BUILDER_INTERVAL_S', self.interval_s))
+        self.workers = int(app.config.get('DECK_BUILDER_WORKERS', self.workers))
+        self.batch_size = int(app.config.get('DECK_BUILDER_BATCH_SIZE', self.batch_size))
+        self.max_age_s = int(app.config.get('DECK_MAX_AGE_S', self.max_age_s))
+
+        # Pool workers and SMS lane processes build their own app; one builder per server is enough
+        if self.mode in ('thread', 'process') and multiprocessing.parent_process() is None:
+            self.start()
+
+    @property
+    def serving(self):
+        return self.mode in ('thread', 'process')
+
+    @property
+    def enabled(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def start(self):
+        """Start the builder thread (and its process pool)"""
+        if self.enabled:
+            return
+        self._stopping = False
+        if self.mode == 'process':
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self._thread = threading.Thread(target=self._run, name='deck-builder', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Deck builder started ({self.mode}, every {self.interval_s}s, deck size {self.deck_size})")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        atexit.unregister(self.stop)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout=30)
+        self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def run_once(self):
+        """One builder pass: mark stale decks, rebuild what is due; returns the number built.
+
+        Must be called inside an app context.
+        """
+        changed_user_ids = self.mark_stale()
+        due = self._due_user_ids()
+
+        built = 0
+        batches = [due[start:start + self.batch_size] for start in range(0, len(due), self.batch_size)]
+        if self._pool is not None:
+            futures = [self._pool.submit(_build_in_worker, batch, changed_user_ids, self.deck_size)
+                       for batch in batches]
+            for future in futures:
+                try:
+                    built += future.result()
+                except Exception as e:
+                    logger.error(f"Deck build batch failed: {str(e)}")
+        else:
+            for batch in batches:
+                built += build_decks(batch, self.deck_size)
+
+        with self._stats_lock:
+            self._stats['cycles'] += 1
+            self._stats['built'] += built
+        return built
+
+    def mark_stale(self):
+        """Flag decks affected by user and match request changes since the last pass.
+
+        Returns the IDs of the changed users.
+        """
+        since = self._watermark or datetime.utcnow() - timedelta(seconds=self.max_age_s)
+        changed = db.session.query(
+            User.id, User.gender, User.age, User.town_id, User.town, User.updated_at
+        ).filter(User.updated_at > since).all()
+        requesters = [row.user_id for row in db.session.query(MatchRequest.user_id).filter(
+            MatchRequest.created_at > since).distinct()]
+
+        table = RecommendationDeck.__table__
+        marked = 0
+        candidates = [row for row in changed if row.gender is not None and row.age is not None]
+        covering = _covering_criteria(candidates) if candidates else {}
+        params = [
+            {'changed_id': row.id, 'requester_gender': opposite_gender(row.gender), 'age': row.age,
+             'town': town_id, 'searched_town': key}
+            for row in candidates
+            # A row even when no deck covers the user, so their own deck is still marked
+            for town_id, key in covering[row.id] or [(None, None)]
+        ]
+        try:
+            if params:
+                # Decks whose criteria cover the changed user, plus the changed user's own deck
+                requester_ids = select(User.id).where(User.gender == bindparam('requester_gender'))
+                marked += db.session.execute(
+                    update(table).where(or_(
+                        table.c.user_id == bindparam('changed_id'),
+                        and_(or_(table.c.town_id == bindparam('town'),
+                                 and_(table.c.town_id.is_(None), table.c.town_key == bindparam('searched_town'))),
+                             table.c.age_min <= bindparam('age'),
+                             table.c.age_max >= bindparam('age'),
+                             table.c.user_id.in_(requester_ids))
+                    )).values(is_stale=True),
+                    params
+                ).rowcount
+            if requesters:
+                marked += db.session.execute(
+                    update(table).where(table.c.user_id.in_(requesters)).values(is_stale=True)
+                ).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if changed:
+            self._watermark = max(row.updated_at for row in changed)
+        elif self._watermark is None:
+            self._watermark = since
+        with self._stats_lock:
+            self._stats['marked_stale'] += max(marked, 0)
+        return [row.id for row in changed]
+
+    def deck_page(self, user, match_request, limit, after=None):
+        """A swipe deck page from the precomputed deck: (user IDs, next cursor), or None.
+
+        The cursor is a MatchRanker key, the same as the live ranked deck, so
+        paging can fall back to searching live at any point. Profiles the
+        user swiped on since the deck was built are skipped. None means the
+        deck cannot answer: no deck, other criteria or not enough left.
+        """
+        deck = self._deck_for(user.id, match_request.age_min, match_request.age_max,
+                              match_request.preferred_town)
+        if deck is None:
+            return None
+
+        keys = [key for key in deck.keys() if after is None or key < after]
+        if keys:
+            swiped = {
+                row.target_user_id for row in db.session.query(UserInterest.target_user_id).filter(
+                    UserInterest.interested_user_id == user.id,
+                    UserInterest.target_user_id.in_([key & _ID_MASK for key in keys])
+                )
+            }
+            keys = [key for key in keys if key & _ID_MASK not in swiped]
+
+        if len(keys) <= limit and not deck.is_complete():
+            # The rest of the ranking lies beyond the truncated deck
+            self._count('fallbacks')
+            return None
+
+        self._count('served')
+        page = keys[:limit]
+        next_after = page[-1] if len(keys) > limit else None
+        return [key & _ID_MASK for key in page], next_after
+
+    def snapshot(self, user, age_min, age_max, town):
+        """Every candidate for a MATCH# search, best first, from a fresh complete deck; else None.
+
+        The result becomes the match request's stored snapshot, so a stale
+        deck is not good enough here.
+        """
+        deck = self._deck_for(user.id, age_min, age_max, town)
+        if deck is None or deck.is_stale or not deck.is_complete():
+            if deck is not None:
+                self._count('fallbacks')
+            return None
+        self._count('served')
+        return deck.user_ids()
+
+    def _deck_for(self, user_id, age_min, age_max, town):
+        if not self.serving or not match_ranker.enabled:
+            return None
+        deck = db.session.get(RecommendationDeck, user_id)
+        if deck is None or not deck.covers(age_min, age_max, normalize_place(town)):
+            return None
+        return deck
+
+    def _due_user_ids(self):
+        """Owners of stale, expired or missing decks, at most ``max_per_cycle``"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age_s)
+        due = [row.user_id for row in db.session.query(RecommendationDeck.user_id).filter(
+            or_(RecommendationDeck.is_stale.is_(True), RecommendationDeck.built_at < cutoff)
+        ).limit(self.max_per_cycle)]
+
+        if len(due) < self.max_per_cycle:
+            has_deck = select(RecommendationDeck.user_id).where(RecommendationDeck.user_id == User.id).exists()
+            due += [row.id for row in db.session.query(User.id).filter(
+                User.is_active.is_(True),
+                User.registration_stage == RegistrationStage.COMPLETED,
+                User.id.in_(select(MatchRequest.user_id)),
+                ~has_deck
+            ).limit(self.max_per_cycle - len(due))]
+        return due
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                with self._app.app_context():
+                    built = self.run_once()
+                if built:
+                    logger.info(f"Rebuilt {built} recommendation decks")
+            except Exception as e:
+                logger.error(f"Deck builder error: {str(e)}")
+
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(timeout=self.interval_s)
+
+
+deck_builder = DeckBuilder()
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import case, func, or_
+
+from app.extensions import db
+from app.models.townModel import normalize_place
+from app.models.userModel import User, RegistrationStage
+from app.services.candidateIndexService import candidate_index, opposite_gender, town_key
+from app.services.userEvents import user_events
+
+logger = logging.getLogger(__name__)
+
+MIN_AGE = 18
+MAX_AGE = 100
+_FIELDS = ('gender', 'town_id', 'town', 'age', 'is_active', 'registration_stage')
+
+
+def _cell(values):
+    """(gender, town key, age) a user is counted under, or None when they are not a candidate"""
+    if not values or not values.get('is_active') or values.get('registration_stage') != RegistrationStage.COMPLETED:
+        return None
+    gender, town, age = values.get('gender'), town_key(values), values.get('age')
+    if gender is None or town is None or age is None:
+        return None
+    return gender, town, min(max(age, MIN_AGE), MAX_AGE)
+
+
+class DemographicHistogram:
+    """Counts of match candidates (active, completed users) by gender, town and age.
+
+    Answers "how many candidates would this search find?" without running
+    it: a count is the sum of one age slice per searched town, less any
+    candidates the caller excludes by age (e.g. the ones a user has already
+    been sent). Users whose town did not resolve to the gazetteer are
+    counted under their normalized town text and found by substring, as
+    CandidateIndex does. The counts are loaded with one GROUP BY and updated from the user change feed
+    (registration, STOP, profile edits); a change whose previous values are
+    unknown, and writes the feed cannot see, are covered by a full recount
+    at most every ``reconcile_s`` seconds.
+    """
+
+    def __init__(self, reconcile_s=300):
+        self.reconcile_s = reconcile_s
+        self._counts = {}  # (gender, town_id or unplaced town text) -> [count per age, MIN_AGE..MAX_AGE]
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stats = {'counts': 0, 'reloads': 0, 'updates': 0}
+
+    def init_app(self, app):
+        self.reconcile_s = int(app.config.get('DEMOGRAPHICS_RECONCILE_S', self.reconcile_s))
+        user_events.subscribe(self.on_user_change)
+
+    def count(self, gender, age_min, age_max, town, exclude=None):
+        """Candidates of ``gender`` aged age_min..age_max in ``town`` (all towns in the radius in radius mode)"""
+        return sum(self.ages(gender, age_min, age_max, town, exclude))
+
+    def count_for(self, user, age_min, age_max, town, exclude=None):
+        """Candidates a search by ``user`` would find (the user is never their own candidate)"""
+        return self.count(opposite_gender(user.gender), age_min, age_max, town, exclude)
+
+    def ages(self, gender, age_min, age_max, town, exclude=None):
+        """Candidate counts for each age from age_min to age_max, less ``exclude`` ({age: count})"""
+        age_min, age_max = max(age_min, MIN_AGE), min(age_max, MAX_AGE)
+        if age_min > age_max:
+            return []
+        text = normalize_place(town)
+        town_ids = candidate_index.resolve_towns(town) if text else []
+        self._ensure_loaded()
+
+        totals = [0] * (age_max - age_min + 1)
+        with self._lock:
+            self._stats['counts'] += 1
+            cells = [(gender, town_id) for town_id in town_ids]
+            if text:
+                cells += [cell for cell in self._counts
+                          if cell[0] == gender and isinstance(cell[1], str) and text in cell[1]]
+            for cell in cells:
+                counts = self._counts.get(cell)
+                if counts is not None:
+                    for offset, count in enumerate(counts[age_min - MIN_AGE:age_max - MIN_AGE + 1]):
+                        totals[offset] += count
+        for age, count in (exclude or {}).items():
+            if age_min <= age <= age_max:
+                totals[age - age_min] = max(0, totals[age - age_min] - count)
+        return totals
+
+    def suggest_range(self, gender, age_min, age_max, town, exclude=None):
+        """The nearest non-empty age range to an empty one: (age_min, age_max, count) or None.
+
+        The same-width range shifted by the fewest years wins, younger
+        first; failing that, the range widened by that many years each way.
+        """
+        ages = self.ages(gender, MIN_AGE, MAX_AGE, town, exclude)
+        if not any(ages):
+            return None
+        totals = [0]
+        for count in ages:
+            totals.append(totals[-1] + count)
+
+        for shift in range(1, MAX_AGE - MIN_AGE + 1):
+            for low, high in ((age_min - shift, age_max - shift), (age_min + shift, age_max + shift),
+                              (age_min - shift, age_max + shift)):
+                low, high = max(low, MIN_AGE), min(high, MAX_AGE)
+                if low <= high:
+                    count = totals[high - MIN_AGE + 1] - totals[low - MIN_AGE]
+                    if count:
+                        return low, high, count
+        return None
+
+    def reload(self):
+        """Recount every candidate with one GROUP BY"""
+        # Unplaced users are grouped by their town text; placed users have none
+        town = case((User.town_id.is_(None), User.town))
+        rows = db.session.query(
+            User.gender, User.town_id, town, User.age, func.count(User.id)
+        ).filter(
+            User.is_active.is_(True),
+            User.registration_stage == RegistrationStage.COMPLETED,
+            User.gender.isnot(None),
+            or_(User.town_id.isnot(None), User.town.isnot(None)),
+            User.age.isnot(None)
+        ).group_by(User.gender, User.town_id, town, User.age).all()
+
+        counts = {}
+        for gender, town_id, town_text, age, count in rows:
+            key = town_key({'town_id': town_id, 'town': town_text})
+            if key is None:
+                continue
+            ages = counts.setdefault((gender, key), [0] * (MAX_AGE - MIN_AGE + 1))
+            ages[min(max(age, MIN_AGE), MAX_AGE) - MIN_AGE] += count
+
+        with self._lock:
+            self._counts = counts
+            self._loaded_at = time.monotonic()
+            self._stats['reloads'] += 1
+        logger.info(f"Demographic histogram loaded for {len(counts)} gender/town pairs")
+        return len(counts)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cells=len(self._counts),
+                        candidates=sum(sum(ages) for ages in self._counts.values()))
+
+    def on_user_change(self, change):
+        if change.op == 'update' and not any(change.changed(field) for field in _FIELDS):
+            return
+        before, after = change.before, change.after
+        if (before is not None and not all(field in before for field in _FIELDS)) or \
+                (after is not None and not all(field in after for field in _FIELDS)):
+            # Can't tell which cells moved; recount on the next read
+            with self._lock:
+                self._loaded_at = None
+            return
+
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._add_locked(_cell(before), -1)
+            self._add_locked(_cell(after), 1)
+            self._stats['updates'] += 1
+
+    def _add_locked(self, cell, delta):
+        if cell is None:
+            return
+        gender, town, age = cell
+        ages = self._counts.setdefault((gender, town), [0] * (MAX_AGE - MIN_AGE + 1))
+        ages[age - MIN_AGE] = max(0, ages[age - MIN_AGE] + delta)
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reconcile_s:
+            # Only the first caller recounts; the rest read the current counts
+            if self._reload_lock.acquire(blocking=self._loaded_at is None):
+                try:
+                    if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reconcile_s:
+                        self.reload()
+                finally:
+                    self._reload_lock.release()
+
+
+demographic_histogram = DemographicHistogram()
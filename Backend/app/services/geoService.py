@@ -0,0 +1,205 @@
+import logging
+import math
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models.adminSettingsModel import AdminSettings
+from app.models.townModel import Town
+from app.services.locationService import location_service
+from app.utils.gazetteer import bundled_coordinates, haversine_km
+
+logger = logging.getLogger(__name__)
+
+_KM_PER_DEGREE = 111.32
+
+_SQL_RADIUS = {
+    # earth_box is a bounding cube the GiST index can search; earth_distance trims it to the circle
+    'earthdistance': text(
+        "SELECT id, earth_distance(ll_to_earth(:lat, :lon), ll_to_earth(latitude, longitude)) / 1000.0 AS km "
+        "FROM towns WHERE latitude IS NOT NULL AND longitude IS NOT NULL "
+        "AND earth_box(ll_to_earth(:lat, :lon), :radius_m) @> ll_to_earth(latitude, longitude) "
+        "AND earth_distance(ll_to_earth(:lat, :lon), ll_to_earth(latitude, longitude)) <= :radius_m "
+        "ORDER BY km"
+    ),
+    'postgis': text(
+        "SELECT id, ST_Distance(geography(ST_MakePoint(longitude, latitude)), "
+        "geography(ST_MakePoint(:lon, :lat))) / 1000.0 AS km "
+        "FROM towns WHERE latitude IS NOT NULL AND longitude IS NOT NULL "
+        "AND ST_DWithin(geography(ST_MakePoint(longitude, latitude)), geography(ST_MakePoint(:lon, :lat)), :radius_m) "
+        "ORDER BY km"
+    ),
+}
+
+
+class GeoIndex:
+    """Radius search over gazetteer towns for ``MATCH_LOCATION_MODE=radius``.
+
+    Users are placed by their resolved town (``users.town_id``), so a
+    radius search finds the towns within ``match_radius_km`` (AdminSettings)
+    of the searched town and the candidate index then looks up those towns'
+    buckets. Town coordinates come from ``towns.latitude/longitude``, which
+    are filled from the bundled Kenyan gazetteer.
+
+    With ``GEO_BACKEND=grid`` the towns are held in memory in a grid of
+    ``cell_deg`` cells, so a search only measures the towns in the cells
+    the radius overlaps. ``earthdistance`` and ``postgis`` run the search in
+    Postgres instead and fall back to the grid when the extension is not
+    installed. Coordinates and the radius setting are reloaded every
+    ``refresh_interval_s``.
+    """
+
+    def __init__(self, refresh_interval_s=300, cell_deg=0.25, default_radius_km=50):
+        self.refresh_interval_s = refresh_interval_s
+        self.cell_deg = cell_deg
+        self.default_radius_km = default_radius_km
+        self.enabled = False
+        self.backend = 'grid'
+        self._sql_checked = False
+        self._coords = {}  # town_id -> (latitude, longitude)
+        self._grid = {}    # (row, column) -> [town_id]
+        self._radius_km = default_radius_km
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._stats = {'searches': 0, 'sql_searches': 0, 'reloads': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('MATCH_LOCATION_MODE', 'town') == 'radius'
+        self.backend = app.config.get('GEO_BACKEND', 'grid')
+        self.refresh_interval_s = int(app.config.get('LOCATION_REFRESH_S', self.refresh_interval_s))
+        if self.backend not in ('grid',) + tuple(_SQL_RADIUS):
+            raise ValueError(f"Unknown GEO_BACKEND {self.backend!r}")
+
+    @property
+    def radius_km(self):
+        self._ensure_loaded()
+        return self._radius_km
+
+    def towns_near(self, town, radius_km=None):
+        """Towns within ``radius_km`` (default: match_radius_km) of a free-text town.
+
+        Returns (town_id, distance in km) pairs, nearest first. The towns the
+        text resolves to are always included, at distance 0, even when their
+        coordinates are unknown. Must be called inside an app context.
+        """
+        return self.towns_around(location_service.resolve(town), radius_km)
+
+    def towns_around(self, town_ids, radius_km=None):
+        """Like ``towns_near`` for already resolved towns; the distance is to the nearest of them"""
+        if radius_km is None:
+            radius_km = self.radius_km
+        else:
+            self._ensure_loaded()
+
+        found = {town_id: 0.0 for town_id in town_ids}
+        for town_id in town_ids:
+            origin = self._coordinates(town_id)
+            if origin is None:
+                continue
+            for other_id, km in self._search(origin[0], origin[1], radius_km):
+                if km < found.get(other_id, math.inf):
+                    found[other_id] = km
+
+        with self._lock:
+            self._stats['searches'] += 1
+        return sorted(found.items(), key=lambda item: (item[1], item[0]))
+
+    def reload(self):
+        """Load town coordinates and the radius setting"""
+        rows = db.session.query(Town.id, Town.name, Town.county, Town.latitude, Town.longitude).all()
+        radius_km = AdminSettings.get_setting('match_radius_km', self.default_radius_km)
+
+        coords = {}
+        for row in rows:
+            if row.latitude is not None and row.longitude is not None:
+                coords[row.id] = (row.latitude, row.longitude)
+            else:
+                # Towns added before the gazetteer had coordinates for them
+                point = bundled_coordinates(row.name, row.county)
+                if point is not None:
+                    coords[row.id] = point
+
+        with self._lock:
+            self._coords = {}
+            self._grid = {}
+            for town_id, point in coords.items():
+                self._add_locked(town_id, point)
+            self._radius_km = float(radius_km or self.default_radius_km)
+            self._loaded_at = time.monotonic()
+            self._stats['reloads'] += 1
+        logger.info(f"Geo index loaded {len(coords)} of {len(rows)} towns, radius {self._radius_km} km")
+        return len(coords)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, towns=len(self._coords), cells=len(self._grid), radius_km=self._radius_km,
+                        backend=self.backend)
+
+    def _search(self, latitude, longitude, radius_km):
+        if self.backend != 'grid' and self._sql_available():
+            with self._lock:
+                self._stats['sql_searches'] += 1
+            rows = db.session.execute(_SQL_RADIUS[self.backend],
+                                      {'lat': latitude, 'lon': longitude, 'radius_m': radius_km * 1000}).all()
+            return [(row.id, float(row.km)) for row in rows]
+        return self._search_grid(latitude, longitude, radius_km)
+
+    def _search_grid(self, latitude, longitude, radius_km):
+        lat_span = radius_km / _KM_PER_DEGREE
+        lon_span = radius_km / (_KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        first_row, last_row = self._cell(latitude - lat_span), self._cell(latitude + lat_span)
+        first_column, last_column = self._cell(longitude - lon_span), self._cell(longitude + lon_span)
+
+        found = []
+        with self._lock:
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    for town_id in self._grid.get((row, column), ()):
+                        town_lat, town_lon = self._coords[town_id]
+                        km = haversine_km(latitude, longitude, town_lat, town_lon)
+                        if km <= radius_km:
+                            found.append((town_id, km))
+        return found
+
+    def _sql_available(self):
+        if not self._sql_checked:
+            self._sql_checked = True
+            bind = db.session.get_bind()
+            installed = bind.dialect.name == 'postgresql' and db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = :name"), {'name': self.backend}
+            ).first() is not None
+            if not installed:
+                logger.warning(f"GEO_BACKEND={self.backend} needs Postgres with the {self.backend} "
+                               f"extension; using the in-memory grid")
+                self.backend = 'grid'
+        return self.backend != 'grid'
+
+    def _coordinates(self, town_id):
+        with self._lock:
+            point = self._coords.get(town_id)
+        if point is not None:
+            return point
+
+        # A town added since the last reload: place it from the bundled gazetteer
+        town = location_service.town(town_id)
+        point = bundled_coordinates(*town) if town else None
+        if point is not None:
+            with self._lock:
+                self._add_locked(town_id, point)
+        return point
+
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell_deg)
+
+    def _add_locked(self, town_id, point):
+        self._coords[town_id] = point
+        self._grid.setdefault((self._cell(point[0]), self._cell(point[1])), []).append(town_id)
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval_s:
+            self.reload()
+
+
+geo_index = GeoIndex()
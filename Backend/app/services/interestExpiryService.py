@@ -0,0 +1,197 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from datetime import datetime
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+from app.models.userModel import User
+from app.models.userInterestModel import UserInterest
+from app.services.smsDispatchService import sms_dispatcher
+from app.services.userService import UserService
+from app.utils.bulk_writes import bulk_insert, bulk_update
+
+logger = logging.getLogger(__name__)
+
+SHORTCODE = "22141"
+
+
+def expiry_message(target_name):
+    return (
+        f" INTEREST EXPIRED\n"
+        f"Your interest in {target_name} has expired (no response after {UserInterest.TTL_HOURS} hours).\n\n"
+        f" DON'T GIVE UP!\n"
+        f" Try 'NEXT' for more matches\n"
+        f" Search new areas with 'match#age#town'\n"
+        f" Your perfect match is still out there! "
+    )
+
+
+class InterestExpiryScheduler:
+    """Expires unanswered interests in bounded, set-based chunks.
+
+    Every ``interval_s`` seconds (with ``INTEREST_EXPIRY_MODE=schedule``) the
+    scheduler claims up to ``chunk_size`` interests whose ``expires_at`` has
+    passed, loads all users involved with one IN query, inserts the expiry
+    SMS for the whole chunk with one multi-row INSERT and flags the chunk with
+    one UPDATE, all in a single transaction. Claims use ``FOR UPDATE SKIP
+    LOCKED`` so several app processes can run the scheduler side by side.
+    """
+
+    def __init__(self, interval_s=60, chunk_size=500):
+        self.interval_s = interval_s
+        self.chunk_size = chunk_size
+        self._app = None
+        self._thread = None
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'runs': 0, 'expired': 0, 'notified': 0}
+
+    def init_app(self, app):
+        """Configure the scheduler from app config and start it if enabled"""
+        self._app = app
+        self.interval_s = float(app.config.get('INTEREST_EXPIRY_INTERVAL_S', self.interval_s))
+        self.chunk_size = int(app.config.get('INTEREST_EXPIRY_CHUNK_SIZE', self.chunk_size))
+
+        # Lane worker processes of the SMS engine build their own app; one scheduler per server is enough
+        if app.config.get('INTEREST_EXPIRY_MODE', 'off') == 'schedule' and multiprocessing.parent_process() is None:
+            self.start()
+
+    @property
+    def enabled(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.enabled:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='interest-expiry', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Interest expiry scheduler started (every {self.interval_s}s, chunk={self.chunk_size})")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        atexit.unregister(self.stop)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def run_once(self, now=None):
+        """Expire everything currently due, chunk by chunk; returns the number expired.
+
+        Must be called inside an app context.
+        """
+        now = now or datetime.utcnow()
+        total = 0
+        while not self._stopping:
+            expired = self.expire_chunk(now)
+            total += expired
+            if expired < self.chunk_size:
+                break
+
+        with self._stats_lock:
+            self._stats['runs'] += 1
+        return total
+
+    def expire_chunk(self, now=None):
+        """Claim, notify and flag one chunk of expired interests; returns the chunk size"""
+        now = now or datetime.utcnow()
+
+        # Other databases ignore FOR UPDATE, so claims are serialized in-process there
+        serialize = db.engine.dialect.name != 'postgresql'
+        if serialize:
+            self._claim_lock.acquire()
+        try:
+            interests = db.session.query(
+                UserInterest.id, UserInterest.interested_user_id, UserInterest.target_user_id
+            ).filter(
+                UserInterest.response_received.is_(False), # type: ignore
+                UserInterest.expired_notification_sent.is_(False), # type: ignore
+                UserInterest.superseded_at.is_(None),
+                UserInterest.expires_at <= now,
+                UserInterest.notification_sent.is_(True) # type: ignore
+            ).order_by(UserInterest.expires_at).limit(self.chunk_size).with_for_update(skip_locked=True).all()
+
+            if not interests:
+                db.session.commit()
+                return 0
+
+            user_ids = {i.interested_user_id for i in interests} | {i.target_user_id for i in interests}
+            users = {
+                row.id: row for row in db.session.query(User.id, User.name, User.phone_number)
+                .filter(User.id.in_(user_ids)).all()
+            }
+
+            status = sms_dispatcher.outgoing_status
+            messages = []
+            for interest in interests:
+                interested_user = users.get(interest.interested_user_id)
+                target_user = users.get(interest.target_user_id)
+                if not interested_user or not target_user:
+                    continue
+                messages.append({
+                    'from_phone': SHORTCODE,
+                    'to_phone': self.normalize_phone(interested_user.phone_number),
+                    'message_body': expiry_message(target_user.name),
+                    'direction': 'outgoing',
+                    'message_type': 'interest_expired',
+                    'related_user_id': interested_user.id,
+                    'status': status,
+                    'created_at': now
+                })
+
+            bulk_insert(SmsMessage, messages)
+
+            # Interests whose users are gone are flagged too, so they are not claimed again
+            bulk_update(UserInterest, [i.id for i in interests], {'expired_notification_sent': True})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if serialize:
+                self._claim_lock.release()
+
+        if messages and sms_dispatcher.enabled:
+            sms_dispatcher.notify()
+        with self._stats_lock:
+            self._stats['expired'] += len(interests)
+            self._stats['notified'] += len(messages)
+        return len(interests)
+
+    @staticmethod
+    def normalize_phone(phone_number):
+        """Same recipient format as SmsService.send_response (no + prefix)"""
+        normalized = UserService.validate_phone_number(phone_number or '') or phone_number
+        if normalized and normalized.startswith('+'):
+            normalized = normalized[1:]
+        return normalized
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                with self._app.app_context():
+                    expired = self.run_once()
+                if expired:
+                    logger.info(f"Expired {expired} pending interests")
+            except Exception as e:
+                logger.error(f"Interest expiry scheduler error: {str(e)}")
+
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(timeout=self.interval_s)
+
+
+interest_expiry_scheduler = InterestExpiryScheduler()
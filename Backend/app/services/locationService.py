@@ -0,0 +1,267 @@
+import difflib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.townModel import Town, TownAlias, normalize_place
+from app.models.userModel import User
+from app.models.matchRequestModel import MatchRequest
+
+logger = logging.getLogger(__name__)
+
+
+class _Trie:
+    """Prefix tree over normalized town names; each terminal node holds town IDs"""
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []
+
+    def insert(self, key, town_id):
+        node = self
+        for char in key:
+            node = node.children.setdefault(char, _Trie())
+        if town_id not in node.ids:
+            node.ids.append(town_id)
+
+    def prefix(self, prefix, limit):
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        # Depth-first with sorted children yields names in alphabetical order
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.ids)
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        return found[:limit]
+
+
+class LocationService:
+    """Town gazetteer, free-text resolver and type-ahead.
+
+    The gazetteer is the bundled list of Kenyan towns (seeded by the
+    migrations and schema.sql) plus admin-added aliases; it never grows from
+    user input. Towns and aliases are held in memory (loaded with two
+    queries, reloaded every ``refresh_interval_s``). A free-text town
+    resolves by exact normalized name, then alias, then fuzzily: ``pg_trgm``
+    similarity over the GIN-indexed ``normalized_name`` on Postgres,
+    ``difflib`` over the in-memory names elsewhere. Type-ahead walks a prefix
+    trie and tops up with fuzzy hits.
+
+    A ``before_flush`` hook keeps ``users.town_id`` and
+    ``match_requests.town_id`` in sync with their free-text columns, so every
+    write path gets a canonical town without changes. Text that does not
+    resolve leaves ``town_id`` NULL; searches match those users by their
+    town text instead (see ``covering`` and CandidateIndex).
+    """
+
+    def __init__(self, refresh_interval_s=300, fuzzy_threshold=0.45, cache_size=5000):
+        self.refresh_interval_s = refresh_interval_s
+        self.fuzzy_threshold = fuzzy_threshold
+        self.cache_size = cache_size
+        self._towns = {}    # town_id -> (name, county)
+        self._names = {}    # normalized name -> [town_id]
+        self._keys = {}     # (normalized name, normalized county) -> town_id
+        self._aliases = {}  # normalized alias -> town_id
+        self._trie = _Trie()
+        self._resolved = OrderedDict()
+        self._covered = OrderedDict()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def init_app(self, app):
+        self.refresh_interval_s = int(app.config.get('LOCATION_REFRESH_S', self.refresh_interval_s))
+        self.fuzzy_threshold = float(app.config.get('LOCATION_FUZZY_THRESHOLD', self.fuzzy_threshold))
+        if not self._installed:
+            event.listen(Session, 'before_flush', self._before_flush)
+            self._installed = True
+
+    def resolve(self, town):
+        """IDs of the gazetteer towns a free-text town refers to ([] if none).
+
+        A name shared by towns in several counties returns all of them.
+        """
+        key = normalize_place(town)
+        if not key:
+            return []
+        self._ensure_loaded()
+
+        with self._lock:
+            ids = self._names.get(key)
+            if ids:
+                return list(ids)
+            if key in self._aliases:
+                return [self._aliases[key]]
+            if key in self._resolved:
+                self._resolved.move_to_end(key)
+                return list(self._resolved[key])
+
+        name = self._fuzzy_names(key, 1)
+        with self._lock:
+            ids = list(self._names.get(name[0], ())) if name else []
+            self._resolved[key] = ids
+            while len(self._resolved) > self.cache_size:
+                self._resolved.popitem(last=False)
+        return ids
+
+    def resolve_one(self, town):
+        ids = self.resolve(town)
+        return ids[0] if ids else None
+
+    def covering(self, town):
+        """IDs of the gazetteer towns a search for ``town`` covers ([] if none).
+
+        Keeps the old ``town ILIKE '%town%'`` recall: the towns ``town``
+        resolves to, then every town whose name contains the searched text or
+        a resolved name ("Nairobi" and "Nairobii" both cover Nairobi West).
+        """
+        key = normalize_place(town)
+        if not key:
+            return []
+        ids = self.resolve(town)
+
+        with self._lock:
+            if key in self._covered:
+                self._covered.move_to_end(key)
+                return list(self._covered[key])
+            # Names containing a needle: the same scan the per-user ILIKE did, over the gazetteer's names
+            needles = {key} | {normalize_place(self._towns[town_id][0]) for town_id in ids if town_id in self._towns}
+            found = sorted(
+                town_id for name, town_ids in self._names.items() if any(needle in name for needle in needles)
+                for town_id in town_ids if town_id not in ids
+            )
+            self._covered[key] = ids + found
+            while len(self._covered) > self.cache_size:
+                self._covered.popitem(last=False)
+            return ids + found
+
+    def town(self, town_id):
+        """(name, county) of a gazetteer town, or None"""
+        self._ensure_loaded()
+        with self._lock:
+            return self._towns.get(town_id)
+
+    def suggest(self, prefix, limit=10):
+        """Towns for type-ahead: prefix matches first, then fuzzy matches"""
+        key = normalize_place(prefix)
+        if not key:
+            return []
+        self._ensure_loaded()
+
+        with self._lock:
+            ids = self._trie.prefix(key, limit)
+        if len(ids) < limit:
+            for name in self._fuzzy_names(key, limit):
+                with self._lock:
+                    ids.extend(town_id for town_id in self._names.get(name, ()) if town_id not in ids)
+        with self._lock:
+            return [
+                {'id': town_id, 'name': self._towns[town_id][0], 'county': self._towns[town_id][1]}
+                for town_id in ids[:limit] if town_id in self._towns
+            ]
+
+    def town_for(self, session, name, county=None):
+        """Gazetteer town ID for a user's town/county, or None when the town does not resolve.
+
+        The exact (town, county) entry wins; otherwise the town resolves like
+        a search (name, alias, fuzzy), preferring a namesake in the same
+        county. Unknown towns are not added to the gazetteer.
+        """
+        key = (normalize_place(name), normalize_place(county))
+        if not key[0]:
+            return None
+        self._ensure_loaded(session)
+
+        with self._lock:
+            town_id = self._keys.get(key)
+        if town_id is not None:
+            return town_id
+
+        ids = self.resolve(name)
+        with self._lock:
+            same_county = [town_id for town_id in ids
+                           if town_id in self._towns and normalize_place(self._towns[town_id][1]) == key[1]]
+        return (same_county or ids or [None])[0]
+
+    def add_alias(self, alias, town_id):
+        """Register an alternative spelling for a town (commits)"""
+        db.session.add(TownAlias(alias, town_id))
+        db.session.commit()
+        with self._lock:
+            self._aliases[normalize_place(alias)] = town_id
+            self._resolved.clear()
+            self._covered.clear()
+
+    def reload(self, session=None):
+        """Load the whole gazetteer from the database"""
+        session = session or db.session
+        towns = session.execute(
+            db.select(Town.id, Town.name, Town.county, Town.normalized_name, Town.normalized_county)
+        ).all()
+        aliases = session.execute(db.select(TownAlias.alias, TownAlias.town_id)).all()
+
+        with self._lock:
+            self._towns, self._names, self._keys, self._trie = {}, {}, {}, _Trie()
+            for row in towns:
+                self._add_locked(row.id, row.name, row.county, row.normalized_name, row.normalized_county)
+            self._aliases = {row.alias: row.town_id for row in aliases}
+            self._resolved.clear()
+            self._covered.clear()
+            self._loaded_at = time.monotonic()
+        return len(towns)
+
+    def _ensure_loaded(self, session=None):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval_s:
+            self.reload(session)
+
+    def _fuzzy_names(self, key, limit):
+        """Normalized town names closest to ``key``, best first"""
+        session = db.session
+        if session.get_bind().dialect.name == 'postgresql':
+            rows = session.execute(text(
+                "SELECT normalized_name FROM towns "
+                "WHERE similarity(normalized_name, :key) >= :threshold "
+                "GROUP BY normalized_name "
+                "ORDER BY max(similarity(normalized_name, :key)) DESC LIMIT :limit"
+            ), {'key': key, 'threshold': self.fuzzy_threshold, 'limit': limit}).all()
+            return [row.normalized_name for row in rows]
+
+        with self._lock:
+            names = list(self._names)
+        # difflib ratios run well above trigram similarity for the same pair, hence the higher floor
+        return difflib.get_close_matches(key, names, n=limit, cutoff=max(self.fuzzy_threshold, 0.75))
+
+    def _add_locked(self, town_id, name, county, normalized_name, normalized_county):
+        self._towns[town_id] = (name, county)
+        ids = self._names.setdefault(normalized_name, [])
+        if town_id not in ids:
+            ids.append(town_id)
+        self._keys[(normalized_name, normalized_county)] = town_id
+        self._trie.insert(normalized_name, town_id)
+
+    def _before_flush(self, session, flush_context, instances):
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, User):
+                if obj in session.new or self._changed(obj, 'town', 'county'):
+                    obj.town_id = self.town_for(session, obj.town, obj.county)
+            elif isinstance(obj, MatchRequest):
+                if obj in session.new or self._changed(obj, 'preferred_town'):
+                    obj.town_id = self.resolve_one(obj.preferred_town)
+
+    @staticmethod
+    def _changed(obj, *fields):
+        state = db.inspect(obj)
+        return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+location_service = LocationService()
@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from app.extensions import db
+from app.models.userModel import User, RegistrationStage
+from app.services.userEvents import user_events
+
+logger = logging.getLogger(__name__)
+
+_CATEGORIES = ('county', 'town', 'level_of_education', 'religion')
+_FIELDS = ('age',) + _CATEGORIES
+_ID_BITS = 32
+_LOAD_CHUNK = 5000
+
+
+def _category_key(value):
+    # Same comparison as SmsService.calculate_compatibility: case-insensitive, blanks count as missing
+    return value.lower() if value else None
+
+
+class MatchRanker:
+    """Orders match candidates by compatibility with the requester.
+
+    Scores follow ``SmsService.calculate_compatibility`` (age gap, county or
+    town, education, religion) but a whole candidate set is scored in one
+    vectorized NumPy pass. Profile features are kept in dense arrays indexed
+    by user ID: age plus integer codes for the categorical fields (0 = not
+    given). They are loaded with one query, kept current from the user
+    change feed and reloaded every ``refresh_interval_s``; candidates not
+    loaded yet (e.g. registered through another process) are fetched on
+    demand.
+
+    Candidates are ordered by a single int64 key, ``score << 32 | user_id``:
+    best score first, ties newest registration first. The key of the last
+    profile on a page doubles as the cursor for the next one. With
+    ``MATCH_RANKING=recent`` candidates keep the newest-first order.
+    """
+
+    def __init__(self, refresh_interval_s=300):
+        self.refresh_interval_s = refresh_interval_s
+        self.enabled = True
+        self._ages = np.zeros(0, dtype=np.int16)
+        self._codes = {field: np.zeros(0, dtype=np.int32) for field in _CATEGORIES}
+        self._known = np.zeros(0, dtype=bool)
+        self._vocab = {field: {} for field in _CATEGORIES}
+        self._dirty = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stats = {'rankings': 0, 'scored': 0, 'reloads': 0, 'fetched': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('MATCH_RANKING', 'compatibility') == 'compatibility'
+        self.refresh_interval_s = int(app.config.get('MATCH_RANKING_REFRESH_S', self.refresh_interval_s))
+        user_events.subscribe(self.on_user_change)
+
+    def rank(self, user, candidate_ids, limit=None):
+        """``candidate_ids`` best match first; only the top ``limit`` when given.
+
+        Must be called inside an app context.
+        """
+        if not self.enabled or len(candidate_ids) < 2:
+            candidate_ids = list(candidate_ids)
+            return candidate_ids[:limit] if limit else candidate_ids
+        keys = self.keys(user, np.asarray(candidate_ids, dtype=np.int64))
+        return (self.top(keys, limit) & ((1 << _ID_BITS) - 1)).tolist()
+
+    def page(self, user, candidate_ids, limit, after=None):
+        """One page of ranked candidates: (user IDs, cursor for the next page or None).
+
+        ``after`` is the cursor returned with the previous page.
+        """
+        keys = self.keys(user, np.asarray(candidate_ids, dtype=np.int64))
+        if after is not None:
+            keys = keys[keys < after]
+        selected = self.top(keys, limit + 1)
+        next_after = int(selected[limit - 1]) if len(selected) > limit else None
+        return (selected[:limit] & ((1 << _ID_BITS) - 1)).tolist(), next_after
+
+    def keys(self, user, ids):
+        """Sort keys (``score << 32 | user_id``) for an int64 array of candidate IDs"""
+        return (self.scores(user, ids).astype(np.int64) << _ID_BITS) | ids
+
+    def scores(self, user, ids):
+        """Compatibility (0-100) of ``user`` with each candidate in an int64 ID array"""
+        self._ensure_loaded(ids)
+        with self._lock:
+            ages = self._ages[ids].astype(np.int32)
+            codes = {field: self._codes[field][ids] for field in _CATEGORIES}
+            mine = {field: self._code_locked(field, getattr(user, field)) for field in _CATEGORIES}
+            self._stats['rankings'] += 1
+            self._stats['scored'] += len(ids)
+
+        # Age: 10 points off per year of difference
+        score = np.maximum(0, 100 - np.abs(ages - (user.age or 0)) * 10)
+        factors = np.full(len(ids), 2, dtype=np.int32)
+
+        # Location: same county, else same town
+        county = (codes['county'] == mine['county']) if mine['county'] else np.zeros(len(ids), dtype=bool)
+        town = (codes['town'] == mine['town']) if mine['town'] else np.zeros(len(ids), dtype=bool)
+        score += np.where(county, 100, np.where(town, 80, 0))
+
+        # Education and religion only count when both sides gave one
+        for field, points in (('level_of_education', 70), ('religion', 60)):
+            if mine[field]:
+                factors += codes[field] != 0
+                score += np.where(codes[field] == mine[field], points, 0)
+
+        return np.minimum(100, score // factors)
+
+    @staticmethod
+    def top(keys, limit=None):
+        """``keys`` in descending order; with ``limit`` only the largest ``limit``, via a partial sort"""
+        if limit is not None and limit < len(keys):
+            # argpartition finds the top `limit` in linear time; only those get sorted
+            keys = keys[np.argpartition(keys, len(keys) - limit)[len(keys) - limit:]]
+        return np.sort(keys)[::-1]
+
+    def reload(self):
+        """Load the features of every completed user"""
+        rows = db.session.query(
+            User.id, User.age, User.county, User.town, User.level_of_education, User.religion
+        ).filter(User.registration_stage == RegistrationStage.COMPLETED).all()
+
+        size = max((row.id for row in rows), default=0) + 1
+        with self._lock:
+            self._ages = np.zeros(size, dtype=np.int16)
+            self._codes = {field: np.zeros(size, dtype=np.int32) for field in _CATEGORIES}
+            self._known = np.zeros(size, dtype=bool)
+            for row in rows:
+                self._set_locked(row.id, row._asdict())
+            self._loaded_at = time.monotonic()
+            self._stats['reloads'] += 1
+        logger.info(f"Match ranking features loaded for {len(rows)} users")
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, users=int(self._known.sum()))
+
+    def refresh_users(self, user_ids):
+        """Re-read these users' features before the next ranking (changes made by other processes)"""
+        with self._lock:
+            self._dirty.update(user_ids)
+
+    def on_user_change(self, change):
+        with self._lock:
+            if change.after is None:
+                if change.user_id < len(self._known):
+                    self._known[change.user_id] = False
+            elif change.op == 'update' and not any(change.changed(field) for field in _FIELDS):
+                return
+            elif all(field in change.after for field in _FIELDS):
+                self._set_locked(change.user_id, change.after)
+            else:
+                self._dirty.add(change.user_id)
+
+    def _ensure_loaded(self, ids):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval_s:
+            # Only the first caller reloads; the rest keep ranking with the current features
+            if self._reload_lock.acquire(blocking=self._loaded_at is None):
+                try:
+                    if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval_s:
+                        self.reload()
+                finally:
+                    self._reload_lock.release()
+
+        with self._lock:
+            self._grow_locked(int(ids.max()) + 1 if len(ids) else 0)
+            missing = set(ids[~self._known[ids]].tolist()) | self._dirty
+            self._dirty = set()
+        if missing:
+            self._fetch(list(missing))
+
+    def _fetch(self, user_ids):
+        for start in range(0, len(user_ids), _LOAD_CHUNK):
+            rows = db.session.query(
+                User.id, User.age, User.county, User.town, User.level_of_education, User.religion
+            ).filter(User.id.in_(user_ids[start:start + _LOAD_CHUNK])).all()
+            with self._lock:
+                for row in rows:
+                    self._set_locked(row.id, row._asdict())
+                self._stats['fetched'] += len(rows)
+
+    def _grow_locked(self, size):
+        if size <= len(self._known):
+            return
+        size = max(size, len(self._known) * 2)
+        self._ages = np.concatenate([self._ages, np.zeros(size - len(self._ages), dtype=np.int16)])
+        for field in _CATEGORIES:
+            codes = self._codes[field]
+            self._codes[field] = np.concatenate([codes, np.zeros(size - len(codes), dtype=np.int32)])
+        self._known = np.concatenate([self._known, np.zeros(size - len(self._known), dtype=bool)])
+
+    def _set_locked(self, user_id, values):
+        self._grow_locked(user_id + 1)
+        self._ages[user_id] = values.get('age') or 0
+        for field in _CATEGORIES:
+            self._codes[field][user_id] = self._code_locked(field, values.get(field))
+        self._known[user_id] = True
+
+    def _code_locked(self, field, value):
+        key = _category_key(value)
+        if key is None:
+            return 0
+        vocab = self._vocab[field]
+        code = vocab.get(key)
+        if code is None:
+            code = vocab[key] = len(vocab) + 1
+        return code
+
+
+match_ranker = MatchRanker()
@@ -1,6 +1,7 @@
 from app.extensions import db
 from app.models.matchRequestModel import MatchRequest
 from app.models.userModel import User
+from app.services.candidateIndexService import candidate_index
 from sqlalchemy import and_, or_
 from sqlalchemy.exc import SQLAlchemyError
 import logging
@@ -70,21 +71,9 @@ class MatchRequestService:
     def _find_matches(match_request, requesting_user):
         """Find potential matches based on criteria (placeholder, no match storage)"""
         try:
-            # Determine opposite gender
-            opposite_gender = 'Female' if requesting_user.gender == 'Male' else 'Male'
-            
-            # Build query for potential matches
-            query = User.query.filter(
-                User.id != requesting_user.id,  # Not the requesting user
-                User.gender == opposite_gender,
-                User.age >= match_request.age_min,
-                User.age <= match_request.age_max,
-                User.town.ilike(f'%{match_request.preferred_town}%'),
-                User.is_active.is_(True),
-                User.registration_stage == 'completed'
-            )
-            
-            matches = query.all()
+            match_ids = candidate_index.search_for(
+                requesting_user, match_request.age_min, match_request.age_max, match_request.preferred_town)
+            matches = candidate_index.load_users(match_ids)
             logger.info(f"Found {len(matches)} potential matches for request")
             return matches  # Return matches but don't store them
             
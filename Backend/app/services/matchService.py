@@ -1,10 +1,19 @@
 from datetime import datetime
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, case, or_, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker
 from app.models.matchRequestModel import MatchRequest
 from app.models.matchModel import Match
+from app.models.townModel import normalize_place
 from app.models.userModel import User, Gender, RegistrationStage
+from app.models.userInterestModel import UserInterest
 from app.extensions import db
+from app.services.candidateIndexService import candidate_index, opposite_gender, town_clause
+from app.services.deckBuilderService import deck_builder
+from app.services.matchRankingService import match_ranker
+from app.services.seenSetService import seen_sets
+from app.utils.bulk_writes import bulk_insert
 from typing import List, Dict, Optional
 import logging
 
@@ -32,17 +41,9 @@ class MatchService:
             age_max = search_criteria.get('age_max')
             preferred_town = search_criteria.get('preferred_town')
             
-            query = User.query.filter(
-                User.id != user_id,  
-                User.registration_stage == RegistrationStage.COMPLETED,
-                User.is_active.is_(True),
-                User.age >= age_min,
-                User.age <= age_max,
-                User.gender == target_gender,  
-                User.town.ilike(f'%{preferred_town}%')  
-            )
-            
-            matches = query.order_by(User.created_at.desc()).all()
+            match_ids = candidate_index.search(target_gender, age_min, age_max, preferred_town,
+                                               exclude_user_id=user_id)
+            matches = candidate_index.load_users(match_ids)
             
             logger.info(f"Found {len(matches)} matches for user {user_id} (searching for {target_gender.value})")
             return matches
@@ -86,6 +87,197 @@ class MatchService:
         return MatchService.find_matches_for_user(requester_id, search_criteria)
 
     
+    @staticmethod
+    def get_swipe_deck(user: User, match_request: MatchRequest, cursor: Optional[int] = None,
+                       limit: int = 20, include_swiped: bool = False) -> Dict:
+        """One page of the swipe deck for a match request.
+
+        Profiles the user already swiped on are excluded in SQL with NOT
+        EXISTS against user_interests (unless ``include_swiped``), and
+        ``next_cursor`` is passed back as ``cursor`` for the following page.
+        With compatibility ranking the remaining candidate IDs are ranked by
+        MatchRanker and the cursor is the last profile's ranking key;
+        otherwise the page is newest first, cut with LIMIT, and the cursor is
+        the last user ID. Totals come from COUNT queries (or the ranked ID
+        list, which is the same set). When the deck builder runs, ranked
+        pages come from the user's precomputed deck while it can fill them.
+        """
+        swiped = db.session.query(UserInterest.id).filter(
+            UserInterest.interested_user_id == user.id,
+            UserInterest.target_user_id == User.id
+        ).exists()
+        total_swiped = db.session.query(func.count(func.distinct(UserInterest.target_user_id))).filter(
+            UserInterest.interested_user_id == user.id
+        ).scalar()
+
+        if not normalize_place(match_request.preferred_town):
+            return {'users': [], 'swipes': {}, 'next_cursor': None, 'has_more': False,
+                    'total_swiped': total_swiped, 'total_unswiped': 0}
+        town_ids = candidate_index.resolve_towns(match_request.preferred_town)
+
+        candidates = User.query.filter(
+            User.gender == opposite_gender(user.gender),
+            User.age >= match_request.age_min,
+            User.age <= match_request.age_max,
+            town_clause(town_ids, match_request.preferred_town),
+            User.is_active.is_(True),
+            User.registration_stage == RegistrationStage.COMPLETED,
+            User.id != user.id
+        )
+        unswiped = candidates.filter(~swiped)
+
+        deck = candidates if include_swiped else unswiped
+        total_unswiped = None
+        prebuilt = None if include_swiped else deck_builder.deck_page(user, match_request, limit, after=cursor)
+        if prebuilt is not None:
+            page_ids, next_cursor = prebuilt
+            # The deck may predate a deactivation
+            users = [match for match in candidate_index.load_users(page_ids) if match.is_active]
+            has_more = next_cursor is not None
+        elif match_ranker.enabled:
+            # Rank every remaining candidate ID; the cursor is the last profile's ranking key
+            deck_ids = [row.id for row in deck.with_entities(User.id).all()]
+            if not include_swiped:
+                total_unswiped = len(deck_ids)
+            page_ids, next_cursor = match_ranker.page(user, deck_ids, limit, after=cursor)
+            users = candidate_index.load_users(page_ids)
+            has_more = next_cursor is not None
+        else:
+            if cursor:
+                deck = deck.filter(User.id < cursor)
+            # IDs follow registration order, so this is newest first with a stable keyset cursor
+            users = deck.order_by(User.id.desc()).limit(limit + 1).all()
+            has_more = len(users) > limit
+            users = users[:limit]
+            next_cursor = users[-1].id if has_more else None
+
+        swipes = {}
+        if include_swiped and users:
+            interests = UserInterest.query.filter(
+                UserInterest.interested_user_id == user.id,
+                UserInterest.target_user_id.in_([match.id for match in users])
+            ).order_by(UserInterest.created_at).all()
+            for interest in interests:
+                swipes[interest.target_user_id] = interest
+
+        if total_unswiped is None:
+            total_unswiped = unswiped.with_entities(func.count(User.id)).scalar()
+
+        return {
+            'users': users,
+            'swipes': swipes,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total_swiped': total_swiped,
+            'total_unswiped': total_unswiped
+        }
+
+    @staticmethod
+    def record_swipes(user_id: int, swipes: Dict[int, str]) -> Dict:
+        """Record a batch of swipes ({target user ID: 'like' | 'pass'}) with set-based statements.
+
+        Also backs the single /swipe route, as a batch of one. A like is
+        stored as a 'details' interest and a pass as 'describe'. Re-swiping
+        changes the type of the pair's current interest; if it is still
+        unanswered (pending or expired) it also starts over with new
+        timestamps and expiry, while an answered one keeps its response.
+        Turning a like into a pass removes the pair's match, and every
+        found target is added to the user's seen set.
+
+        Instead of several lookups per card the batch takes one query for
+        the targets and their existing interests, one upsert on the current
+        pair index, one DELETE for undone matches and one join that finds
+        every liked target who already likes the user back. Match rows are
+        created for mutual likes that have none yet.
+
+        Commits. Returns the new Match rows as (match ID, target user ID)
+        tuples, every liked target who likes the user back (matched now or
+        before) and the target IDs that do not exist.
+        """
+        interest_types = {'like': 'details', 'pass': 'describe'}
+        now = datetime.utcnow()
+
+        # Targets and whatever this user already recorded on them, in one round trip
+        rows = db.session.query(User.id, UserInterest.interest_type).outerjoin(
+            UserInterest, and_(
+                UserInterest.target_user_id == User.id,
+                UserInterest.interested_user_id == user_id,
+                UserInterest.superseded_at.is_(None)
+            )
+        ).filter(User.id.in_(list(swipes))).all()
+
+        found = {target_id for target_id, _ in rows}
+        unliked = {target_id for target_id, old_type in rows
+                   if old_type == 'details' and swipes[target_id] == 'pass'}
+        missing = [target_id for target_id in swipes if target_id not in found]
+
+        try:
+            if found:
+                # New pairs are inserted and swiped ones change type, in one statement on the current pair
+                # index; unanswered interests start over, answered ones keep their response and timestamps
+                renewal = UserInterest.renewal_values(now)
+                table = UserInterest.__table__
+                insert = postgresql_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+                statement = insert(table).values([dict(
+                    renewal,
+                    interested_user_id=user_id,
+                    target_user_id=target_id,
+                    interest_type=interest_types[swipes[target_id]]
+                ) for target_id in sorted(found)])
+                updates = {
+                    column: case((table.c.response_received, table.c[column]), else_=statement.excluded[column])
+                    for column in renewal
+                }
+                db.session.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.interested_user_id, table.c.target_user_id],
+                    index_where=table.c.superseded_at.is_(None),
+                    set_=dict(updates, interest_type=statement.excluded.interest_type)
+                ))
+            seen_sets.add(user_id, found)
+
+            if unliked:
+                Match.query.filter(or_(
+                    and_(Match.requester_id == user_id, Match.matched_user_id.in_(unliked)),
+                    and_(Match.requester_id.in_(unliked), Match.matched_user_id == user_id)
+                )).delete(synchronize_session=False)
+
+            new_matches, mutual = [], []
+            liked = [target_id for target_id in found if swipes[target_id] == 'like']
+            if liked:
+                # Liked targets who like this user back, with any match the pair already has
+                likes_back = db.session.query(UserInterest.interested_user_id, Match.id).outerjoin(
+                    Match, or_(
+                        and_(Match.requester_id == user_id,
+                             Match.matched_user_id == UserInterest.interested_user_id),
+                        and_(Match.requester_id == UserInterest.interested_user_id,
+                             Match.matched_user_id == user_id)
+                    )
+                ).filter(
+                    UserInterest.interested_user_id.in_(liked),
+                    UserInterest.target_user_id == user_id,
+                    UserInterest.interest_type == 'details',
+                    UserInterest.superseded_at.is_(None)
+                ).all()
+                mutual = sorted({target_id for target_id, _ in likes_back})
+                matched = {target_id for target_id, match_id in likes_back if match_id is not None}
+                unmatched = set(mutual) - matched
+                new_matches = bulk_insert(Match, [{
+                    'requester_id': user_id,
+                    'matched_user_id': target_id,
+                    'created_at': now
+                } for target_id in sorted(unmatched)], returning=('id', 'matched_user_id'))
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return {
+            'matches': sorted(new_matches),
+            'mutual': mutual,
+            'missing': missing
+        }
+
     @staticmethod
     def find_matches_by_criteria(search_criteria: Dict) -> List[User]:
        
@@ -252,25 +444,19 @@ class MatchService:
             return {}
 
     @staticmethod
-    def store_matches(request_id: int, requester_id: int, potential_matches: List[User]) -> List[Match]:
+    def store_matches(request_id: int, requester_id: int, potential_matches: List[User]) -> MatchRequest:
+        """Snapshot the ordered candidates on the request; Match rows are created as they are sent"""
         try:
-            stored_matches = []
-
-            for position, matched_user in enumerate(potential_matches, 1):
-                match = Match(
-                    request_id=request_id,
-                    requester_id=requester_id,
-                    matched_user_id=matched_user.id,
-                    position=position
-                )
-                db.session.add(match)
-                stored_matches.append(match)
+            match_request = MatchRequest.query.filter_by(id=request_id, user_id=requester_id).first()
+            if not match_request:
+                raise ValueError("Match request not found")
 
+            match_request.set_candidates([matched_user.id for matched_user in potential_matches])
             db.session.commit()
 
             logger.info(
-                f"Stored {len(stored_matches)} matches for request {request_id}")
-            return stored_matches
+                f"Stored {len(potential_matches)} candidates for request {request_id}")
+            return match_request
 
         except Exception as e:
             db.session.rollback()
@@ -283,15 +469,28 @@ class MatchService:
             match_request = MatchRequest.query.filter_by(
                 user_id=user_id,
                 status='active'
-            ).first()
+            ).options(db.undefer(MatchRequest.candidate_ids)).first()
 
             if not match_request:
                 return None
 
-            next_match = Match.query.filter(
-                Match.request_id == match_request.id,
-                Match.is_sent.is_(False)
-            ).order_by(Match.position).first()
+            if match_request.has_snapshot():
+                batch = match_request.take_next(1)
+                if not batch:
+                    return None
+                position, matched_user_id = batch[0]
+                next_match = Match(
+                    request_id=match_request.id,
+                    requester_id=user_id,
+                    matched_user_id=matched_user_id,
+                    position=position
+                )
+                db.session.add(next_match)
+            else:
+                next_match = Match.query.filter(
+                    Match.request_id == match_request.id,
+                    Match.is_sent.is_(False)
+                ).order_by(Match.position).first()
 
             if next_match:
                 next_match.is_sent = True
@@ -347,7 +546,9 @@ class MatchService:
         try:
             total_requests = MatchRequest.query.filter_by(user_id=user_id).count()
             
-            total_matches = Match.query.filter_by(requester_id=user_id).count()
+            total_matches = db.session.query(
+                func.coalesce(func.sum(MatchRequest.total_matches_found), 0)
+            ).filter(MatchRequest.user_id == user_id).scalar()
             
             active_request = MatchRequest.query.filter_by(
                 user_id=user_id, 
@@ -402,8 +603,13 @@ class MatchService:
     @staticmethod
     def get_request_progress(request_id: int) -> dict:
         try:
-            total_matches = Match.query.filter_by(request_id=request_id).count()
-            sent_matches = Match.query.filter(Match.request_id == request_id, Match.is_sent.is_(True)).count()
+            match_request = MatchRequest.query.get(request_id)
+            if match_request and match_request.total_matches_found:
+                total_matches = match_request.total_matches_found
+                sent_matches = match_request.current_position
+            else:
+                total_matches = Match.query.filter_by(request_id=request_id).count()
+                sent_matches = Match.query.filter(Match.request_id == request_id, Match.is_sent.is_(True)).count()
             
             return {
                 'total_matches': total_matches,
@@ -0,0 +1,79 @@
+import logging
+
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+
+from app.extensions import db
+from app.models.userInterestModel import UserInterest
+from app.models.userModel import User
+
+logger = logging.getLogger(__name__)
+
+
+class MutualMatchService:
+    """Mutual matches: pairs where both users said YES to each other's interest.
+
+    One query self-joins ``user_interests`` (the user's accepted interests
+    against the accepted interests pointing back at them) and projects the
+    other user's columns, so a page costs one round trip however many
+    interests the user has. Only current interests are joined (one per
+    pair, ``ix_user_interests_current_pair``), so each match is one row;
+    both sides of the join are served by the (interested_user_id,
+    target_user_id, response) index.
+    """
+
+    @staticmethod
+    def get_mutual_matches(user_id, after=None, limit=None):
+        """Mutual matches of ``user_id`` ordered by the user's interest ID.
+
+        ``after`` is the ``cursor`` of the last match already returned;
+        without ``limit`` every remaining match is returned. Returns
+        (matches, next cursor or None).
+        """
+        outgoing = aliased(UserInterest)
+        reverse = aliased(UserInterest)
+
+        query = db.session.query(
+            outgoing.id,
+            outgoing.target_user_id,
+            outgoing.response_at,
+            User.id.label('found_user_id'),
+            User.name,
+            User.phone_number,
+            reverse.id.label('reverse_id'),
+            reverse.response_at.label('reverse_response_at')
+        ).join(
+            reverse, and_(
+                reverse.interested_user_id == outgoing.target_user_id,
+                reverse.target_user_id == user_id,
+                reverse.response == 'YES',
+                reverse.superseded_at.is_(None)
+            )
+        ).outerjoin(
+            User, User.id == outgoing.target_user_id
+        ).filter(
+            outgoing.interested_user_id == user_id,
+            outgoing.response == 'YES',
+            outgoing.superseded_at.is_(None)
+        )
+        if after is not None:
+            query = query.filter(outgoing.id > after)
+
+        query = query.order_by(outgoing.id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if limit is not None else rows
+        matches = [{
+            'user_id': row.target_user_id,
+            'user_name': row.name if row.found_user_id is not None else 'Unknown',
+            'user_phone': row.phone_number if row.found_user_id is not None else 'Unknown',
+            'match_date': max(row.response_at, row.reverse_response_at).isoformat()
+            if row.response_at and row.reverse_response_at else None,
+            'interest_ids': [row.id, row.reverse_id]
+        } for row in rows]
+
+        logger.info(f"Found {len(matches)} mutual matches for user {user_id}")
+        return matches, rows[-1].id if has_more else None
@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import event, or_, select, union, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.matchModel import Match
+from app.models.userInterestModel import UserInterest
+from app.models.userSeenSetModel import UserSeenSet
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = 'seen_profiles'
+_WRITTEN_KEY = 'seen_profiles_written'
+
+
+class SeenSetStore:
+    """Per-user Bloom filters of the profiles a user has already been shown.
+
+    A profile counts as shown once it is sent in an SMS match batch or the
+    user expresses interest in it (swipes, DESCRIBE, paid interests): new
+    interests are picked up from every ORM flush, sent batches and bulk
+    swipes are recorded with ``add``. Additions are written to
+    ``user_seen_sets`` just before the transaction commits and reach the
+    in-memory cache after it does, so a rollback leaves no trace.
+
+    Tests are O(1) per profile and never miss a profile that was shown; a
+    profile never shown tests as seen with probability ``error_rate``, so
+    ``unseen`` confirms the filter's hits against match and interest
+    history (one indexed query over the hits only) before dropping them. A
+    filter that outgrows its capacity is rebuilt, twice the size, from
+    match and interest history since the last admin reset, which is also
+    how a user without a stored filter gets one. Cached filters are
+    reloaded after ``cache_ttl_s`` to pick up writes from other processes.
+    """
+
+    def __init__(self, capacity=256, error_rate=0.01, cache_size=10000, cache_ttl_s=60):
+        self.enabled = False
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache_size = cache_size
+        self.cache_ttl_s = cache_ttl_s
+        self._cache = OrderedDict()  # user_id -> (BloomFilter, loaded_at)
+        self._lock = threading.Lock()
+        self._installed = False
+        self._stats = {'hits': 0, 'loads': 0, 'rebuilds': 0, 'writes': 0, 'resets': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SEEN_SET_MODE', 'bloom') == 'bloom'
+        self.capacity = int(app.config.get('SEEN_SET_CAPACITY', self.capacity))
+        self.error_rate = float(app.config.get('SEEN_SET_ERROR_RATE', self.error_rate))
+        self.cache_size = int(app.config.get('SEEN_SET_CACHE_SIZE', self.cache_size))
+        self.cache_ttl_s = float(app.config.get('SEEN_SET_CACHE_TTL_S', self.cache_ttl_s))
+        if self.enabled and not self._installed:
+            event.listen(Session, 'before_flush', self._before_flush)
+            event.listen(Session, 'before_commit', self._before_commit)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._installed = True
+
+    def add(self, user_id, profile_ids, session=None):
+        """Record profiles shown to a user; stored when the current transaction commits"""
+        if not self.enabled:
+            return
+        session = session or db.session
+        # IDs from JWT identities arrive as strings
+        staged = session.info.setdefault(_SESSION_KEY, {}).setdefault(int(user_id), set())
+        staged.update(int(profile_id) for profile_id in profile_ids)
+
+    def unseen(self, user_id, profile_ids):
+        """``profile_ids`` (order kept) without the profiles the user has been shown"""
+        if not self.enabled or not profile_ids:
+            return list(profile_ids)
+        seen = self._filter(user_id).contains_many(profile_ids)
+        hits = [profile_id for profile_id, is_seen in zip(profile_ids, seen) if is_seen]
+        # A false positive would hide a profile for good; only the confirmed hits are dropped
+        shown = self._shown(db.session, user_id, hits) if hits else set()
+        return [profile_id for profile_id in profile_ids if profile_id not in shown]
+
+    def count(self, user_id):
+        """How many profiles the user has been shown (0 when disabled)"""
+        if not self.enabled:
+            return 0
+        return self._filter(user_id).count
+
+    def reset(self, user_id):
+        """Forget every profile the user has been shown (commits)"""
+        now = datetime.utcnow()
+        bloom = BloomFilter.empty(self.capacity, self.error_rate)
+        seen_set = db.session.get(UserSeenSet, user_id)
+        if seen_set is None:
+            seen_set = UserSeenSet(user_id=user_id)
+            db.session.add(seen_set)
+        seen_set.bits = bloom.to_bytes()
+        seen_set.num_hashes = bloom.num_hashes
+        seen_set.capacity = bloom.capacity
+        seen_set.item_count = 0
+        seen_set.reset_at = now
+        seen_set.updated_at = now
+        # Anything staged earlier in this transaction predates the reset
+        db.session.info.get(_SESSION_KEY, {}).pop(user_id, None)
+        db.session.commit()
+        with self._lock:
+            self._cache_locked(user_id, bloom)
+            self._stats['resets'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache), enabled=self.enabled)
+
+    def _filter(self, user_id):
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and time.monotonic() - cached[1] < self.cache_ttl_s:
+                self._cache.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return cached[0]
+
+        row = db.session.execute(
+            select(UserSeenSet.bits, UserSeenSet.num_hashes, UserSeenSet.capacity, UserSeenSet.item_count)
+            .where(UserSeenSet.user_id == user_id)
+        ).first()
+        if row is not None:
+            bloom = BloomFilter(row.bits, row.num_hashes, row.capacity, row.item_count)
+        else:
+            # Not stored yet: built from history, stored with the user's next addition
+            bloom = self._build(db.session, user_id)
+        with self._lock:
+            self._cache_locked(user_id, bloom)
+            self._stats['loads'] += 1
+        return bloom
+
+    def _build(self, session, user_id, since=None, min_capacity=0):
+        """A filter holding every profile in the user's match and interest history"""
+        sent = select(Match.matched_user_id).where(Match.requester_id == user_id, Match.is_sent.is_(True))
+        interests = select(UserInterest.target_user_id).where(UserInterest.interested_user_id == user_id)
+        if since is not None:
+            sent = sent.where(Match.created_at >= since)
+            interests = interests.where(UserInterest.created_at >= since)
+        profile_ids = session.execute(union(sent, interests)).scalars().all()
+
+        bloom = BloomFilter.empty(max(self.capacity, min_capacity, 2 * len(profile_ids)), self.error_rate)
+        bloom.add_many(profile_ids)
+        return bloom
+
+    def _shown(self, session, user_id, profile_ids):
+        """The profiles among ``profile_ids`` in the user's match and interest history since the last reset"""
+        since = select(UserSeenSet.reset_at).where(UserSeenSet.user_id == user_id).scalar_subquery()
+        sent = select(Match.matched_user_id).where(
+            Match.requester_id == user_id,
+            Match.matched_user_id.in_(profile_ids),
+            Match.is_sent.is_(True),
+            or_(since.is_(None), Match.created_at >= since)
+        )
+        interests = select(UserInterest.target_user_id).where(
+            UserInterest.interested_user_id == user_id,
+            UserInterest.target_user_id.in_(profile_ids),
+            or_(since.is_(None), UserInterest.created_at >= since)
+        )
+        return set(session.execute(union(sent, interests)).scalars())
+
+    def _write(self, session, user_id, profile_ids):
+        table = UserSeenSet.__table__
+        now = datetime.utcnow()
+        columns = (table.c.bits, table.c.num_hashes, table.c.capacity, table.c.item_count, table.c.reset_at)
+        row = session.execute(select(*columns).where(table.c.user_id == user_id).with_for_update()).first()
+        if row is None:
+            # Idempotent insert: a concurrent first write for the same user keeps its row and we merge into it
+            bloom = self._build(session, user_id)
+            insert = postgresql_insert if session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+            session.execute(insert(table).values(
+                user_id=user_id, bits=bloom.to_bytes(), num_hashes=bloom.num_hashes, capacity=bloom.capacity,
+                item_count=bloom.count, updated_at=now
+            ).on_conflict_do_nothing())
+            row = session.execute(select(*columns).where(table.c.user_id == user_id).with_for_update()).first()
+
+        bloom = BloomFilter(row.bits, row.num_hashes, row.capacity, row.item_count)
+        bloom.add_many(profile_ids)
+        if bloom.is_full:
+            bloom = self._build(session, user_id, since=row.reset_at, min_capacity=2 * bloom.count)
+            with self._lock:
+                self._stats['rebuilds'] += 1
+        session.execute(update(table).where(table.c.user_id == user_id).values(
+            bits=bloom.to_bytes(), num_hashes=bloom.num_hashes, capacity=bloom.capacity,
+            item_count=bloom.count, updated_at=now
+        ))
+        return bloom
+
+    def _cache_locked(self, user_id, bloom):
+        self._cache[user_id] = (bloom, time.monotonic())
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _before_flush(self, session, flush_context, instances):
+        for obj in session.new:
+            if isinstance(obj, UserInterest) and obj.interested_user_id and obj.target_user_id:
+                self.add(obj.interested_user_id, [obj.target_user_id], session)
+
+    def _before_commit(self, session):
+        if not session.info.get(_SESSION_KEY) and not session.new:
+            return
+        # Interests still pending would only be flushed after this hook
+        session.flush()
+        staged = session.info.pop(_SESSION_KEY, None)
+        if not staged:
+            return
+        written = session.info.setdefault(_WRITTEN_KEY, {})
+        for user_id, profile_ids in staged.items():
+            written[user_id] = self._write(session, user_id, profile_ids)
+        with self._lock:
+            self._stats['writes'] += len(staged)
+
+    def _after_commit(self, session):
+        if session.in_nested_transaction():
+            return
+        written = session.info.pop(_WRITTEN_KEY, None)
+        if written:
+            with self._lock:
+                for user_id, bloom in written.items():
+                    self._cache_locked(user_id, bloom)
+
+    def _after_rollback(self, session):
+        if session.in_nested_transaction():
+            return
+        session.info.pop(_SESSION_KEY, None)
+        session.info.pop(_WRITTEN_KEY, None)
+
+
+seen_sets = SeenSetStore()
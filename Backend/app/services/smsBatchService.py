@@ -0,0 +1,348 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.userModel import User
+from app.services.smsContext import SmsContext
+from app.services.smsDedupService import sms_deduplicator
+from app.services.smsMessagesService import SmsService
+from app.utils.transaction_scope import SCOPE_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_staged(value):
+    """Copy of a session.info entry down to its dicts, lists and sets (the objects in them are shared)"""
+    if isinstance(value, dict):
+        return {key: _copy_staged(item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return type(value)(value)
+    return value
+
+
+class GroupTransaction:
+    """One database transaction for a phone group, with a savepoint per message.
+
+    While the group is open it is the session's transaction scope (see
+    ``ScopedSession``): a handler's ``db.session.commit()`` releases the
+    current message's savepoint and ``rollback()`` rolls it back, then the
+    next savepoint begins. Rolling back also restores ``session.info`` to
+    what it held when the savepoint began, so the user change feed, seen
+    sets and gazetteer drop whatever the failed message staged for
+    after-commit. ``commit`` ends the group with a single real COMMIT.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._savepoint = None
+        self._staged = None
+
+    def __enter__(self):
+        if self.session.info.get(SCOPE_KEY) is not None:
+            raise RuntimeError('Session already has an open transaction scope')
+        self.session.info[SCOPE_KEY] = self
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._savepoint = None
+        if self.session.info.get(SCOPE_KEY) is self:
+            del self.session.info[SCOPE_KEY]
+        if self.session.in_transaction():
+            self.session.rollback()
+        return False
+
+    @contextmanager
+    def message(self):
+        """Run one message in its own savepoint; an exception rolls it back and propagates"""
+        self._begin()
+        try:
+            yield
+            self._end(keep=True)
+        except Exception:
+            self._end(keep=False)
+            raise
+        finally:
+            self._savepoint = None
+
+    def commit(self):
+        """Commit every message of the group at once; ends the scope"""
+        del self.session.info[SCOPE_KEY]
+        self.session.commit()
+
+    def release(self):
+        """Keep the current message's writes so far and begin the next savepoint"""
+        if self._savepoint is None:
+            return
+        self._end(keep=True)
+        self._begin()
+
+    def rollback(self):
+        """Undo the current message's writes (and staged events) since its last release"""
+        if self._savepoint is None:
+            return
+        self._end(keep=False)
+        self._begin()
+
+    def _begin(self):
+        self._staged = {key: _copy_staged(value) for key, value in self.session.info.items()}
+        self._savepoint = self.session.begin_nested()
+
+    def _end(self, keep):
+        if self._is_open():
+            if keep:
+                self._savepoint.commit()
+            else:
+                self._savepoint.rollback()
+        if not keep:
+            self.session.info.clear()
+            self.session.info.update(self._staged)
+
+    def _is_open(self):
+        # Still open even when a failed flush deactivated it
+        return self.session.get_nested_transaction() is self._savepoint
+
+
+class SmsBatchService:
+    """Processes a gateway backlog of inbound SMS in one request.
+
+    Messages are grouped by sender phone. Each group is processed strictly in
+    its original order, while different groups are spread over a small worker
+    pool. Every worker runs in its own app context (and so its own database
+    session) and resolves the senders of all its groups with a single query
+    before processing, instead of one lookup per message. Each group runs
+    in one transaction (see ``GroupTransaction``) and commits once.
+    """
+
+    REQUIRED_FIELDS = ['from_phone', 'to_phone', 'message_body', 'direction']
+    OPTIONAL_FIELDS = ['gateway_message_id']
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, max_workers)
+
+    def process_batch(self, messages):
+        """Process a list of message dicts, returning one result per message in input order"""
+        results = [None] * len(messages)
+        groups = OrderedDict()
+
+        for index, item in enumerate(messages):
+            error = self.validate_message(item)
+            if error:
+                results[index] = {
+                    'index': index,
+                    'success': False,
+                    'from_phone': item.get('from_phone') if isinstance(item, dict) else None,
+                    'error': error,
+                    'status': 'invalid_message',
+                    'status_code': 400
+                }
+                continue
+
+            context = self.build_context(item)
+            groups.setdefault(self.phone_key(item, context), []).append((index, item, context))
+
+        if not groups:
+            return results
+
+        # Largest groups first, dealt round-robin so workers get similar loads
+        worker_count = min(self.max_workers, len(groups))
+        if db.engine.dialect.name == 'sqlite':
+            # One writer at a time: concurrent group transactions would fail with "database is locked"
+            worker_count = 1
+        buckets = [[] for _ in range(worker_count)]
+        for position, group in enumerate(sorted(groups.values(), key=len, reverse=True)):
+            buckets[position % worker_count].append(group)
+
+        if worker_count == 1:
+            for index, result in self._process_groups(buckets[0]):
+                results[index] = result
+            return results
+
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='sms-batch') as executor:
+            futures = [executor.submit(self._run_worker, app, bucket) for bucket in buckets]
+            for future in futures:
+                for index, result in future.result():
+                    results[index] = result
+
+        return results
+
+    @classmethod
+    def validate_message(cls, item):
+        """Same checks as /process-incoming; returns an error string or None"""
+        if not isinstance(item, dict):
+            return 'Message must be an object'
+
+        missing_fields = [field for field in cls.REQUIRED_FIELDS if field not in item]
+        if missing_fields:
+            return f'Missing required fields: {", ".join(missing_fields)}'
+
+        if item['direction'] not in ['incoming', 'outgoing']:
+            return 'Direction must be either "incoming" or "outgoing"'
+
+        return None
+
+    @classmethod
+    def message_fields(cls, item):
+        """The fields of a message dict that processing needs (safe to pickle to lane workers)"""
+        message = {field: item[field] for field in cls.REQUIRED_FIELDS}
+        for field in cls.OPTIONAL_FIELDS:
+            if item.get(field):
+                message[field] = item[field]
+        return message
+
+    @staticmethod
+    def build_context(item):
+        gateway_message_id = item.get('gateway_message_id') if item['direction'] == 'incoming' else None
+        return SmsContext(item['from_phone'], item['message_body'], gateway_message_id)
+
+    @staticmethod
+    def phone_key(item, context=None):
+        """Ordering key for a message: the normalized phone of the user it belongs to"""
+        if item['direction'] != 'incoming':
+            return item['to_phone']
+        context = context or SmsContext(item['from_phone'], item['message_body'])
+        return context.normalized_phone or item['from_phone']
+
+    def _run_worker(self, app, groups):
+        with app.app_context():
+            try:
+                return self._process_groups(groups)
+            finally:
+                db.session.remove()
+
+    def _process_groups(self, groups):
+        """Process a worker's phone groups; returns [(index, result)]"""
+        sms_service = SmsService()
+
+        # One lookup for every sender handled by this worker
+        phones = {context.normalized_phone for group in groups
+                  for _, _, context in group if context.normalized_phone}
+        try:
+            users = User.find_by_phones(phones)
+        except Exception as e:
+            logger.error(f"Batch sender lookup failed: {str(e)}")
+            db.session.rollback()
+            users = None
+
+        processed = []
+        for group in groups:
+            _, _, first_context = group[0]
+            known = users is not None
+            user = users.get(first_context.normalized_phone) if known else None
+            results, error = [], None
+            with GroupTransaction(db.session()) as transaction:
+                for index, item, context in group:
+                    # Later messages see users created or loaded by earlier ones (e.g. PENZI)
+                    if known:
+                        context.set_user(user)
+                    with transaction.message():
+                        result = self.process_message(sms_service, item, context)
+                    result['index'] = index
+                    results.append((index, result))
+                    if context.is_resolved:
+                        known, user = True, context.user
+                try:
+                    transaction.commit()
+                except Exception as e:
+                    logger.error(f"Batch commit for {first_context.normalized_phone} failed: {str(e)}")
+                    error = e
+            processed.extend(self._group_failed(group, error) if error else results)
+
+        return processed
+
+    @staticmethod
+    def _group_failed(group, error):
+        """Results for a group whose commit failed: nothing of it was stored"""
+        results = []
+        for index, item, context in group:
+            if context.gateway_message_id:
+                sms_deduplicator.release(context.gateway_message_id)
+            results.append((index, {
+                'index': index,
+                'from_phone': item['from_phone'],
+                'to_phone': item['to_phone'],
+                'message_body': item['message_body'],
+                'direction': item['direction'],
+                'success': False,
+                'error': str(error),
+                'error_type': type(error).__name__,
+                'status': 'sms_service_exception',
+                'status_code': 500
+            }))
+        return results
+
+    @staticmethod
+    def process_message(sms_service, item, context):
+        """Mirror of /process-incoming for one validated message, as a result dict"""
+        def process():
+            result = SmsBatchService._process_message(sms_service, item, context)
+            return result, result['status_code']
+
+        # Retried gateway message IDs get their stored result instead of a second run
+        result, status_code = sms_deduplicator.run_once(context, item['to_phone'], process)
+        return dict(result, status_code=status_code)
+
+    @staticmethod
+    def _process_message(sms_service, item, context):
+        from_phone = item['from_phone']
+        to_phone = item['to_phone']
+        message_body = item['message_body']
+        direction = item['direction']
+
+        result = {
+            'from_phone': from_phone,
+            'to_phone': to_phone,
+            'message_body': message_body,
+            'direction': direction
+        }
+
+        try:
+            if direction == 'incoming':
+                is_penzi_command = message_body.strip().upper() == 'PENZI'
+                if not is_penzi_command and not context.user:
+                    result.update({
+                        'success': False,
+                        'error': f'User not found: {context.lookup_message}. '
+                                 f'Please send PENZI to 22141 to activate service first.',
+                        'status': 'user_not_found',
+                        'status_code': 404
+                    })
+                    return result
+
+                response = sms_service.process_incoming_sms(from_phone, message_body, context)
+
+                if isinstance(response, dict) and not response.get('success', True):
+                    result.update({
+                        'success': False,
+                        'error': response.get('message', 'SMS processing failed'),
+                        'sms_service_response': response,
+                        'status': 'sms_processing_failed',
+                        'status_code': 400
+                    })
+                    return result
+            else:
+                response = sms_service.send_response(to_phone, message_body)
+
+            result.update({
+                'success': True,
+                'response': response,
+                'status': 'processed',
+                'status_code': 200
+            })
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Batch SMS from {from_phone} failed: {str(e)}")
+            result.update({
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__,
+                'status': 'sms_service_exception',
+                'status_code': 500
+            })
+
+        return result
@@ -0,0 +1,267 @@
+from typing import Callable, NamedTuple, Optional
+
+
+class SmsCommandError(ValueError):
+    """Raised by a command parser; carries the SMS reply and its message type"""
+
+    def __init__(self, message, message_type):
+        super().__init__(message)
+        self.message = message
+        self.message_type = message_type
+
+
+# Typed commands produced by the parser
+
+class BareCommand(NamedTuple):
+    keyword: str
+
+
+class StartCommand(NamedTuple):
+    name: str
+    age: int
+    gender: str
+    county: str
+    town: str
+
+
+class DetailsCommand(NamedTuple):
+    education: str
+    profession: str
+    marital_status: str
+    religion: str
+    ethnicity: str
+
+
+class MyselfCommand(NamedTuple):
+    description: str
+
+
+class MatchCommand(NamedTuple):
+    age_min: int
+    age_max: int
+    town: str
+    age_range: str
+
+
+class DescribeCommand(NamedTuple):
+    target_phone: str
+
+
+class ResponseCommand(NamedTuple):
+    response: str
+
+
+# Command kinds
+EXACT = 'exact'      # whole message is the keyword: NEXT, STOP, YES
+FIELDS = 'fields'    # keyword#field#field...: START#, MATCH#
+PREFIX = 'prefix'    # message starts with the keyword: MYSELF, IMAGES, DESCRIBE
+
+
+class SmsCommandSpec(NamedTuple):
+    keyword: str
+    handler: str
+    kind: str = EXACT
+    arity: int = 0
+    parser: Optional[Callable] = None
+    usage: Optional[str] = None
+    error_type: Optional[str] = None
+    requires_user: bool = True
+
+
+class ParsedSms(NamedTuple):
+    spec: Optional[SmsCommandSpec]
+    command: object = None
+    error: Optional[SmsCommandError] = None
+
+
+_UNKNOWN = ParsedSms(None)
+
+
+class SmsCommandRegistry:
+    """Keyword -> command spec table used by SmsService to route inbound SMS.
+
+    A message is tokenized once: the leading word selects the spec with a
+    dict lookup and the spec's parser turns the rest into a typed command.
+    Adding a command is a single ``register`` call.
+    """
+
+    def __init__(self):
+        self._commands = {}
+        self._constant = {}
+        self._prefix_commands = []
+
+    def register(self, keyword, handler, kind=EXACT, arity=0, parser=None,
+                 usage=None, error_type=None, requires_user=True):
+        spec = SmsCommandSpec(keyword.upper(), handler, kind, arity, parser,
+                              usage, error_type, requires_user)
+        self._commands[spec.keyword] = spec
+        if kind == EXACT or parser is None:
+            # Payload-free commands always parse the same way; build the result once
+            command = parser(spec, spec.keyword, spec.keyword) if parser else BareCommand(spec.keyword)
+            self._constant[spec.keyword] = ParsedSms(spec, command)
+        if kind == PREFIX:
+            self._prefix_commands.append(spec)
+        return spec
+
+    def get(self, keyword):
+        return self._commands.get(keyword.upper())
+
+    def keywords(self):
+        return list(self._commands)
+
+    def parse(self, message_body):
+        """Tokenize a raw SMS into a ParsedSms (spec None for unknown commands)"""
+        original = (message_body or '').strip()
+        upper = original.upper()
+
+        # Exact keywords (PENZI, NEXT, YES...) are the whole message
+        parsed = self._constant.get(upper)
+        if parsed is not None:
+            return parsed
+
+        spec = self._commands.get(upper)
+        if spec is None or spec.kind == FIELDS:
+            keyword, sep, rest = upper.partition('#')
+            if not sep:
+                keyword, _, rest = upper.partition(' ')
+                rest = ' ' + rest if rest else ''
+            else:
+                rest = '#' + rest
+            spec = self._commands.get(keyword)
+            if spec is not None and not self._accepts(spec, rest):
+                spec = None
+
+        if spec is None:
+            # e.g. "MYSELFtall" - only prefix commands can be glued to their text
+            for prefix_spec in self._prefix_commands:
+                if upper.startswith(prefix_spec.keyword):
+                    spec = prefix_spec
+                    break
+            else:
+                return _UNKNOWN
+
+        if spec.parser is None:
+            return self._constant[spec.keyword]
+
+        try:
+            return ParsedSms(spec, spec.parser(spec, original, upper))
+        except SmsCommandError as e:
+            return ParsedSms(spec, error=e)
+
+    @staticmethod
+    def _accepts(spec, rest):
+        if spec.kind == EXACT:
+            return rest == ''
+        if spec.kind == FIELDS:
+            return rest.startswith('#')
+        return True
+
+
+def _split_fields(spec, text):
+    """Split keyword#a#b... into exactly ``spec.arity`` fields"""
+    parts = text.split('#')
+    if len(parts) != spec.arity + 1:
+        raise SmsCommandError(spec.usage, spec.error_type)
+    return parts[1:]
+
+
+def parse_start(spec, original, upper):
+    name, age, gender, county, town = _split_fields(spec, upper)
+
+    if not all([name, age, gender, county, town]):
+        raise SmsCommandError("All fields are required. Please try again.", spec.error_type)
+
+    try:
+        age = int(age)
+    except ValueError:
+        raise SmsCommandError("Invalid age format.", spec.error_type)
+    if age < 18:
+        raise SmsCommandError("You must be at least 18 years old.", spec.error_type)
+
+    if gender.upper() not in ['MALE', 'FEMALE']:
+        raise SmsCommandError("Gender must be Male or Female.", spec.error_type)
+
+    return StartCommand(name, age, gender, county, town)
+
+
+def parse_details(spec, original, upper):
+    fields = [field.strip() for field in _split_fields(spec, upper)]
+
+    if not all(fields) or any(len(field) < 2 for field in fields):
+        raise SmsCommandError("All fields are required and must be at least 2 characters long.",
+                              spec.error_type)
+
+    return DetailsCommand(*fields)
+
+
+def parse_myself(spec, original, upper):
+    description = original[len(spec.keyword):].strip()
+    if len(description) < 3:
+        raise SmsCommandError("Please provide a description.", spec.error_type)
+    return MyselfCommand(description)
+
+
+def parse_age_range(age_range):
+    """Parse '25-30' or '25' into (age_min, age_max); raises ValueError"""
+    if "-" in age_range:
+        age_min, age_max = map(int, age_range.split("-"))
+    else:
+        age_min = age_max = int(age_range)
+    return age_min, age_max
+
+
+def parse_match(spec, original, upper):
+    age_range, town = _split_fields(spec, upper)
+    try:
+        age_min, age_max = parse_age_range(age_range)
+    except ValueError:
+        raise SmsCommandError(spec.usage, spec.error_type)
+    if not town.strip():
+        raise SmsCommandError(spec.usage, spec.error_type)
+    return MatchCommand(age_min, age_max, town, age_range)
+
+
+def parse_describe(spec, original, upper):
+    parts = upper.split()
+    if len(parts) != 2:
+        raise SmsCommandError(spec.usage, spec.error_type)
+
+    target_phone = parts[1].strip()
+    if target_phone.startswith('+'):
+        target_phone = target_phone[1:]
+    if target_phone.startswith('254') and len(target_phone) > 10:
+        target_phone = '0' + target_phone[3:]
+    return DescribeCommand(target_phone)
+
+
+def parse_response(spec, original, upper):
+    return ResponseCommand(spec.keyword)
+
+
+sms_commands = SmsCommandRegistry()
+
+sms_commands.register('PENZI', 'handle_activation', requires_user=False)
+sms_commands.register('START', 'handle_initial_registration', kind=FIELDS, arity=5,
+                      parser=parse_start, error_type='registration_error',
+                      usage="Invalid format. Use: start#name#age#gender#county#town")
+sms_commands.register('DETAILS', 'handle_details_registration', kind=FIELDS, arity=5,
+                      parser=parse_details, error_type='registration_error',
+                      usage="Invalid format. Use: details#education#profession#marital#religion#ethnicity")
+sms_commands.register('MYSELF', 'handle_self_description', kind=PREFIX,
+                      parser=parse_myself, error_type='registration_error')
+sms_commands.register('IMAGES', 'handle_image_upload_guide', kind=PREFIX)
+sms_commands.register('MATCH', 'handle_match_request', kind=FIELDS, arity=2,
+                      parser=parse_match, error_type='match_error',
+                      usage="Invalid format. Use: match#age#town")
+sms_commands.register('COUNT', 'handle_count_request', kind=FIELDS, arity=2,
+                      parser=parse_match, error_type='count_error',
+                      usage="Invalid format. Use: count#age#town")
+sms_commands.register('NEXT', 'handle_next_matches')
+sms_commands.register('DESCRIBE', 'handle_describe_request', kind=PREFIX,
+                      parser=parse_describe, error_type='interest_error',
+                      usage="Invalid format. Use: DESCRIBE 0701234567")
+sms_commands.register('YES', 'handle_interest_response', parser=parse_response)
+sms_commands.register('NO', 'handle_interest_response', parser=parse_response)
+sms_commands.register('STOP', 'handle_stop_service')
+sms_commands.register('STATS', 'handle_user_stats')
+sms_commands.register('HISTORY', 'handle_user_history')
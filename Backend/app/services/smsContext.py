@@ -0,0 +1,55 @@
+from app.models.userModel import User
+from app.services.userService import UserService
+
+_UNRESOLVED = object()
+
+
+class SmsContext:
+    """Request-scoped identity for one inbound SMS.
+
+    The canonical phone number and the sender's ``User`` are resolved at most
+    once and shared by the route, the dispatcher and every handler, so a
+    message costs a single user lookup query no matter how many places need
+    the sender.
+    """
+
+    def __init__(self, from_phone, message_body=None, gateway_message_id=None):
+        self.from_phone = from_phone
+        self.message_body = message_body
+        self.gateway_message_id = gateway_message_id
+        # Set when the incoming row was already written (idempotency claim)
+        self.incoming_logged = False
+        self._normalized_phone = _UNRESOLVED
+        self._user = _UNRESOLVED
+
+    @property
+    def normalized_phone(self):
+        """Sender phone in +254 format, or None if it is not a valid Kenyan number"""
+        if self._normalized_phone is _UNRESOLVED:
+            self._normalized_phone = UserService.validate_phone_number(self.from_phone or '')
+        return self._normalized_phone
+
+    @property
+    def user(self):
+        """Sender ``User`` (looked up on first access), or None"""
+        if self._user is _UNRESOLVED:
+            self._user = User.find_by_phone(self.normalized_phone) if self.normalized_phone else None
+        return self._user
+
+    @property
+    def is_resolved(self):
+        return self._user is not _UNRESOLVED
+
+    @property
+    def lookup_message(self):
+        """Same status strings as UserService.get_user_by_phone"""
+        if not self.normalized_phone:
+            return "Invalid phone number format"
+        return "User found" if self.user else "User not found"
+
+    def set_user(self, user):
+        """Record a user created or loaded elsewhere (e.g. on PENZI activation)"""
+        self._user = user
+
+    def __repr__(self):
+        return f'<SmsContext {self.from_phone} resolved={self.is_resolved}>'
@@ -0,0 +1,196 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+
+logger = logging.getLogger(__name__)
+
+
+class SmsDuplicate(NamedTuple):
+    """Stored outcome of an already-seen gateway message (body None while it is still running)"""
+    body: Optional[dict]
+    status_code: int
+
+    def response(self, gateway_message_id):
+        if self.body is None:
+            return {
+                'success': True,
+                'gateway_message_id': gateway_message_id,
+                'status': 'duplicate_in_progress',
+                'duplicate': True
+            }, 202
+        return dict(self.body, duplicate=True), self.status_code
+
+
+_IN_FLIGHT = SmsDuplicate(None, 202)
+
+
+class SmsDeduplicator:
+    """Makes inbound SMS processing idempotent per gateway message ID.
+
+    The unique ``sms_messages.gateway_message_id`` column is the source of
+    truth: the first delivery inserts the incoming row (the claim), runs the
+    handler and stores the reply in ``response_body``. A retried delivery hits
+    the unique index and gets the stored reply back without the handler
+    running again. An LRU of recent replies answers most retries without a
+    query. If processing fails with a server error the claim is released so
+    the gateway's next retry is processed normally. A claim still without a
+    reply after ``claim_lease_s`` (its process died mid-run) is taken over by
+    the next delivery with a conditional UPDATE, so only one retry wins it.
+    """
+
+    def __init__(self, cache_size=10000, claim_lease_s=300):
+        self.cache_size = cache_size
+        self.claim_lease_s = claim_lease_s
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_size = int(app.config.get('SMS_DEDUP_CACHE_SIZE', self.cache_size))
+        self.claim_lease_s = int(app.config.get('SMS_DEDUP_CLAIM_LEASE_S', self.claim_lease_s))
+
+    def run_once(self, context, to_phone, process):
+        """Run ``process() -> (body, status_code)`` at most once per ``context.gateway_message_id``"""
+        gateway_message_id = context.gateway_message_id
+        if not gateway_message_id:
+            return process()
+
+        duplicate = self.claim(gateway_message_id, context.from_phone, to_phone, context.message_body)
+        if duplicate is not None:
+            logger.info(f"Duplicate gateway message {gateway_message_id} from {context.from_phone}")
+            return duplicate.response(gateway_message_id)
+
+        context.incoming_logged = True
+        try:
+            body, status_code = process()
+        except Exception:
+            self.release(gateway_message_id)
+            raise
+
+        if status_code >= 500:
+            self.release(gateway_message_id)
+        else:
+            self.record(gateway_message_id, body, status_code)
+        return body, status_code
+
+    def claim(self, gateway_message_id, from_phone, to_phone, message_body):
+        """Insert the incoming row for this ID; returns None if claimed, else the SmsDuplicate"""
+        # Only finished replies are cached: a claim in progress may expire
+        cached = self._cache_get(gateway_message_id)
+        if cached is not None:
+            return cached
+
+        now = datetime.utcnow()
+        db.session.add(SmsMessage(
+            from_phone=from_phone,
+            to_phone=to_phone,
+            message_body=(message_body or '').strip(),
+            direction='incoming',
+            status='processed',
+            gateway_message_id=gateway_message_id,
+            claimed_at=now
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if self._take_over(gateway_message_id, now):
+                logger.warning(f"Took over expired claim on gateway message {gateway_message_id}")
+                return None
+            stored = db.session.query(SmsMessage.response_body).filter(
+                SmsMessage.gateway_message_id == gateway_message_id
+            ).scalar()
+            duplicate = self._load(stored)
+            if duplicate.body is not None:
+                self._cache_put(gateway_message_id, duplicate)
+            return duplicate
+
+        return None
+
+    def record(self, gateway_message_id, body, status_code):
+        """Store the reply generated for a claimed ID"""
+        duplicate = SmsDuplicate(body, status_code)
+        try:
+            db.session.execute(
+                update(SmsMessage.__table__)
+                .where(SmsMessage.__table__.c.gateway_message_id == gateway_message_id)
+                .values(response_body=json.dumps({'status_code': status_code, 'body': body}, default=str))
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to store response for gateway message {gateway_message_id}: {str(e)}")
+        self._cache_put(gateway_message_id, duplicate)
+
+    def release(self, gateway_message_id):
+        """Forget a claim so the next delivery of this ID is processed again"""
+        with self._lock:
+            self._cache.pop(gateway_message_id, None)
+        try:
+            db.session.rollback()
+            db.session.execute(
+                update(SmsMessage.__table__)
+                .where(SmsMessage.__table__.c.gateway_message_id == gateway_message_id)
+                .values(gateway_message_id=None)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to release gateway message {gateway_message_id}: {str(e)}")
+
+    def _take_over(self, gateway_message_id, now):
+        """Claim an ID whose holder left it without a reply for longer than the lease"""
+        table = SmsMessage.__table__
+        try:
+            taken = db.session.execute(
+                update(table)
+                .where(
+                    table.c.gateway_message_id == gateway_message_id,
+                    table.c.response_body.is_(None),
+                    # Claims stored before claimed_at existed have none
+                    or_(table.c.claimed_at.is_(None),
+                        table.c.claimed_at < now - timedelta(seconds=self.claim_lease_s))
+                )
+                .values(claimed_at=now)
+            ).rowcount == 1
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to take over gateway message {gateway_message_id}: {str(e)}")
+            return False
+        return taken
+
+    @staticmethod
+    def _load(stored):
+        if not stored:
+            return _IN_FLIGHT
+        try:
+            payload = json.loads(stored)
+            return SmsDuplicate(payload.get('body'), int(payload.get('status_code', 200)))
+        except (ValueError, TypeError):
+            return _IN_FLIGHT
+
+    def _cache_get(self, gateway_message_id):
+        with self._lock:
+            duplicate = self._cache.get(gateway_message_id)
+            if duplicate is not None:
+                self._cache.move_to_end(gateway_message_id)
+            return duplicate
+
+    def _cache_put(self, gateway_message_id, duplicate):
+        with self._lock:
+            self._cache[gateway_message_id] = duplicate
+            self._cache.move_to_end(gateway_message_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+sms_deduplicator = SmsDeduplicator()
@@ -0,0 +1,238 @@
+import atexit
+import logging
+import multiprocessing
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, or_, update
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+from app.services.smsGateway import create_gateway
+from app.utils.bulk_writes import bulk_update
+
+logger = logging.getLogger(__name__)
+
+
+class SmsDispatcher:
+    """Outbound SMS queue on top of ``sms_messages.status``.
+
+    With ``SMS_DISPATCH_MODE=queue`` replies are written as ``pending`` and the
+    webhook returns immediately. A pool of worker threads claims due rows with
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` (marking them ``sending`` with a
+    lease), hands them to the gateway in batches and records the outcome:
+    ``sent``, or back to ``pending`` with exponential backoff until
+    ``max_attempts`` is reached and the row becomes ``failed``. A ``sending``
+    row whose lease expired (worker crashed mid-send) is claimed again.
+    """
+
+    def __init__(self, workers=2, batch_size=100, poll_interval_ms=500, max_attempts=5,
+                 backoff_base_s=2, backoff_max_s=300, lease_s=60):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval_ms = poll_interval_ms
+        self.max_attempts = max_attempts
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.lease_s = lease_s
+        self.gateway = None
+        self.queued = False
+        self._app = None
+        self._threads = []
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'sent': 0, 'retried': 0, 'failed': 0, 'gateway_calls': 0}
+
+    def init_app(self, app):
+        """Configure the dispatcher from app config and start it if enabled"""
+        self._app = app
+        self.workers = int(app.config.get('SMS_DISPATCH_WORKERS', self.workers))
+        self.batch_size = int(app.config.get('SMS_DISPATCH_BATCH_SIZE', self.batch_size))
+        self.poll_interval_ms = int(app.config.get('SMS_DISPATCH_POLL_INTERVAL_MS', self.poll_interval_ms))
+        self.max_attempts = int(app.config.get('SMS_DISPATCH_MAX_ATTEMPTS', self.max_attempts))
+
+        self.queued = app.config.get('SMS_DISPATCH_MODE', 'off') == 'queue'
+        if self.queued:
+            self.gateway = create_gateway(app.config)
+            # Lane worker processes of the SMS engine build their own app; their replies are
+            # queued for the parent's workers, which poll for them
+            if multiprocessing.parent_process() is None:
+                self.start()
+
+    @property
+    def enabled(self):
+        return bool(self._threads) and not self._stopping
+
+    @property
+    def outgoing_status(self):
+        """Status for a new outgoing row: queued for dispatch, or just recorded"""
+        return 'pending' if self.enabled or self.queued else 'processed'
+
+    def start(self):
+        """Start the worker threads"""
+        if self.enabled:
+            return
+        if self.gateway is None:
+            self.gateway = create_gateway(self._app.config if self._app else {})
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f'sms-dispatch-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.stop)
+        logger.info(f"SMS dispatcher started ({self.workers} workers, gateway={self.gateway.name})")
+
+    def stop(self):
+        """Stop the workers; unsent rows stay pending for the next start"""
+        if not self._threads:
+            return
+        atexit.unregister(self.stop)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+
+    def notify(self):
+        """Wake an idle worker after a reply has been queued"""
+        with self._condition:
+            self._condition.notify()
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def dispatch_once(self):
+        """Claim one batch of due messages and send it; returns the number claimed.
+
+        Must be called inside an app context.
+        """
+        rows = self._claim_batch()
+        if not rows:
+            return 0
+
+        results = {}
+        max_batch = max(1, self.gateway.max_batch_size)
+        for start in range(0, len(rows), max_batch):
+            chunk = rows[start:start + max_batch]
+            messages = [{'id': row.id, 'to': row.to_phone, 'message': row.message_body} for row in chunk]
+            try:
+                results.update(self.gateway.send_batch(messages))
+            except Exception as e:
+                logger.warning(f"SMS gateway call failed for {len(chunk)} messages: {str(e)}")
+                results.update({row.id: str(e) or type(e).__name__ for row in chunk})
+            with self._stats_lock:
+                self._stats['gateway_calls'] += 1
+
+        self._record_results(rows, results)
+        return len(rows)
+
+    def _claim_batch(self):
+        now = datetime.utcnow()
+        due = or_(
+            and_(SmsMessage.status == 'pending',
+                 or_(SmsMessage.next_attempt_at.is_(None), SmsMessage.next_attempt_at <= now)),
+            and_(SmsMessage.status == 'sending', SmsMessage.next_attempt_at <= now)
+        )
+
+        # SKIP LOCKED keeps Postgres workers off each other's rows; other
+        # databases ignore FOR UPDATE, so claims are serialized in-process there
+        serialize = db.engine.dialect.name != 'postgresql'
+        if serialize:
+            self._claim_lock.acquire()
+        try:
+            rows = db.session.query(
+                SmsMessage.id, SmsMessage.to_phone, SmsMessage.message_body, SmsMessage.attempts
+            ).filter(
+                SmsMessage.direction == 'outgoing', due
+            ).order_by(SmsMessage.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            if rows:
+                bulk_update(SmsMessage, [row.id for row in rows], {
+                    'status': 'sending', 'next_attempt_at': now + timedelta(seconds=self.lease_s)
+                })
+            db.session.commit()
+            return rows
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if serialize:
+                self._claim_lock.release()
+
+    def _record_results(self, rows, results):
+        now = datetime.utcnow()
+        table = SmsMessage.__table__
+        sent_ids = [row.id for row in rows if results.get(row.id) is None]
+        failures = [row for row in rows if results.get(row.id) is not None]
+
+        try:
+            bulk_update(SmsMessage, sent_ids, {
+                'status': 'sent', 'sent_at': now, 'attempts': table.c.attempts + 1,
+                'next_attempt_at': None, 'last_error': None
+            })
+
+            retried = failed = 0
+            if failures:
+                params = []
+                for row in failures:
+                    attempts = (row.attempts or 0) + 1
+                    if attempts >= self.max_attempts:
+                        status, next_attempt_at = 'failed', None
+                        failed += 1
+                    else:
+                        status, next_attempt_at = 'pending', now + timedelta(seconds=self.backoff_delay(attempts))
+                        retried += 1
+                    params.append({
+                        'row_id': row.id,
+                        'new_status': status,
+                        'new_attempts': attempts,
+                        'retry_at': next_attempt_at,
+                        'error': str(results[row.id])[:1000]
+                    })
+                db.session.execute(
+                    update(table).where(table.c.id == bindparam('row_id')).values(
+                        status=bindparam('new_status'), attempts=bindparam('new_attempts'),
+                        next_attempt_at=bindparam('retry_at'), last_error=bindparam('error')
+                    ),
+                    params
+                )
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        with self._stats_lock:
+            self._stats['sent'] += len(sent_ids)
+            self._stats['retried'] += retried
+            self._stats['failed'] += failed
+
+    def backoff_delay(self, attempts):
+        """Seconds before retry number ``attempts``: exponential with jitter"""
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        interval = self.poll_interval_ms / 1000.0
+        while not self._stopping:
+            claimed = 0
+            try:
+                with self._app.app_context():
+                    claimed = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"SMS dispatcher error: {str(e)}")
+
+            if claimed < self.batch_size:
+                with self._condition:
+                    if not self._stopping:
+                        self._condition.wait(timeout=interval)
+
+
+sms_dispatcher = SmsDispatcher()
@@ -0,0 +1,281 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from app.services.smsBatchService import SmsBatchService
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+class LaneStats:
+    """Counters and a rolling latency window for one lane"""
+
+    def __init__(self, window=1000):
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)      # submit -> result, seconds
+        self.service_times = deque(maxlen=window)  # time spent processing, seconds
+
+    @property
+    def depth(self):
+        return self.submitted - self.completed
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return {'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+        ordered = sorted(samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+        return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'max_ms': round(ordered[-1] * 1000, 2)}
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'errors': self.errors,
+            'latency': self._percentiles(list(self.latencies)),
+            'service_time': self._percentiles(list(self.service_times))
+        }
+
+
+def _process_item(sms_service, item):
+    """Run one message through SmsService; returns (result, service_seconds)"""
+    started = time.perf_counter()
+    context = SmsBatchService.build_context(item)
+    result = SmsBatchService.process_message(sms_service, item, context)
+    return result, time.perf_counter() - started
+
+
+def _lane_process_main(lane_id, inbox, outbox):
+    """Entry point of a lane worker process: its own app, session and SmsService"""
+    from app import create_app
+    from app.services.smsMessagesService import SmsService
+
+    app = create_app()
+    sms_service = SmsService()
+
+    while True:
+        job = inbox.get()
+        if job is _STOP:
+            break
+        request_id, item = job
+        try:
+            with app.app_context():
+                result, service_time = _process_item(sms_service, item)
+        except Exception as e:
+            result, service_time = {'success': False, 'error': str(e), 'error_type': type(e).__name__,
+                                    'status': 'sms_service_exception', 'status_code': 500}, 0.0
+        outbox.put((lane_id, request_id, result, service_time))
+
+
+class SmsProcessingEngine:
+    """Processes inbound SMS on N ordered lanes keyed by phone number.
+
+    ``crc32(phone) % lanes`` picks the lane, so every message from one user
+    lands on the same single-worker lane and is handled in arrival order
+    (START# is never overtaken by DETAILS#), while different users run in
+    parallel. A slow MATCH# only delays its own lane.
+
+    ``mode='thread'`` runs each lane as a thread in this process;
+    ``mode='process'`` runs each lane in its own worker process with its own
+    app and database connection, sidestepping the GIL for CPU-heavy matching.
+    ``submit`` returns a Future resolving to the same result dict that
+    SmsBatchService.process_message produces.
+    """
+
+    def __init__(self, lanes=4, mode='thread', timeout_s=30):
+        self.lanes = lanes
+        self.mode = mode
+        self.timeout_s = timeout_s
+        self._app = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._stats = []
+        self._inboxes = []
+        self._workers = []
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._outbox = None
+        self._collector = None
+
+    def init_app(self, app):
+        """Configure the engine from app config and start it if enabled"""
+        self._app = app
+        self.lanes = int(app.config.get('SMS_ENGINE_LANES', self.lanes))
+        self.timeout_s = float(app.config.get('SMS_ENGINE_TIMEOUT_S', self.timeout_s))
+        mode = app.config.get('SMS_ENGINE_MODE', 'off')
+
+        # Lane worker processes build their own app; they must not start lanes of their own
+        if mode in ('thread', 'process') and multiprocessing.parent_process() is None:
+            self.mode = mode
+            self.start()
+
+    @property
+    def enabled(self):
+        return self._running
+
+    def lane_for(self, phone_key):
+        return zlib.crc32(str(phone_key).encode()) % self.lanes
+
+    def start(self):
+        """Start one worker per lane"""
+        if self._running:
+            return
+        self._stats = [LaneStats() for _ in range(self.lanes)]
+
+        if self.mode == 'process':
+            mp = multiprocessing.get_context('spawn')
+            self._outbox = mp.Queue()
+            self._inboxes = [mp.Queue() for _ in range(self.lanes)]
+            self._workers = [
+                mp.Process(target=_lane_process_main, args=(lane_id, inbox, self._outbox),
+                           name=f'sms-lane-{lane_id}', daemon=True)
+                for lane_id, inbox in enumerate(self._inboxes)
+            ]
+            self._collector = threading.Thread(target=self._collect, name='sms-lane-collector', daemon=True)
+        else:
+            self._inboxes = [queue.Queue() for _ in range(self.lanes)]
+            self._workers = [
+                threading.Thread(target=self._run_lane, args=(lane_id,), name=f'sms-lane-{lane_id}', daemon=True)
+                for lane_id in range(self.lanes)
+            ]
+
+        self._running = True
+        for worker in self._workers:
+            worker.start()
+        if self._collector:
+            self._collector.start()
+        atexit.register(self.stop)
+        logger.info(f"SMS processing engine started ({self.lanes} {self.mode} lanes)")
+
+    def stop(self):
+        """Let every lane finish what it has queued, then stop the workers"""
+        if not self._running:
+            return
+        atexit.unregister(self.stop)
+        self._running = False
+        for inbox in self._inboxes:
+            inbox.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout=30)
+        if self._collector:
+            self._outbox.put(_STOP)
+            self._collector.join(timeout=10)
+            self._collector = None
+        self._workers = []
+        self._inboxes = []
+
+    def submit(self, item, phone_key=None):
+        """Queue a validated message dict on its phone's lane; returns a Future"""
+        if not self._running:
+            raise RuntimeError('SMS processing engine is not running')
+
+        lane_id = self.lane_for(phone_key or SmsBatchService.phone_key(item))
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._stats[lane_id].submitted += 1
+            self._pending[request_id] = (future, time.perf_counter())
+
+        self._inboxes[lane_id].put((request_id, item))
+        return future
+
+    def process(self, item):
+        """Submit and wait; returns None if the lane did not answer within timeout_s"""
+        future = self.submit(item)
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeoutError:
+            return None
+
+    def process_batch(self, messages):
+        """Batch endpoint on the lanes: validate, submit in order, wait for every result"""
+        results = [None] * len(messages)
+        futures = []
+        for index, item in enumerate(messages):
+            error = SmsBatchService.validate_message(item)
+            if error:
+                results[index] = {
+                    'index': index,
+                    'success': False,
+                    'from_phone': item.get('from_phone') if isinstance(item, dict) else None,
+                    'error': error,
+                    'status': 'invalid_message',
+                    'status_code': 400
+                }
+                continue
+            message = SmsBatchService.message_fields(item)
+            futures.append((index, message, self.submit(message)))
+
+        deadline = time.monotonic() + self.timeout_s
+        for index, message, future in futures:
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                result = dict(message, success=True, status='queued', status_code=202)
+            results[index] = dict(result, index=index)
+        return results
+
+    def metrics(self):
+        with self._lock:
+            lanes = [dict(stats.to_dict(), lane=lane_id) for lane_id, stats in enumerate(self._stats)]
+        return {
+            'enabled': self._running,
+            'mode': self.mode,
+            'lane_count': self.lanes,
+            'total_depth': sum(lane['depth'] for lane in lanes),
+            'lanes': lanes
+        }
+
+    def _complete(self, lane_id, request_id, result, service_time):
+        with self._lock:
+            future, submitted_at = self._pending.pop(request_id, (None, None))
+            stats = self._stats[lane_id]
+            stats.completed += 1
+            if not result.get('success'):
+                stats.errors += 1
+            stats.service_times.append(service_time)
+            if submitted_at is not None:
+                stats.latencies.append(time.perf_counter() - submitted_at)
+        if future is not None:
+            future.set_result(result)
+
+    def _run_lane(self, lane_id):
+        from app.services.smsMessagesService import SmsService
+
+        inbox = self._inboxes[lane_id]
+        sms_service = SmsService()
+        while True:
+            job = inbox.get()
+            if job is _STOP:
+                break
+            request_id, item = job
+            try:
+                with self._app.app_context():
+                    result, service_time = _process_item(sms_service, item)
+            except Exception as e:
+                logger.error(f"SMS lane {lane_id} error: {str(e)}")
+                result, service_time = {'success': False, 'error': str(e), 'error_type': type(e).__name__,
+                                        'status': 'sms_service_exception', 'status_code': 500}, 0.0
+            self._complete(lane_id, request_id, result, service_time)
+
+    def _collect(self):
+        while True:
+            message = self._outbox.get()
+            if message is _STOP:
+                break
+            self._complete(*message)
+
+
+sms_engine = SmsProcessingEngine()
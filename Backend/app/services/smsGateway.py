@@ -0,0 +1,110 @@
+import logging
+from abc import ABC, abstractmethod
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class SmsGatewayError(Exception):
+    """Raised when a whole gateway call fails (network error, 5xx, bad payload)"""
+
+
+class SmsGateway(ABC):
+    """Interface for outbound SMS providers used by the dispatch queue.
+
+    ``send_batch`` receives a list of ``{'id', 'to', 'message'}`` dicts and
+    returns ``{id: error}`` with ``None`` for every message that was accepted.
+    Raising SmsGatewayError fails (and retries) the whole batch.
+    """
+
+    name = 'base'
+    max_batch_size = 100
+
+    @abstractmethod
+    def send_batch(self, messages):
+        ...
+
+
+class LogOnlyGateway(SmsGateway):
+    """Accepts every message without sending it; the default for local development"""
+
+    name = 'log'
+    max_batch_size = 1000
+
+    def send_batch(self, messages):
+        for message in messages:
+            logger.debug(f"SMS to {message['to']}: {message['message'][:50]}")
+        return {message['id']: None for message in messages}
+
+
+class HttpSmsGateway(SmsGateway):
+    """Posts batches as JSON to an HTTP gateway (or benchmarks/sms_gateway_simulator.py).
+
+    Request:  {"sender": "22141", "messages": [{"id", "to", "message"}, ...]}
+    Response: {"results": [{"id": 1, "status": "accepted" | "rejected", "error": "..."}]}
+    """
+
+    name = 'http'
+
+    def __init__(self, url, api_key=None, sender='22141', timeout=10, max_batch_size=100):
+        self.url = url
+        self.sender = sender
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+    def send_batch(self, messages):
+        try:
+            response = self.session.post(self.url, json={
+                'sender': self.sender,
+                'messages': messages
+            }, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SmsGatewayError(f'Gateway request failed: {str(e)}')
+
+        if response.status_code >= 500 or response.status_code == 429:
+            raise SmsGatewayError(f'Gateway returned {response.status_code}')
+
+        try:
+            payload = response.json()
+        except ValueError:
+            raise SmsGatewayError(f'Gateway returned invalid JSON ({response.status_code})')
+
+        if response.status_code >= 400:
+            error = payload.get('error') or f'Gateway returned {response.status_code}'
+            return {message['id']: error for message in messages}
+
+        results = {}
+        for item in payload.get('results', []):
+            if item.get('status') == 'accepted':
+                results[item.get('id')] = None
+            else:
+                results[item.get('id')] = item.get('error') or 'Rejected by gateway'
+
+        # Anything the gateway did not report on is retried
+        for message in messages:
+            results.setdefault(message['id'], 'No result from gateway')
+        return results
+
+
+def create_gateway(config):
+    """Build the gateway named by SMS_GATEWAY ('log' or 'http')"""
+    gateway_name = config.get('SMS_GATEWAY', 'log')
+
+    if gateway_name == 'http':
+        url = config.get('SMS_GATEWAY_URL')
+        if not url:
+            raise ValueError('SMS_GATEWAY_URL is required when SMS_GATEWAY=http')
+        return HttpSmsGateway(
+            url,
+            api_key=config.get('SMS_GATEWAY_API_KEY'),
+            timeout=float(config.get('SMS_GATEWAY_TIMEOUT', 10)),
+            max_batch_size=int(config.get('SMS_DISPATCH_BATCH_SIZE', 100))
+        )
+    if gateway_name == 'log':
+        return LogOnlyGateway()
+
+    raise ValueError(f'Unknown SMS_GATEWAY: {gateway_name}')
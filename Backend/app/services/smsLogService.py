@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+from app.utils.bulk_writes import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+
+class SmsLogWriter:
+    """Write-behind buffer for SMS audit rows.
+
+    In ``write_behind`` mode log rows are queued in memory and a background
+    thread flushes them as one multi-row INSERT every ``batch_size`` rows or
+    every ``flush_interval_ms``, whichever comes first. When the buffer is
+    full (or the writer is not running) callers fall back to a synchronous
+    insert, so no row is ever dropped on the request path.
+    """
+
+    def __init__(self, batch_size=200, flush_interval_ms=250, max_buffer=5000):
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_buffer = max_buffer
+        self._app = None
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the writer from app config and start it if enabled"""
+        self._app = app
+        self.batch_size = int(app.config.get('SMS_LOG_BATCH_SIZE', self.batch_size))
+        self.flush_interval_ms = int(app.config.get('SMS_LOG_FLUSH_INTERVAL_MS', self.flush_interval_ms))
+        self.max_buffer = int(app.config.get('SMS_LOG_MAX_BUFFER', self.max_buffer))
+
+        if app.config.get('SMS_LOG_MODE', 'sync') == 'write_behind':
+            self.start()
+
+    @property
+    def enabled(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.enabled:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='sms-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"SMS log writer started (batch={self.batch_size}, interval={self.flush_interval_ms}ms)")
+
+    def stop(self):
+        """Stop the flush thread and write out everything still buffered"""
+        if self._thread is None:
+            return
+        atexit.unregister(self.stop)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def enqueue(self, from_phone, to_phone, message_body, direction, message_type=None,
+                related_user_id=None, status='processed'):
+        """Queue a log row. Returns False when the caller must write it synchronously."""
+        if not self.enabled:
+            return False
+
+        row = {
+            'from_phone': from_phone,
+            'to_phone': to_phone,
+            'message_body': message_body,
+            'direction': direction,
+            'message_type': message_type,
+            'related_user_id': related_user_id,
+            'status': status,
+            'created_at': datetime.utcnow()
+        }
+
+        with self._condition:
+            if len(self._buffer) >= self.max_buffer:
+                return False
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def pending_count(self):
+        return len(self._buffer)
+
+    def flush(self):
+        """Write all buffered rows, one multi-row INSERT per batch"""
+        with self._flush_lock:
+            written = 0
+            while True:
+                with self._condition:
+                    if not self._buffer:
+                        break
+                    count = min(self.batch_size, len(self._buffer))
+                    rows = [self._buffer.popleft() for _ in range(count)]
+                written += self._write_rows(rows)
+            return written
+
+    def _write_rows(self, rows):
+        if self._app is None:
+            logger.error(f"SMS log writer has no app, dropping {len(rows)} rows")
+            return 0
+
+        with self._app.app_context():
+            try:
+                bulk_insert(SmsMessage, rows)
+                db.session.commit()
+                return len(rows)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Batched SMS log insert failed, retrying row by row: {str(e)}")
+
+            written = 0
+            for row in rows:
+                try:
+                    db.session.execute(SmsMessage.__table__.insert().values(row))
+                    db.session.commit()
+                    written += 1
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Dropping SMS log row to {row.get('to_phone')}: {str(e)}")
+            return written
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000.0
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._condition.wait(timeout=interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"SMS log writer flush error: {str(e)}")
+            if stopping:
+                break
+
+
+sms_log_writer = SmsLogWriter()
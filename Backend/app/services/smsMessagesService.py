@@ -8,20 +8,42 @@ from app.services.userService import UserService
 from app.models.matchModel import Match
 from app.models.matchRequestModel import MatchRequest
 from app.models.userInterestModel import UserInterest
+from app.services.smsLogService import sms_log_writer
+from app.services.smsDispatchService import sms_dispatcher
+from app.services.interestExpiryService import interest_expiry_scheduler
+from app.services.userCounterService import registered_user_counter
+from app.services.candidateIndexService import candidate_index, opposite_gender
+from app.services.deckBuilderService import deck_builder
+from app.services.demographicsService import MAX_AGE, MIN_AGE, demographic_histogram
+from app.services.seenSetService import seen_sets
+from app.services.matchRankingService import match_ranker
+from app.services.smsContext import SmsContext
+from app.services.smsCommands import sms_commands
+from app.utils.bulk_writes import bulk_insert, bulk_update
 from app.extensions import db
 from sqlalchemy import and_, or_, func, desc
+from collections import namedtuple
+
+# A match row written by materialize_matches, with its profile already loaded
+SentMatch = namedtuple('SentMatch', ['id', 'position', 'matched_user', 'is_sent'])
 
 
 class SmsService:
-    def log_sms(self, from_phone, to_phone, message_body, direction, message_type=None, related_user_id=None):
-        """Log SMS message to database"""
+    def log_sms(self, from_phone, to_phone, message_body, direction, message_type=None, related_user_id=None,
+                status='processed'):
+        """Log SMS message to database (buffered when write-behind logging is on)"""
+        if sms_log_writer.enqueue(from_phone, to_phone, message_body, direction,
+                                  message_type, related_user_id, status):
+            return None
+
         sms = SmsMessage(
             from_phone=from_phone,
             to_phone=to_phone,
             message_body=message_body,
             direction=direction,
             message_type=message_type,
-            related_user_id=related_user_id
+            related_user_id=related_user_id,
+            status=status
         )
         db.session.add(sms)
         db.session.commit()
@@ -37,8 +59,11 @@ class SmsService:
         norm_from_phone = "22141"
         print(f"DEBUG: send_response called - original to: {to_phone}, normalized to: {norm_to_phone}")
         print(f"DEBUG: send_response - from: {norm_from_phone}, message: {message_body[:50]}...")
+        # Queued as 'pending' for the dispatcher when SMS_DISPATCH_MODE=queue
         self.log_sms(norm_from_phone, norm_to_phone, message_body,
-                     "outgoing", message_type, related_user_id)
+                     "outgoing", message_type, related_user_id, sms_dispatcher.outgoing_status)
+        if sms_dispatcher.enabled:
+            sms_dispatcher.notify()
         print(f"DEBUG: send_response - message logged to database with normalized phones")
         return {
             'success': True,
@@ -46,83 +71,58 @@ class SmsService:
         }
 
     def get_total_registered_users(self):
-        """Get total number of registered users from database"""
-        return db.session.query(User).filter(
-            User.registration_stage == RegistrationStage.COMPLETED # type: ignore
-        ).count()
+        """Get total number of registered users (maintained counter, periodically re-counted)"""
+        return registered_user_counter.get()
 
-    def process_incoming_sms(self, from_phone, message_body):
+    def resolve_sender(self, phone_number, context=None):
+        """Return the sender's User, reusing the per-message context lookup when available"""
+        if context is not None:
+            return context.user
+        user, _ = UserService.get_user_by_phone(phone_number)
+        return user
+
+    def process_incoming_sms(self, from_phone, message_body, context=None):
         """Process incoming SMS and route to appropriate handler"""
+        context = context or SmsContext(from_phone, message_body)
         
-        # DEBUGGING - to Print what we received
-        print(f"DEBUG: Received SMS from {from_phone}")
-        print(f"DEBUG: Raw message_body: '{message_body}'")
-        print(f"DEBUG: Type of message_body: {type(message_body)}")
-        
-        original_message = message_body.strip()
-        message_body_upper = message_body.strip().upper()
+        print(f"DEBUG: Received SMS from {from_phone}: '{message_body}'")
         
-        print(f"DEBUG: After processing - message_body_upper: '{message_body_upper}'")
-        print(f"DEBUG: Checking if '{message_body_upper}' == 'PENZI'")
-        print(f"DEBUG: Comparison result: {message_body_upper == 'PENZI'}")
+        # ALWAYS LOG THE INCOMING MESSAGE FIRST (unless the dedup claim already did)
+        if not context.incoming_logged:
+            self.log_sms(from_phone, "22141", message_body.strip(), "incoming")
         
-        # ALWAYS LOG THE INCOMING MESSAGE FIRST
-        print("DEBUG: Logging incoming message")
-        self.log_sms(from_phone, "22141", original_message, "incoming")
+        # Tokenize once; the registry picks the command by its first word
+        parsed = sms_commands.parse(message_body)
+        spec = parsed.spec
         
-        # CHECK FOR PENZI FIRST - before trying to get user
-        if message_body_upper == "PENZI":
-            print("DEBUG: PENZI detected, calling handle_activation")
-            return self.handle_activation(from_phone)
-        
-        print("DEBUG: PENZI not detected, trying to get user")
-        
-        # Now try to get user for other commands
-        try:
-            user, _ = UserService.get_user_by_phone(from_phone)
-            if not user:
-                print("DEBUG: User lookup returned None")
+        # PENZI (activation) runs before we require an existing user
+        if spec is None or spec.requires_user:
+            try:
+                user = context.user
+                if not user:
+                    print("DEBUG: User lookup returned None")
+                    response = "User not found. Please send PENZI to 22141 to activate service first."
+                    return self.send_response(from_phone, response, "user_not_found")
+            except Exception as e:
+                print(f"DEBUG: Exception in user lookup: {str(e)}")
                 response = "User not found. Please send PENZI to 22141 to activate service first."
                 return self.send_response(from_phone, response, "user_not_found")
-        except Exception as e:
-            print(f"DEBUG: Exception in user lookup: {str(e)}")
-            response = "User not found. Please send PENZI to 22141 to activate service first."
-            return self.send_response(from_phone, response, "user_not_found")
-    
-        print(f"DEBUG: User found: {user}")
         
-        # Incoming message already logged above
-    
-        # Route based on command for existing users
-        if message_body_upper.startswith("START#"):
-            return self.handle_initial_registration(from_phone, message_body_upper)
-        elif message_body_upper.startswith("DETAILS#"):
-            return self.handle_details_registration(from_phone, message_body_upper)
-        elif message_body_upper.startswith("MYSELF"):
-            return self.handle_self_description(from_phone, original_message)
-        elif message_body_upper.startswith("IMAGES"):
-            return self.handle_image_upload_guide(from_phone)
-        elif message_body_upper.startswith("MATCH#"):
-            return self.handle_match_request(from_phone, message_body_upper)
-        elif message_body_upper == "NEXT":
-            return self.handle_next_matches(from_phone)
-        elif message_body_upper.startswith("DESCRIBE"):
-            return self.handle_describe_request(from_phone, message_body_upper)
-        elif message_body_upper in ["YES", "NO"]:
-            return self.handle_interest_response(from_phone, message_body_upper)
-        elif message_body_upper == "STOP":
-            return self.handle_stop_service(from_phone)
-        elif message_body_upper == "STATS":
-            return self.handle_user_stats(from_phone)
-        elif message_body_upper == "HISTORY":
-            return self.handle_user_history(from_phone)
-        else:
-            return self.handle_unknown_command(from_phone)
+        if spec is None:
+            return self.handle_unknown_command(from_phone, context)
+        
+        if parsed.error is not None:
+            return self.send_response(from_phone, parsed.error.message, parsed.error.message_type)
+        
+        handler = getattr(self, spec.handler)
+        if spec.parser is None:
+            return handler(from_phone, context)
+        return handler(from_phone, parsed.command, context)
     
-    def handle_activation(self, phone_number):
+    def handle_activation(self, phone_number, context=None):
         """Handle PENZI activation command"""
         try:
-            user, message = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
         except Exception as e:
             user = None
     
@@ -158,41 +158,20 @@ class SmsService:
                             registration_stage=RegistrationStage.ACTIVATED)
                 db.session.add(user)
                 db.session.commit()
+                if context is not None:
+                    context.set_user(user)
     
             total_users = self.get_total_registered_users()
             response = f"Welcome to our dating service with {total_users} potential dating partners! To register, SMS: start#name#age#gender#county#town to 22141 Example: start#Michael Morara#22#Male#Nairobi#Imara"
             return self.send_response(phone_number, response, "activation_success", user.id)
     
-    def handle_initial_registration(self, phone_number, message):
-        """Handle start#name#age#gender#county#town command"""
+    def handle_initial_registration(self, phone_number, command, context=None):
+        """Handle start#name#age#gender#county#town command (fields validated by parse_start)"""
         try:
-            parts = message.split("#")
-            if len(parts) != 6:
-                return self.send_response(phone_number,
-                                          "Invalid format. Use: start#name#age#gender#county#town", "registration_error")
-
-            _, name, age, gender, county, town = parts
-
-            # Validate inputs
-            if not all([name, age, gender, county, town]):
-                return self.send_response(phone_number,
-                                          "All fields are required. Please try again.", "registration_error")
-
-            try:
-                age = int(age)
-                if age < 18:
-                    return self.send_response(phone_number,
-                                              "You must be at least 18 years old.", "registration_error")
-            except ValueError:
-                return self.send_response(phone_number,
-                                          "Invalid age format.", "registration_error")
-
-            if gender.upper() not in ['MALE', 'FEMALE']:
-                return self.send_response(phone_number,
-                                          "Gender must be Male or Female.", "registration_error")
+            name, age, gender, county, town = command
 
             # Get user (must exist and be activated)
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user or not user.is_activated:
                 return self.send_response(phone_number,
                                           "Please send PENZI to 22141 first to activate the service.", "registration_error")
@@ -209,10 +188,10 @@ class SmsService:
             return self.send_response(phone_number,
                                       "Registration failed. Please try again.", "registration_error")
     
-    def handle_details_registration(self, phone_number, message):
+    def handle_details_registration(self, phone_number, command, context=None):
         """Handle details#education#profession#marital#religion#ethnicity command"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user:
                 return self.send_response(phone_number,
                                           "User not found. Please start registration first.", "registration_error")
@@ -225,31 +204,9 @@ class SmsService:
                                           f"Invalid registration stage. {next_step}", 
                                           "registration_error")
     
-            parts = message.split("#")
-            if len(parts) != 6:
-                return self.send_response(phone_number,
-                                          "Invalid format. Use: details#education#profession#marital#religion#ethnicity",
-                                          "registration_error")
-    
-            _, education, profession, marital, religion, ethnicity = parts
-    
-            # Validate all fields are present and not empty
-            fields = [education.strip(), profession.strip(), marital.strip(), 
-                     religion.strip(), ethnicity.strip()]
-            
-            if not all(fields) or any(len(field) < 2 for field in fields):
-                return self.send_response(phone_number,
-                                          "All fields are required and must be at least 2 characters long.", 
-                                          "registration_error")
-    
+            # Fields are already stripped and length-checked by parse_details
             try:
-                user.add_details(
-                    education.strip().title(),
-                    profession.strip().title(),
-                    marital.strip().title(),
-                    religion.strip().title(),
-                    ethnicity.strip().title()
-                )
+                user.add_details(*[field.title() for field in command])
                 
                
                 next_step = user.get_next_registration_step()
@@ -267,25 +224,16 @@ class SmsService:
             return self.send_response(phone_number,
                                       "Details registration failed. Please try again.", "registration_error")   
     
-    def handle_self_description(self, phone_number, message):
+    def handle_self_description(self, phone_number, command, context=None):
         """Handle MYSELF description command"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user or user.registration_stage != RegistrationStage.DETAILS_PENDING:
                 return self.send_response(phone_number,
                                           "Complete previous registration steps first.", "registration_error")
 
-            if not message.upper().startswith("MYSELF"):
-                return self.send_response(phone_number,
-                                          "Description must start with MYSELF", "registration_error")
-
-            description = message[6:].strip()  
-            if len(description) < 3:
-                return self.send_response(phone_number,
-                                          "Please provide a description.", "registration_error")
-
             # Complete registration
-            user.add_description(description)
+            user.add_description(command.description)
 
             response = f"Registration completed successfully {user.name}! To search for a MPENZI, SMS: match#age#town to 22141 Example: match#26-30#Nairobi"
 
@@ -298,10 +246,10 @@ class SmsService:
             return self.send_response(phone_number,
                                       "Registration completion failed. Please try again.", "registration_error")
 
-    def handle_image_upload_guide(self, phone_number):
+    def handle_image_upload_guide(self, phone_number, context=None):
         """Handle IMAGES command to provide photo upload instructions"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user:
                 return self.send_response(phone_number, "Register first using PENZI.", "image_error")
 
@@ -340,32 +288,19 @@ class SmsService:
         except Exception as e:
             return self.send_response(phone_number, "Failed to get photo upload guide. Please try again.", "image_error")
 
-    def handle_match_request(self, phone_number, message):  
+    def handle_match_request(self, phone_number, command, context=None):  
         """Handle match request with proper database queries"""
         try:
             print(
-                f"Starting match request for phone: {phone_number}, message: {message}")
+                f"Starting match request for phone: {phone_number}, command: {command}")
 
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             print(f"User retrieved: {user.id if user else 'None'}")
 
             if not user or user.registration_stage != RegistrationStage.COMPLETED:
                 return self.send_response(phone_number, "Complete registration first.", "match_error")
 
-            parts = message.split("#")
-            if len(parts) != 3:
-                return self.send_response(phone_number, "Invalid format. Use: match#age#town", "match_error")
-
-            _, age_range, town = parts
-            print(f"Parsed: age_range={age_range}, town={town}")
-
-            # Parse age range
-            if "-" in age_range:
-                age_min, age_max = map(int, age_range.split("-"))
-            else:
-                age_min = age_max = int(age_range)
-
-            print(f"Age range: {age_min}-{age_max}")
+            age_min, age_max, town, age_range = command
 
             # Find potential matches
             print("Finding potential matches...")
@@ -378,42 +313,43 @@ class SmsService:
                 raise match_error
 
             if not matches:
-                # Suggest broader search criteria
-                response = f"No matches found for age {age_range} in {town}. Try a broader age range like 20-35 or search in nearby areas."
+                # Suggest the nearest age range with people the user has not been sent yet
+                sent = self.sent_candidate_ages(user, town)
+                nearest = demographic_histogram.suggest_range(opposite_gender(user.gender), age_min, age_max, town,
+                                                              exclude=sent)
+                if demographic_histogram.count_for(user, age_min, age_max, town):
+                    # Candidates exist, but the user has been sent all of them before
+                    response = f"You have already been sent every match for age {age_range} in {town}. "
+                    if nearest:
+                        response += f"Try match#{nearest[0]}-{nearest[1]}#{town.title()} ({nearest[2]} new)."
+                    else:
+                        response += "Try a different age range or town."
+                elif nearest:
+                    response = (f"No matches found for age {age_range} in {town}. "
+                                f"Try match#{nearest[0]}-{nearest[1]}#{town.title()} ({nearest[2]} found).")
+                else:
+                    response = f"No matches found for age {age_range} in {town}. Try a broader age range like 20-35 or search in nearby areas."
                 return self.send_response(phone_number, response, "match_error")
             elif len(matches) < 3:
                 # If very few matches, suggest broader criteria in the response
                 print(f"DEBUG: Only {len(matches)} matches found, will suggest broader search in response")
 
-            # Create match request
+            # Create match request with a snapshot of the ordered candidates
             match_request = MatchRequest(
                 user_id=user.id,
                 age_min=age_min,
                 age_max=age_max,
                 preferred_town=town.title(),
             )
+            match_request.set_candidates(matches)
             db.session.add(match_request)
             db.session.flush()
 
             print("match_request created")
 
-            # Create match records
-            match_records = []
-            for i, match_user in enumerate(matches, 1):
-                match = Match(
-                    request_id=match_request.id,
-                    requester_id=user.id,
-                    matched_user_id=match_user.id,
-                    position=i
-                )
-
-                match_records.append(match)
-                db.session.add(match)
-
-            db.session.commit()
-            print(match_records)
-            # Send first batch of matches (show up to 5 initially)
-            return self.send_match_batch(user, match_request, match_records[:5], is_first=True)
+            # Match rows are only created for the profiles actually sent (show up to 5 initially)
+            match_records = self.materialize_matches(user, match_request, match_request.take_next(5))
+            return self.send_match_batch(user, match_request, match_records, is_first=True)
 
         except Exception as e:
             # Log the actual error for debugging
@@ -427,35 +363,90 @@ class SmsService:
 
             return self.send_response(phone_number, "Match request failed. Please try again.", "match_error")
 
-    def find_potential_matches(self, user, age_min, age_max, town):
-        """Find potential matches from database"""
-        from app.models.userModel import Gender
+    def handle_count_request(self, phone_number, command, context=None):
+        """Handle count#age#town: how many matches a match request would find, without making it"""
+        try:
+            user = self.resolve_sender(phone_number, context)
+            if not user or user.registration_stage != RegistrationStage.COMPLETED:
+                return self.send_response(phone_number, "Complete registration first.", "count_error")
 
-        # Determine opposite gender
-        opposite_gender = Gender.FEMALE if user.gender == Gender.MALE else Gender.MALE
-        
+            age_min, age_max, town, age_range = command
+            gender = opposite_gender(user.gender)
+            gender_term = "ladies" if user.gender.value == "Male" else "gentlemen"
+            # Only people a match request would still send count; the ones already sent are mentioned
+            sent = self.sent_candidate_ages(user, town)
+            total = demographic_histogram.count(gender, age_min, age_max, town)
+            count = demographic_histogram.count(gender, age_min, age_max, town, exclude=sent)
+            already_sent = f" ({total - count} already sent to you)" if total > count else ""
+
+            if count:
+                response = (f"{count} {gender_term} aged {age_range} in {town.title()}{already_sent}. "
+                            f"Send match#{age_range}#{town.title()} to see them.")
+            else:
+                nearest = demographic_histogram.suggest_range(gender, age_min, age_max, town, exclude=sent)
+                if total:
+                    response = f"You have already been sent all {total} {gender_term} aged {age_range} in {town.title()}. "
+                elif nearest:
+                    response = f"No {gender_term} aged {age_range} in {town.title()}. "
+                else:
+                    response = f"No {gender_term} found in {town.title()} yet. Try a nearby town."
+                if nearest:
+                    response += (f"Nearest: {nearest[2]} aged {nearest[0]}-{nearest[1]}. "
+                                 f"Send match#{nearest[0]}-{nearest[1]}#{town.title()} to see them.")
+                elif total:
+                    response += "Try a different age range or town."
+            return self.send_response(phone_number, response, "count_response", user.id)
+
+        except Exception as e:
+            print(f"Error in handle_count_request: {str(e)}")
+            return self.send_response(phone_number, "Count request failed. Please try again.", "count_error")
+
+    def sent_candidate_ages(self, user, town):
+        """{age: count} of the candidates in ``town`` the user has already been sent"""
+        if not seen_sets.count(user.id):
+            return {}
+        candidates = candidate_index.search_for(user, MIN_AGE, MAX_AGE, town)
+        unseen = set(seen_sets.unseen(user.id, candidates))
+        sent = [candidate_id for candidate_id in candidates if candidate_id not in unseen]
+        if not sent:
+            return {}
+        return dict(db.session.query(User.age, func.count(User.id)).filter(User.id.in_(sent)).group_by(User.age).all())
+
+    def find_potential_matches(self, user, age_min, age_max, town):
+        """Find IDs of potential matches from the candidate index, most compatible first"""
         print(f"DEBUG: Searching for matches with criteria:")
-        print(f"  - Gender: {opposite_gender}")
+        print(f"  - Gender: {opposite_gender(user.gender)}")
         print(f"  - Age range: {age_min}-{age_max}")
         print(f"  - Town: {town}")
         print(f"  - Excluding user ID: {user.id}")
 
-        # Query for matches
-        matches = db.session.query(User).filter(
-            User.gender == opposite_gender, # type: ignore
-            User.age >= age_min,
-            User.age <= age_max,
-            User.town.ilike(f"%{town}%"),
-            User.is_active.is_(True),
-            User.registration_stage == RegistrationStage.COMPLETED, # type: ignore
-            User.id != user.id
-        ).order_by(User.created_at.desc()).all()
-        
-        print(f"DEBUG: Found {len(matches)} total matches")
-        for i, match in enumerate(matches[:10]):  # Show first 10 for debugging
-            print(f"  {i+1}. {match.name} - Age: {match.age}, Town: {match.town}, Gender: {match.gender}")
-
-        return matches
+        # A fresh, complete precomputed deck already holds the ranked candidates
+        match_ids = deck_builder.snapshot(user, age_min, age_max, town)
+        if match_ids is None:
+            match_ids = match_ranker.rank(user, candidate_index.search_for(user, age_min, age_max, town))
+        # A repeated search starts with people the user has not been sent yet
+        match_ids = seen_sets.unseen(user.id, match_ids)
+
+        print(f"DEBUG: Found {len(match_ids)} total matches")
+        return match_ids
+
+    def materialize_matches(self, user, match_request, batch):
+        """Insert (uncommitted) Match rows for a batch of (position, user_id) taken from a request's snapshot"""
+        # Load the batch's profiles together instead of one lazy load per match in send_match_batch
+        profiles = {profile.id: profile for profile in candidate_index.load_users([user_id for _, user_id in batch])}
+        now = datetime.utcnow()
+        inserted = bulk_insert(Match, [{
+            'request_id': match_request.id,
+            'requester_id': user.id,
+            'matched_user_id': match_user_id,
+            'position': position,
+            'is_sent': True,
+            'created_at': now
+        } for position, match_user_id in batch], returning=('id', 'position', 'matched_user_id'))
+        return [
+            SentMatch(match_id, position, profiles.get(match_user_id), True)
+            for match_id, position, match_user_id in sorted(inserted, key=lambda row: row[1])
+        ]
 
     def send_match_batch(self, user, match_request, matches, is_first=False):
         """Send batch of matches with proper formatting"""
@@ -463,8 +454,7 @@ class SmsService:
             return self.send_response(user.phone_number, "No more matches available.", "match_complete")
     
         if is_first:
-            total_matches = db.session.query(Match).filter_by(
-                request_id=match_request.id).count()
+            total_matches = match_request.total_matches_found
             gender_term = "ladies" if user.gender.value == "Male" else "gentlemen"
             showing_count = len(matches)
             response_lines = [
@@ -481,7 +471,10 @@ class SmsService:
             # Format each match as a compact block
             match_text = f"{match.position}. {match_user.name}, {match_user.age}yrs, {match_user.town}, {match_user.profession}, {match_user.phone_number}"
             response_lines.append(match_text)
-            match.is_sent = True
+
+        # Legacy Match rows are flagged in one UPDATE; rows from materialize_matches are inserted as sent
+        bulk_update(Match, [match.id for match in matches if not match.is_sent], {'is_sent': True})
+        seen_sets.add(user.id, [match.matched_user.id for match in matches])
     
         # Add suggestions based on number of matches
         if is_first and len(matches) < 3:
@@ -500,10 +493,10 @@ class SmsService:
         response = "\n".join(response_lines)
         return self.send_response(user.phone_number, response, "match_results", user.id)
 
-    def handle_next_matches(self, phone_number):
+    def handle_next_matches(self, phone_number, context=None):
         """Handle NEXT command to get more matches"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user or user.registration_stage != RegistrationStage.COMPLETED:
                 return self.send_response(phone_number, "Complete registration first.", "match_error")
 
@@ -511,17 +504,21 @@ class SmsService:
             latest_request = MatchRequest.query.filter_by(
                 user_id=user.id,
                 status='active'
-            ).order_by(MatchRequest.created_at.desc()).first()
+            ).options(db.undefer(MatchRequest.candidate_ids)).order_by(MatchRequest.created_at.desc()).first()
 
             if not latest_request:
                 return self.send_response(phone_number,
                                           "No active match request found. Use match#age#town first.", "match_error")
 
-            # Get next batch of unsent matches
-            next_matches = Match.query.filter(
-                Match.request_id == latest_request.id, # type: ignore
-                Match.is_sent.is_(False) # type: ignore
-            ).order_by(Match.position).limit(5).all() # type: ignore
+            if latest_request.has_snapshot():
+                # Next batch from the snapshot cursor
+                next_matches = self.materialize_matches(user, latest_request, latest_request.take_next(5))
+            else:
+                # Requests from before snapshots: next batch of unsent matches
+                next_matches = Match.query.filter(
+                    Match.request_id == latest_request.id, # type: ignore
+                    Match.is_sent.is_(False) # type: ignore
+                ).order_by(Match.position).limit(5).all() # type: ignore
 
             if not next_matches:
                 return self.send_response(phone_number,
@@ -533,26 +530,14 @@ class SmsService:
             return self.send_response(phone_number,
                                           "Failed to get next matches. Please try again.", "match_error")
            
-    def handle_describe_request(self, phone_number, message):
+    def handle_describe_request(self, phone_number, command, context=None):
         """Handle DESCRIBE phone_number command"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user:
                 return self.send_response(phone_number, "Register first using PENZI.", "interest_error")
     
-            parts = message.split()
-            if len(parts) != 2:
-                return self.send_response(phone_number, "Invalid format. Use: DESCRIBE 0701234567", "interest_error")
-            
-            target_phone = parts[1].strip()
-            
-            # Phone number normalization (existing logic)
-            if target_phone.startswith('+'):
-                target_phone = target_phone[1:]
-            if target_phone.startswith('254') and len(target_phone) > 10:
-                target_phone = '0' + target_phone[3:]
-            
-            target_user, _ = UserService.get_user_by_phone(target_phone)
+            target_user, _ = UserService.get_user_by_phone(command.target_phone)
             
             if not target_user:
                 return self.send_response(phone_number, "User not found or not registered.", "interest_error")
@@ -607,25 +592,18 @@ class SmsService:
             # Compatibility score
             profile_parts.append(f"Compatibility: {compatibility}%")
     
-            # Check for existing interest
-            from datetime import datetime, timedelta
-            twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-            
+            # Check for an answered or unexpired pending interest
+            now = datetime.utcnow()
             existing_interest = UserInterest.query.filter(
                 UserInterest.interested_user_id == user.id, # type: ignore
                 UserInterest.target_user_id == target_user.id, # type: ignore
-                UserInterest.created_at >= twenty_four_hours_ago,
-                UserInterest.response_received.is_(False) # type: ignore
+                UserInterest.superseded_at.is_(None),
+                or_(UserInterest.response_received.is_(True), UserInterest.expires_at > now) # type: ignore
             ).first()
             
             if not existing_interest:
-                # Create new interest and send notification
-                interest = UserInterest(
-                    interested_user_id=user.id,
-                    target_user_id=target_user.id,
-                    interest_type='describe'
-                )
-                db.session.add(interest)
+                # Create new interest (or renew an expired one) and send notification
+                interest = UserInterest.renew(user.id, target_user.id, 'describe')
                 db.session.flush()
                 # Notification message (do NOT reveal requester's phone number)
                 notification_parts = []
@@ -658,9 +636,12 @@ class SmsService:
                 db.session.commit()
                 # Add success message
                 profile_parts.append(f"SUCCESS! {target_user.name} has been notified about your interest. You'll get notified when they respond (YES/NO). Try 'NEXT' for more matches!")
+            elif existing_interest.response_received:
+                # The target already answered; the response stands and they are not asked again
+                profile_parts.append(f"ANSWERED: {target_user.name} already replied {existing_interest.response} to your interest.")
             else:
                 # Pending response message
-                time_remaining = 24 - int((datetime.utcnow() - existing_interest.created_at).total_seconds() / 3600)
+                time_remaining = existing_interest.hours_remaining(now)
                 profile_parts.append(f"PENDING: Interest already sent to {target_user.name}. Waiting for response ({time_remaining}h remaining). Be patient!")
     
             profile_response = " ".join(profile_parts)
@@ -671,27 +652,22 @@ class SmsService:
             db.session.rollback()
             return self.send_response(phone_number, "Failed to fetch profile. Please try again.", "interest_error")
     
-    def handle_interest_response(self, phone_number, message):
+    def handle_interest_response(self, phone_number, command, context=None):
         """Handle YES/NO responses - SMS-FRIENDLY FORMATTING"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if not user:
                 return self.send_response(phone_number, "Register first using PENZI.", "interest_error")
     
-            response = message.strip().upper()
-            
-            if response not in ['YES', 'NO']:
-                return self.send_response(phone_number, "Invalid response. Reply with 'YES' or 'NO' only.", "interest_error")
+            response = command.response
     
             # Find pending interest 
-            from datetime import datetime, timedelta
-            twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-            
             pending_interest = UserInterest.query.filter(
                 UserInterest.target_user_id == user.id, # type: ignore
                 UserInterest.notification_sent.is_(True), # type: ignore
                 UserInterest.response_received.is_(False), # type: ignore
-                UserInterest.created_at >= twenty_four_hours_ago
+                UserInterest.superseded_at.is_(None),
+                UserInterest.expires_at > datetime.utcnow()
             ).order_by(UserInterest.created_at.desc()).first()
             
             if not pending_interest:
@@ -760,48 +736,19 @@ class SmsService:
             return self.send_response(phone_number, "Failed to process your response. Please try again.", "interest_error")   
     
     def handle_expired_interests(self):
-        """Handle expired interest notifications (24 hours) - Optional background task"""
+        """Notify senders of interests past their expires_at (see InterestExpiryScheduler)"""
         try:
-            from datetime import datetime, timedelta
-            
-            # Find interests that are 24+ hours old with no response
-            twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-            
-            expired_interests = UserInterest.query.filter(
-                UserInterest.notification_sent.is_(True), # type: ignore
-                UserInterest.response_received.is_(False), # type: ignore
-                UserInterest.created_at <= twenty_four_hours_ago,
-                UserInterest.expired_notification_sent.is_(False)
-            ).all()
-            
-            for interest in expired_interests:
-                # Notify the interested user that the interest expired
-                interested_user = User.query.get(interest.interested_user_id)
-                target_user = User.query.get(interest.target_user_id)
-                
-                if interested_user and target_user:
-                    expiry_message = f" INTEREST EXPIRED\n"
-                    expiry_message += f"Your interest in {target_user.name} has expired (no response after 24 hours).\n\n"
-                    expiry_message += f" DON'T GIVE UP!\n"
-                    expiry_message += f" Try 'NEXT' for more matches\n"
-                    expiry_message += f" Search new areas with 'match#age#town'\n"
-                    expiry_message += f" Your perfect match is still out there! "
-                    
-                    self.send_response(interested_user.phone_number, expiry_message, "interest_expired", interested_user.id)
-                    
-                    # Mark as expired
-                    interest.expired_notification_sent = True
-            
-            db.session.commit()
-            print(f"Processed {len(expired_interests)} expired interests")
-            
+            expired = interest_expiry_scheduler.run_once()
+            print(f"Processed {expired} expired interests")
+            return expired
         except Exception as e:
             print(f"Error processing expired interests: {str(e)}")
-            db.session.rollback() 
-             
-    def handle_user_stats(self, phone_number):
+            db.session.rollback()
+            return 0
+
+    def handle_user_stats(self, phone_number, context=None):
         """Handle STATS command"""
-        user, _ = UserService.get_user_by_phone(phone_number)
+        user = self.resolve_sender(phone_number, context)
         if not user:
             return self.send_response(phone_number, "Register first using PENZI.", "stats_error")
 
@@ -818,9 +765,9 @@ class SmsService:
 
         return self.send_response(phone_number, response, "user_stats", user.id)
 
-    def handle_user_history(self, phone_number):
+    def handle_user_history(self, phone_number, context=None):
         """Handle HISTORY command - FIXED FORMATTING"""
-        user, _ = UserService.get_user_by_phone(phone_number)
+        user = self.resolve_sender(phone_number, context)
         if not user:
             return self.send_response(phone_number, "Register first using PENZI.", "history_error")
     
@@ -845,10 +792,10 @@ class SmsService:
         response = " ".join(history_lines)
         return self.send_response(phone_number, response, "user_history", user.id)
 
-    def handle_stop_service(self, phone_number):
+    def handle_stop_service(self, phone_number, context=None):
         """Handle STOP command"""
         try:
-            user, _ = UserService.get_user_by_phone(phone_number)
+            user = self.resolve_sender(phone_number, context)
             if user:
                 user.is_active = False
                 db.session.commit()  # Ensure changes are saved before sending response
@@ -862,9 +809,9 @@ class SmsService:
             return self.send_response(phone_number,
                                       "Failed to stop service. Please try again.", "stop_error")
 
-    def handle_unknown_command(self, phone_number):
+    def handle_unknown_command(self, phone_number, context=None):
         """Handle unknown commands"""
-        user, _ = UserService.get_user_by_phone(phone_number)
+        user = self.resolve_sender(phone_number, context)
 
         if not user:
             response = "Welcome to our Penzi dating service, to activate service SMS PENZI to 22141"
@@ -875,7 +822,7 @@ class SmsService:
         elif user.registration_stage == RegistrationStage.DETAILS_PENDING:
             response = "SMS your description starting with MYSELF to 22141"
         else:
-            response = "Available commands:Penzi, match#age#town, NEXT, DESCRIBE phone number, STATS, HISTORY, STOP"
+            response = "Available commands:Penzi, match#age#town, count#age#town, NEXT, DESCRIBE phone number, STATS, HISTORY, STOP"
 
         return self.send_response(phone_number, response, "help")
 
@@ -938,10 +885,10 @@ class SmsService:
             MatchRequest.user_id == user_id # type: ignore
         ).count()
 
-        # Total matches found
-        total_matches = db.session.query(Match).filter(
-            Match.requester_id == user_id # type: ignore
-        ).count()
+        # Total matches found (snapshots only materialize sent matches, so count from the requests)
+        total_matches = db.session.query(func.coalesce(func.sum(MatchRequest.total_matches_found), 0)).filter(
+            MatchRequest.user_id == user_id # type: ignore
+        ).scalar()
 
         return {
             'profile_views': profile_views,
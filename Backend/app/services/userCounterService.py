@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+
+from app.models.userModel import User, RegistrationStage
+from app.services.userEvents import user_events
+
+logger = logging.getLogger(__name__)
+
+
+class RegisteredUserCounter:
+    """Maintained count of users with ``RegistrationStage.COMPLETED``.
+
+    Seeded with one COUNT(*) and then kept current from the user change feed:
+    +1 when a user reaches COMPLETED, -1 when a completed user leaves that
+    stage or is deleted. Changes the feed cannot see (bulk updates, other
+    worker processes) are corrected by re-counting at most every
+    ``reconcile_interval_s`` seconds, so welcome messages normally cost no
+    aggregate query at all.
+    """
+
+    def __init__(self, reconcile_interval_s=300):
+        self.reconcile_interval_s = reconcile_interval_s
+        self._count = None
+        self._reconciled_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.reconcile_interval_s = int(app.config.get('USER_COUNT_RECONCILE_S', self.reconcile_interval_s))
+        user_events.subscribe(self.on_user_change)
+
+    def get(self):
+        """Current number of completed registrations (must be called in an app context)"""
+        if self._count is None or time.monotonic() - self._reconciled_at >= self.reconcile_interval_s:
+            return self.reconcile()
+        return max(0, self._count)
+
+    def reconcile(self):
+        """Replace the maintained value with a real COUNT(*)"""
+        count = User.get_completed_registrations_count()
+        with self._lock:
+            if self._count is not None and self._count != count:
+                logger.info(f"Registered user counter drifted: {self._count} -> {count}")
+            self._count = count
+            self._reconciled_at = time.monotonic()
+        return count
+
+    def invalidate(self):
+        with self._lock:
+            self._count = None
+
+    def on_user_change(self, change):
+        delta = self._is_completed(change.after) - self._is_completed(change.before)
+        if delta:
+            with self._lock:
+                if self._count is not None:
+                    self._count += delta
+
+    @staticmethod
+    def _is_completed(snapshot):
+        return int(bool(snapshot) and snapshot.get('registration_stage') == RegistrationStage.COMPLETED)
+
+
+registered_user_counter = RegisteredUserCounter()
@@ -0,0 +1,126 @@
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.userModel import User
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = 'user_changes'
+
+
+class UserChange(NamedTuple):
+    """One committed change to a ``users`` row.
+
+    ``before``/``after`` are column snapshots ({column: value}); ``before``
+    is None for inserts and ``after`` is None for deletes.
+    """
+    op: str  # 'insert', 'update', 'delete'
+    user_id: int
+    before: Optional[dict]
+    after: Optional[dict]
+
+    def changed(self, field):
+        before = self.before or {}
+        after = self.after or {}
+        return before.get(field) != after.get(field)
+
+
+def _snapshot(state, previous=False):
+    """Column values of a User from its loaded state (never triggers a load)"""
+    values = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if previous:
+            history = state.attrs[key].history
+            if history.deleted:
+                values[key] = history.deleted[0]
+                continue
+            if history.added:
+                # Set while expired/unloaded: the previous value is unknown
+                continue
+        if key in state.dict:
+            values[key] = state.dict[key]
+    return values
+
+
+class UserEventFeed:
+    """In-process change feed for User rows.
+
+    Changes are collected from every ORM flush and published to subscribers
+    only after the transaction commits (and dropped on rollback), so
+    subscribers never see uncommitted data. Bulk ``query.update()`` /
+    ``delete()`` and writes from other processes are not captured;
+    consumers reconcile against the database periodically for those.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def init_app(self, app):
+        if self._installed:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self._installed = True
+
+    def subscribe(self, callback):
+        """Call ``callback(change)`` for every committed UserChange"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for change in changes:
+            for callback in subscribers:
+                try:
+                    callback(change)
+                except Exception as e:
+                    logger.error(f"User change subscriber {callback!r} failed: {str(e)}")
+
+    def _after_flush(self, session, flush_context):
+        # new/dirty/deleted and attribute history still show the pre-flush state here
+        changes = []
+        for obj in session.new:
+            if isinstance(obj, User):
+                changes.append(UserChange('insert', obj.id, None, _snapshot(inspect(obj))))
+        for obj in session.dirty:
+            if isinstance(obj, User) and session.is_modified(obj, include_collections=False):
+                state = inspect(obj)
+                changes.append(UserChange('update', obj.id, _snapshot(state, previous=True), _snapshot(state)))
+        for obj in session.deleted:
+            if isinstance(obj, User):
+                changes.append(UserChange('delete', obj.id, _snapshot(inspect(obj), previous=True), None))
+
+        if changes:
+            session.info.setdefault(_SESSION_KEY, []).extend(changes)
+
+    def _after_commit(self, session):
+        if session.in_nested_transaction():
+            # A savepoint: publish once the real transaction commits
+            return
+        changes = session.info.pop(_SESSION_KEY, None)
+        if changes:
+            self.publish(changes)
+
+    def _after_rollback(self, session):
+        if session.in_nested_transaction():
+            # A savepoint: its owner restores what was staged before it (see GroupTransaction)
+            return
+        session.info.pop(_SESSION_KEY, None)
+
+
+user_events = UserEventFeed()
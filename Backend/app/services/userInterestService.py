@@ -3,6 +3,7 @@ from sqlalchemy import and_, or_
 from app.extensions import db
 from app.models.userInterestModel import UserInterest
 from app.models.userModel import User
+from app.services.mutualMatchService import MutualMatchService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,14 +23,8 @@ class UserInterestService:
             if existing_interest:
                 raise ValueError("Interest already exists between these users")
             
-            # Create new interest
-            interest = UserInterest(
-                interested_user_id=interested_user_id,
-                target_user_id=target_user_id,
-                interest_type=interest_type
-            )
-            
-            db.session.add(interest)
+            # Create new interest (or start a finished one over)
+            interest = UserInterest.renew(interested_user_id, target_user_id, interest_type)
             db.session.commit()
             
             logger.info(f"Interest created: User {interested_user_id} -> User {target_user_id}")
@@ -140,36 +135,9 @@ class UserInterestService:
     @staticmethod
     def get_mutual_matches(user_id):
         try:
-            # Find interests where user expressed interest and got YES response
-            user_interests = db.session.query(UserInterest).filter(
-                UserInterest.interested_user_id == user_id,
-                UserInterest.response == 'YES'
-            ).all()
-            
-            mutual_matches = []
-            
-            for interest in user_interests:
-                # Check if target user also expressed interest back and user responded YES
-                reverse_interest = db.session.query(UserInterest).filter(
-                    UserInterest.interested_user_id == interest.target_user_id,
-                    UserInterest.target_user_id == user_id,
-                    UserInterest.response == 'YES'
-                ).first()
-                
-                if reverse_interest:
-                    # It's a mutual match
-                    match_data = {
-                        'user_id': interest.target_user_id,
-                        'user_name': interest.target_user.name if interest.target_user else 'Unknown',
-                        'user_phone': interest.target_user.phone_number if interest.target_user else 'Unknown',
-                        'match_date': max(interest.response_at, reverse_interest.response_at).isoformat() if interest.response_at and reverse_interest.response_at else None,
-                        'interest_ids': [interest.id, reverse_interest.id]
-                    }
-                    mutual_matches.append(match_data)
-            
-            logger.info(f"Found {len(mutual_matches)} mutual matches for user {user_id}")
-            return mutual_matches
-            
+            matches, _ = MutualMatchService.get_mutual_matches(user_id)
+            return matches
+
         except Exception as e:
             logger.error(f"Error getting mutual matches: {str(e)}")
             raise
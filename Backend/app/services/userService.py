@@ -1,4 +1,5 @@
 from app.models.userModel import User, RegistrationStage, Gender, db
+from app.services.userCounterService import registered_user_counter
 from sqlalchemy.exc import IntegrityError
 import re
 
@@ -118,7 +119,7 @@ class UserService:
 
             user.add_description(description)
             
-            total_users = User.get_completed_registrations_count()
+            total_users = registered_user_counter.get()
             
             return user, f"Welcome to our dating service with {total_users} potential dating partners! To search for a MPENZI, SMS match#age#town to 22141 and meet the person of your dreams. E.g., match#23-25#Nairobi"
 
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(ids):
+    """splitmix64 finalizer over an array of IDs"""
+    z = np.asarray(ids, dtype=np.uint64) + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+class BloomFilter:
+    """Bloom filter over integer IDs, held as a byte array.
+
+    Membership tests never miss an added ID; an ID never added tests
+    positive with probability ``error_rate`` while at most ``capacity`` IDs
+    have been added. Bit positions come from double hashing one 64-bit mix
+    of the ID, so tests over many IDs run as a few NumPy operations.
+    """
+
+    __slots__ = ('bits', 'num_hashes', 'capacity', 'count')
+
+    def __init__(self, bits, num_hashes, capacity, count=0):
+        self.bits = np.frombuffer(bits, dtype=np.uint8).copy()
+        self.num_hashes = num_hashes
+        self.capacity = capacity
+        self.count = count
+
+    @classmethod
+    def empty(cls, capacity, error_rate=0.01):
+        """An empty filter sized for ``capacity`` IDs at ``error_rate`` false positives"""
+        capacity = max(int(capacity), 1)
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        num_bytes = max((num_bits + 7) // 8, 1)
+        num_hashes = max(1, round(num_bytes * 8 / capacity * math.log(2)))
+        return cls(bytes(num_bytes), num_hashes, capacity)
+
+    @property
+    def is_full(self):
+        return self.count > self.capacity
+
+    def to_bytes(self):
+        return self.bits.tobytes()
+
+    def add_many(self, ids):
+        """Add IDs; returns how many were not (probably) present before"""
+        ids = np.unique(np.asarray(list(ids), dtype=np.int64))
+        if not len(ids):
+            return 0
+        new = int(np.count_nonzero(~self.contains_many(ids)))
+        positions = self._positions(ids)
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += new
+        return new
+
+    def contains_many(self, ids):
+        """Boolean array: True where an ID is probably present, False where it is certainly absent"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(ids)
+        bytes_ = self.bits[positions >> np.uint64(3)]
+        return ((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1).astype(bool)
+
+    def __contains__(self, item_id):
+        return bool(self.contains_many([item_id])[0])
+
+    def _positions(self, ids):
+        mixed = _mix(ids)
+        first = mixed & np.uint64(0xFFFFFFFF)
+        step = (mixed >> np.uint64(32)) | np.uint64(1)
+        rounds = np.arange(self.num_hashes, dtype=np.uint64)
+        return (first[:, None] + rounds[None, :] * step[:, None]) % np.uint64(len(self.bits) * 8)
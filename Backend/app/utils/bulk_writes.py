@@ -0,0 +1,155 @@
+import io
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Integer, any_, bindparam, insert, update
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.extensions import db
+
+# Batches at least this big go through COPY on Postgres when nothing has to be returned
+COPY_THRESHOLD = 5000
+
+
+def _table(target):
+    """Accept a model class or a Table"""
+    return getattr(target, '__table__', target)
+
+
+def _is_psycopg2(connection) -> bool:
+    return connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+
+
+def _with_defaults(table, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in the Python-side column defaults (``default=``) missing from the rows.
+
+    Core inserts apply these themselves; execute_values and COPY bypass
+    SQLAlchemy, so they are applied here for every path. Server defaults are
+    left to the database by leaving the column out.
+    """
+    missing = [
+        column for column in table.columns
+        if column.key not in rows[0] and column.default is not None
+        and (column.default.is_scalar or column.default.is_callable)
+    ]
+    if not missing:
+        return rows
+    filled = []
+    for row in rows:
+        row = dict(row)
+        for column in missing:
+            default = column.default
+            row[column.key] = default.arg if default.is_scalar else default.arg(None)
+        filled.append(row)
+    return filled
+
+
+def _copy_value(value) -> str:
+    """One field in COPY text format"""
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copy_rows(connection, table, columns: Sequence[str], rows: List[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row[column]) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.name} ({", ".join(columns)}) FROM STDIN', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _execute_values(connection, table, columns: Sequence[str], rows: List[Dict[str, Any]],
+                    returning: Sequence[str], page_size: int) -> List[tuple]:
+    from psycopg2.extras import execute_values
+
+    sql = f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES %s'
+    if returning:
+        sql += f' RETURNING {", ".join(returning)}'
+    cursor = connection.connection.cursor()
+    try:
+        result = execute_values(
+            cursor, sql, [tuple(row[column] for column in columns) for row in rows],
+            page_size=page_size, fetch=bool(returning)
+        )
+    finally:
+        cursor.close()
+    return [tuple(row) for row in result] if returning else []
+
+
+def bulk_insert(target, rows: List[Dict[str, Any]], returning: Optional[Sequence[str]] = None,
+                chunk_size: int = 1000, copy_threshold: Optional[int] = COPY_THRESHOLD):
+    """Insert many rows with a handful of statements instead of one per row.
+
+    ``rows`` are column dicts and must all have the same keys. Runs in the
+    current ``db.session`` transaction; committing is up to the caller.
+    With ``returning`` (column names) the inserted rows come back as tuples
+    of those columns, in no guaranteed order, so include a column to match
+    them up by; otherwise the number of rows inserted is returned.
+
+    On Postgres with psycopg2, batches of ``copy_threshold`` rows or more
+    (with nothing to return) are streamed with COPY and the rest go through
+    ``execute_values`` in pages of ``chunk_size`` rows; elsewhere rows are
+    written with one executemany.
+    """
+    if not rows:
+        return [] if returning else 0
+
+    table = _table(target)
+    rows = _with_defaults(table, rows)
+    columns = list(rows[0])
+    connection = db.session.connection()
+
+    if _is_psycopg2(connection):
+        if not returning and copy_threshold is not None and len(rows) >= copy_threshold:
+            _copy_rows(connection, table, columns, rows)
+            return len(rows)
+        inserted = _execute_values(connection, table, columns, rows, returning, chunk_size)
+        return inserted if returning else len(rows)
+
+    # executemany: the driver loops in C and SQLAlchemy batches RETURNING into multi-row
+    # INSERTs itself, both far cheaper than compiling one huge INSERT ... VALUES
+    if returning:
+        statement = insert(table).returning(*(table.c[name] for name in returning))
+        return [tuple(row) for row in connection.execute(statement, rows)]
+    connection.execute(insert(table), rows)
+    return len(rows)
+
+
+def bulk_update(target, ids: Sequence[int], values: Dict[str, Any], chunk_size: int = 5000) -> int:
+    """Apply the same ``values`` to every row whose ``id`` is in ``ids``; returns rows updated.
+
+    One ``UPDATE ... WHERE id = ANY(:ids)`` on Postgres, chunked ``IN``
+    lists elsewhere. Runs in the current ``db.session`` transaction.
+    """
+    if not ids:
+        return 0
+
+    table = _table(target)
+    connection = db.session.connection()
+    ids = list(ids)
+
+    if connection.dialect.name == 'postgresql':
+        statement = update(table).where(
+            table.c.id == any_(bindparam('ids', type_=ARRAY(Integer)))
+        ).values(**values)
+        return connection.execute(statement, {'ids': ids}).rowcount
+
+    updated = 0
+    for start in range(0, len(ids), chunk_size):
+        statement = update(table).where(table.c.id.in_(ids[start:start + chunk_size])).values(**values)
+        updated += connection.execute(statement).rowcount
+    return updated
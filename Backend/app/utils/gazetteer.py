@@ -0,0 +1,45 @@
+import csv
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.models.townModel import normalize_place
+
+# Bundled Kenyan towns with coordinates: name, county, latitude, longitude
+BUNDLED_TOWNS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'kenya_towns.csv')
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+@lru_cache(maxsize=1)
+def load_bundled_towns() -> List[Tuple[str, str, float, float]]:
+    """Every town in the bundled gazetteer as (name, county, latitude, longitude)"""
+    with open(BUNDLED_TOWNS_PATH, newline='', encoding='utf-8') as handle:
+        return [
+            (row['name'], row['county'], float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(handle)
+        ]
+
+
+@lru_cache(maxsize=1)
+def _bundled_index() -> Tuple[Dict[Tuple[str, str], Tuple[float, float]], Dict[str, Tuple[float, float]]]:
+    by_name_county, by_name = {}, {}
+    for name, county, latitude, longitude in load_bundled_towns():
+        by_name_county[(normalize_place(name), normalize_place(county))] = (latitude, longitude)
+        by_name.setdefault(normalize_place(name), (latitude, longitude))
+    return by_name_county, by_name
+
+
+def bundled_coordinates(name, county=None) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a town from the bundled gazetteer, by name and county, else by name alone"""
+    by_name_county, by_name = _bundled_index()
+    key = normalize_place(name)
+    return by_name_county.get((key, normalize_place(county))) or by_name.get(key)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
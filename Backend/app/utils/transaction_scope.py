@@ -0,0 +1,28 @@
+from flask_sqlalchemy.session import Session
+
+# session.info key of the open transaction scope
+SCOPE_KEY = 'transaction_scope'
+
+
+class ScopedSession(Session):
+    """Session that hands ``commit()``/``rollback()`` to an open transaction scope.
+
+    Code that commits as it goes (SMS handlers, model helpers) can then run
+    inside a larger transaction: while ``session.info[SCOPE_KEY]`` holds a
+    scope, ``commit()`` calls its ``release()`` and ``rollback()`` its
+    ``rollback()`` instead of ending the real transaction (see
+    ``GroupTransaction`` in smsBatchService). Without a scope the session
+    behaves as usual.
+    """
+
+    def commit(self):
+        scope = self.info.get(SCOPE_KEY)
+        if scope is None:
+            return super().commit()
+        scope.release()
+
+    def rollback(self):
+        scope = self.info.get(SCOPE_KEY)
+        if scope is None:
+            return super().rollback()
+        scope.rollback()
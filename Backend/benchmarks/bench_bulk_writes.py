@@ -0,0 +1,101 @@
+"""Match row write throughput: ORM add/flush loop vs the bulk write helpers.
+
+Creates a scratch SQLite database (or uses DATABASE_URL), then for each batch
+size inserts that many Match rows and flips them to sent, once through the
+ORM (one INSERT and one UPDATE per row) and once through
+app.utils.bulk_writes. On Postgres with psycopg2 the bulk path switches to
+COPY at bulk_writes.COPY_THRESHOLD rows. Run from the Backend directory:
+
+    python benchmarks/bench_bulk_writes.py --sizes 10 1000 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/bench_bulk.db'
+os.environ['SMS_DISPATCH_MODE'] = 'off'
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.matchModel import Match  # noqa: E402
+from app.models.matchRequestModel import MatchRequest  # noqa: E402
+from app.models.userModel import User, Gender, RegistrationStage  # noqa: E402
+from app.utils.bulk_writes import bulk_insert, bulk_update  # noqa: E402
+
+
+def orm_write(request_id, requester_id, candidate_ids):
+    matches = []
+    for position, user_id in enumerate(candidate_ids, 1):
+        match = Match(request_id=request_id, requester_id=requester_id,
+                      matched_user_id=user_id, position=position)
+        db.session.add(match)
+        matches.append(match)
+    db.session.flush()
+    insert_done = time.perf_counter()
+    for match in matches:
+        match.is_sent = True
+    db.session.commit()
+    return insert_done
+
+
+def bulk_write(request_id, requester_id, candidate_ids):
+    now = datetime.utcnow()
+    inserted = bulk_insert(Match, [{
+        'request_id': request_id, 'requester_id': requester_id,
+        'matched_user_id': user_id, 'position': position, 'created_at': now
+    } for position, user_id in enumerate(candidate_ids, 1)], returning=('id',))
+    insert_done = time.perf_counter()
+    bulk_update(Match, [row[0] for row in inserted], {'is_sent': True})
+    db.session.commit()
+    return insert_done
+
+
+app = create_app()
+with app.app_context():
+    db.create_all()
+    largest = max(args.sizes)
+    requester = User(phone_number='+254799999999', name='Bench', age=30, gender=Gender.MALE,
+                     town='Nairobi', county='Nairobi', registration_stage=RegistrationStage.COMPLETED)
+    db.session.add(requester)
+    db.session.commit()
+    requester_id = requester.id
+    db.session.execute(User.__table__.insert(), [{
+        'phone_number': f'+2547{i:08d}', 'name': f'Candidate {i}', 'age': 25, 'gender': 'FEMALE',
+        'town': 'Nairobi', 'county': 'Nairobi', 'registration_stage': 'COMPLETED', 'is_active': True
+    } for i in range(largest)])
+    db.session.commit()
+    candidate_ids = [row.id for row in db.session.query(User.id).filter(User.id != requester_id)
+                     .order_by(User.id).limit(largest)]
+
+    print(f"{'rows':>7} {'path':>5} {'insert rows/s':>14} {'update rows/s':>14}")
+    for size in args.sizes:
+        for name, write in (('orm', orm_write), ('bulk', bulk_write)):
+            best_insert = best_update = float('inf')
+            for _ in range(args.repeat):
+                match_request = MatchRequest(user_id=requester_id, age_min=20, age_max=30,
+                                             preferred_town='Nairobi')
+                db.session.add(match_request)
+                db.session.commit()
+                request_id = match_request.id
+                db.session.expunge_all()
+
+                start = time.perf_counter()
+                insert_done = write(request_id, requester_id, candidate_ids[:size])
+                end = time.perf_counter()
+                best_insert = min(best_insert, insert_done - start)
+                best_update = min(best_update, end - insert_done)
+
+                db.session.execute(Match.__table__.delete())
+                db.session.commit()
+            print(f"{size:>7} {name:>5} {size / best_insert:>14,.0f} {size / best_update:>14,.0f}")
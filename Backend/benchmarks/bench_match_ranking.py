@@ -0,0 +1,92 @@
+"""Compatibility ranking: vectorized MatchRanker vs the per-pair Python loop.
+
+Creates a scratch SQLite database (or uses DATABASE_URL) with the largest
+candidate set, then for each size ranks the candidates for one requester
+twice: SmsService.calculate_compatibility per candidate plus a sort, and
+MatchRanker.rank (full order and top 20). Feature loading happens once up
+front and is reported separately. Run from the Backend directory:
+
+    python benchmarks/bench_match_ranking.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/bench_ranking.db'
+os.environ['SMS_DISPATCH_MODE'] = 'off'
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.userModel import User, Gender, RegistrationStage  # noqa: E402
+from app.services.matchRankingService import match_ranker  # noqa: E402
+from app.services.smsMessagesService import SmsService  # noqa: E402
+
+COUNTIES = ['Nairobi', 'Kiambu', 'Mombasa', 'Kisumu', 'Nakuru', None]
+TOWNS = ['Westlands', 'Imara', 'Thika', 'Nyali', 'Milimani', None]
+EDUCATION = ['Degree', 'Diploma', 'Certificate', 'Masters', None]
+RELIGIONS = ['Christian', 'Muslim', 'Hindu', None]
+
+
+def best(fn):
+    elapsed = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+random.seed(42)
+app = create_app()
+with app.app_context():
+    db.create_all()
+    largest = max(args.sizes)
+    db.session.execute(User.__table__.insert(), [{
+        'phone_number': f'+2547{i:08d}', 'name': f'Candidate {i}', 'age': random.randint(18, 45),
+        'gender': 'FEMALE', 'county': random.choice(COUNTIES), 'town': random.choice(TOWNS),
+        'level_of_education': random.choice(EDUCATION), 'religion': random.choice(RELIGIONS),
+        'registration_stage': 'COMPLETED', 'is_active': True
+    } for i in range(largest)])
+    db.session.commit()
+
+    requester = User(phone_number='+254799999999', name='Bench', age=30, gender=Gender.MALE,
+                     county='Nairobi', town='Westlands', level_of_education='Degree', religion='Christian')
+    requester.registration_stage = RegistrationStage.COMPLETED
+    candidates = db.session.query(
+        User.id, User.age, User.county, User.town, User.level_of_education, User.religion
+    ).order_by(User.id.desc()).all()
+
+    start = time.perf_counter()
+    match_ranker.reload()
+    print(f"feature load for {len(candidates)} users: {time.perf_counter() - start:.3f}s")
+
+    sms_service = SmsService()
+    print(f"{'candidates':>10} {'python loop':>12} {'numpy full':>11} {'numpy top20':>12} {'speedup':>8}")
+    for size in args.sizes:
+        subset = candidates[:size]
+        ids = [row.id for row in subset]
+
+        def python_loop():
+            scored = [(sms_service.calculate_compatibility(requester, row), row.id) for row in subset]
+            scored.sort(reverse=True)
+            return [user_id for _, user_id in scored]
+
+        expected = python_loop()
+        assert match_ranker.rank(requester, ids) == expected, "vectorized ranking differs from the per-pair loop"
+
+        loop_s = best(python_loop)
+        full_s = best(lambda: match_ranker.rank(requester, ids))
+        top_s = best(lambda: match_ranker.rank(requester, ids, limit=20))
+        print(f"{size:>10,} {loop_s * 1000:>10.1f}ms {full_s * 1000:>9.1f}ms {top_s * 1000:>10.1f}ms "
+              f"{loop_s / full_s:>7.0f}x")
@@ -0,0 +1,106 @@
+"""Microbenchmark for SMS command parsing throughput.
+
+Compares the registry parser in app.services.smsCommands with the old
+startswith/if-elif chain (re-implemented below, routing plus the re-split
+each handler used to do). Run from the Backend directory:
+
+    python benchmarks/bench_sms_parser.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.smsCommands import sms_commands  # noqa: E402
+
+MESSAGES = [
+    "PENZI",
+    "start#Jane Doe#24#Female#Nairobi#Westlands",
+    "details#Graduate#IT#Single#Christian#Kikuyu",
+    "MYSELF tall, dark and handsome",
+    "match#25-30#Nairobi",
+    "NEXT",
+    "DESCRIBE 0712345678",
+    "YES",
+    "STATS",
+    "hello there",
+]
+
+
+def legacy_parse(message_body):
+    """The pre-registry path: startswith chain, then each handler's re-split and checks"""
+    upper = message_body.strip().upper()
+    if upper == "PENZI":
+        return "PENZI", None
+    if upper.startswith("START#"):
+        parts = upper.split("#")
+        if len(parts) != 6:
+            return "START", None
+        _, name, age, gender, county, town = parts
+        if not all([name, age, gender, county, town]) or int(age) < 18:
+            return "START", None
+        if gender.upper() not in ["MALE", "FEMALE"]:
+            return "START", None
+        return "START", (name, int(age), gender, county, town)
+    elif upper.startswith("DETAILS#"):
+        parts = upper.split("#")
+        if len(parts) != 6:
+            return "DETAILS", None
+        fields = [part.strip() for part in parts[1:]]
+        if not all(fields) or any(len(field) < 2 for field in fields):
+            return "DETAILS", None
+        return "DETAILS", fields
+    elif upper.startswith("MYSELF"):
+        description = message_body.strip()[6:].strip()
+        return "MYSELF", description if len(description) >= 3 else None
+    elif upper.startswith("IMAGES"):
+        return "IMAGES", None
+    elif upper.startswith("MATCH#"):
+        parts = upper.split("#")
+        if len(parts) != 3:
+            return "MATCH", None
+        _, age_range, town = parts
+        if "-" in age_range:
+            age_min, age_max = map(int, age_range.split("-"))
+        else:
+            age_min = age_max = int(age_range)
+        return "MATCH", (age_min, age_max, town)
+    elif upper == "NEXT":
+        return "NEXT", None
+    elif upper.startswith("DESCRIBE"):
+        parts = upper.split()
+        if len(parts) != 2:
+            return "DESCRIBE", None
+        target_phone = parts[1].strip()
+        if target_phone.startswith('+'):
+            target_phone = target_phone[1:]
+        if target_phone.startswith('254') and len(target_phone) > 10:
+            target_phone = '0' + target_phone[3:]
+        return "DESCRIBE", target_phone
+    elif upper in ["YES", "NO"]:
+        return upper, None
+    elif upper == "STOP":
+        return "STOP", None
+    elif upper == "STATS":
+        return "STATS", None
+    elif upper == "HISTORY":
+        return "HISTORY", None
+    return None, None
+
+
+def run(label, parse, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            parse(message)
+    elapsed = time.perf_counter() - start
+    total = iterations * len(MESSAGES)
+    print(f"{label:<10} {total:>9} msgs  {elapsed:8.3f}s  {total / elapsed:>12,.0f} msgs/s  "
+          f"{elapsed / total * 1e6:6.2f} us/msg")
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    run("legacy", legacy_parse, iterations)
+    run("registry", sms_commands.parse, iterations)
@@ -0,0 +1,106 @@
+"""Local stand-in for the SMS provider, for measuring outbound dispatch offline.
+
+Speaks the HttpSmsGateway protocol (POST {"messages": [...]} -> {"results": [...]})
+with configurable per-call latency, per-message rejection rate and whole-call
+failure rate. Run from the Backend directory:
+
+    python benchmarks/sms_gateway_simulator.py --port 8099 --latency-ms 50 --fail-rate 0.01
+
+then start the app with SMS_DISPATCH_MODE=queue SMS_GATEWAY=http
+SMS_GATEWAY_URL=http://127.0.0.1:8099/send
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GatewaySimulator:
+    def __init__(self, latency_ms=20, reject_rate=0.0, fail_rate=0.0):
+        self.latency_ms = latency_ms
+        self.reject_rate = reject_rate
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.failed_calls = 0
+        self.started = time.perf_counter()
+
+    def handle(self, payload):
+        """Returns (status_code, body) for one gateway call"""
+        time.sleep(self.latency_ms / 1000.0)
+        messages = payload.get('messages', [])
+
+        with self.lock:
+            self.calls += 1
+            if random.random() < self.fail_rate:
+                self.failed_calls += 1
+                return 503, {'error': 'Simulated gateway outage'}
+
+        results = []
+        for message in messages:
+            if random.random() < self.reject_rate:
+                results.append({'id': message.get('id'), 'status': 'rejected', 'error': 'Simulated rejection'})
+            else:
+                results.append({'id': message.get('id'), 'status': 'accepted'})
+
+        with self.lock:
+            self.accepted += sum(1 for result in results if result['status'] == 'accepted')
+            self.rejected += sum(1 for result in results if result['status'] == 'rejected')
+        return 200, {'results': results}
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            return (f"calls={self.calls} accepted={self.accepted} rejected={self.rejected} "
+                    f"failed_calls={self.failed_calls} rate={self.accepted / elapsed:,.0f} msgs/s")
+
+
+def start_simulator(port=0, **options):
+    """Start the simulator in a background thread; returns (server, simulator, url)"""
+    simulator = GatewaySimulator(**options)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                status, body = 400, {'error': 'Invalid JSON'}
+            else:
+                status, body = simulator.handle(payload)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, simulator, f'http://127.0.0.1:{server.server_address[1]}/send'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--reject-rate', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, simulator, url = start_simulator(args.port, latency_ms=args.latency_ms,
+                                             reject_rate=args.reject_rate, fail_rate=args.fail_rate)
+    print(f"SMS gateway simulator listening on {url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(simulator.summary())
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,301 @@
+"""End-to-end SMS load generator and conversation replay.
+
+Builds a synthetic Kenyan population (phone formats, counties/towns, ages,
+genders), scripts every user's full conversation
+
+    PENZI -> START# -> DETAILS# -> MYSELF -> MATCH# -> NEXT -> DESCRIBE -> (target) YES/NO
+
+and replays it at a configurable concurrency. Messages from one user are sent
+in order; users run in parallel. Reports per-command p50/p95/p99 latency,
+SQL statements per command and overall messages per second.
+
+Drivers:
+    service  SmsService.process_incoming_sms in-process (default)
+    client   POST /api/sms/process-incoming through the Flask test client
+    http     POST to a running server (--url); query counts are not available
+
+Runs against a scratch SQLite file by default, or DATABASE_URL / --database-url
+(e.g. a local Postgres). Run from the Backend directory:
+
+    python benchmarks/sms_load.py --users 200 --concurrency 8
+    python benchmarks/sms_load.py --driver http --url http://localhost:5000 --users 50
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COUNTIES = {
+    'Nairobi': (0.30, ['Nairobi', 'Westlands', 'Kasarani', 'Embakasi', 'Langata', 'Kilimani', 'Roysambu']),
+    'Mombasa': (0.10, ['Mombasa', 'Nyali', 'Likoni', 'Kisauni', 'Changamwe']),
+    'Kiambu': (0.10, ['Thika', 'Ruiru', 'Kikuyu', 'Limuru', 'Juja']),
+    'Nakuru': (0.08, ['Nakuru', 'Naivasha', 'Gilgil', 'Molo']),
+    'Kisumu': (0.07, ['Kisumu', 'Maseno', 'Ahero']),
+    'Uasin Gishu': (0.06, ['Eldoret', 'Turbo', 'Burnt Forest']),
+    'Machakos': (0.06, ['Machakos', 'Athi River', 'Kangundo']),
+    'Kakamega': (0.06, ['Kakamega', 'Mumias', 'Malava']),
+    'Nyeri': (0.05, ['Nyeri', 'Othaya', 'Karatina']),
+    'Kilifi': (0.05, ['Kilifi', 'Malindi', 'Watamu']),
+    'Meru': (0.04, ['Meru', 'Maua', 'Nkubu']),
+    'Kajiado': (0.03, ['Kitengela', 'Ngong', 'Kajiado']),
+}
+FEMALE_NAMES = ['Achieng', 'Wanjiru', 'Njeri', 'Akinyi', 'Chebet', 'Wambui', 'Mwende', 'Atieno', 'Nafula',
+                'Kerubo', 'Faith', 'Mercy', 'Grace', 'Joy', 'Esther', 'Lucy', 'Brenda', 'Sharon']
+MALE_NAMES = ['Otieno', 'Kamau', 'Kipchoge', 'Mwangi', 'Omondi', 'Kiprono', 'Mutua', 'Wafula', 'Njoroge',
+              'Ochieng', 'Brian', 'Kevin', 'Dennis', 'Collins', 'Victor', 'Peter', 'James', 'Samuel']
+SURNAMES = ['Odhiambo', 'Kariuki', 'Mutai', 'Wekesa', 'Maina', 'Onyango', 'Kilonzo', 'Gitau', 'Barasa',
+            'Cheruiyot', 'Nyaga', 'Mohamed', 'Owino', 'Macharia', 'Koech', 'Muthoni']
+EDUCATION = ['Primary', 'Secondary', 'Diploma', 'Graduate', 'Masters', 'PhD']
+PROFESSIONS = ['Teacher', 'Nurse', 'Engineer', 'Farmer', 'Accountant', 'Driver', 'Doctor', 'Trader',
+               'Developer', 'Banker', 'Chef', 'Lawyer', 'Mechanic', 'Designer']
+MARITAL = ['Single', 'Single', 'Single', 'Divorced', 'Widowed']
+RELIGIONS = ['Christian', 'Christian', 'Christian', 'Muslim', 'Hindu', 'Other']
+ETHNICITIES = ['Kikuyu', 'Luhya', 'Kalenjin', 'Luo', 'Kamba', 'Kisii', 'Mijikenda', 'Meru', 'Maasai', 'Somali']
+DESCRIPTIONS = ['tall, dark and handsome', 'loves hiking and music', 'God fearing and honest',
+                'quiet, kind and ambitious', 'foodie who loves to travel', 'fun, loyal and caring',
+                'football fan and good cook', 'bookworm looking for a partner']
+
+
+class SyntheticUser:
+    def __init__(self, rng, index):
+        self.gender = 'Female' if rng.random() < 0.5 else 'Male'
+        first = rng.choice(FEMALE_NAMES if self.gender == 'Female' else MALE_NAMES)
+        self.name = f'{first} {rng.choice(SURNAMES)}'
+        self.age = max(18, min(60, int(rng.gauss(28, 6))))
+        counties = list(COUNTIES)
+        self.county = rng.choices(counties, weights=[COUNTIES[c][0] for c in counties])[0]
+        self.town = rng.choice(COUNTIES[self.county][1])
+
+        # Unique subscriber number in Safaricom/Airtel 07xx / 01xx ranges
+        prefix = rng.choice(['7', '7', '7', '1'])
+        self.local = f'0{prefix}{(index * 7919 + rng.randrange(7919)) % 10 ** 8:08d}'
+        # Gateways deliver numbers in all three formats
+        self.phone = rng.choice([self.local, '+254' + self.local[1:], '254' + self.local[1:]])
+
+        self.details = [rng.choice(EDUCATION), rng.choice(PROFESSIONS), rng.choice(MARITAL),
+                        rng.choice(RELIGIONS), rng.choice(ETHNICITIES)]
+        self.description = rng.choice(DESCRIPTIONS)
+
+    def registration_flow(self, rng):
+        return [
+            'PENZI',
+            f'start#{self.name}#{self.age}#{self.gender}#{self.county}#{self.town}',
+            'details#' + '#'.join(self.details),
+            f'MYSELF {self.description}',
+        ]
+
+    def search_flow(self, rng, target):
+        low = max(18, self.age - rng.randint(2, 6))
+        high = low + rng.randint(3, 10)
+        place = self.town if rng.random() < 0.5 else self.county
+        flow = [f'match#{low}-{high}#{place}']
+        flow += ['NEXT'] * rng.choice([0, 1, 1, 2])
+        if target is not None:
+            flow.append(f'DESCRIBE {target.local}')
+        return flow
+
+
+def build_population(count, seed):
+    rng = random.Random(seed)
+    users = [SyntheticUser(rng, index) for index in range(count)]
+    seen = set()
+    return [user for user in users if not (user.local in seen or seen.add(user.local))]
+
+
+def pick_targets(users, rng):
+    """Each user describes someone of the other gender, preferably from the same county"""
+    by_key = defaultdict(list)
+    for user in users:
+        by_key[(user.gender, user.county)].append(user)
+        by_key[(user.gender, None)].append(user)
+    targets = {}
+    for user in users:
+        other = 'Male' if user.gender == 'Female' else 'Female'
+        pool = by_key.get((other, user.county)) or by_key.get((other, None)) or []
+        targets[user.local] = rng.choice(pool) if pool else None
+    return targets
+
+
+class Recorder:
+    """Per-command latency and SQL statement samples"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)   # command -> [(seconds, queries)]
+        self.errors = defaultdict(int)
+        self.local = threading.local()
+
+    def count_query(self, *args):
+        if getattr(self.local, 'active', False):
+            self.local.queries += 1
+
+    def record(self, command, seconds, queries, error):
+        with self.lock:
+            self.samples[command].append((seconds, queries))
+            if error:
+                self.errors[command] += 1
+
+
+def command_label(body):
+    from app.services.smsCommands import sms_commands
+    parsed = sms_commands.parse(body)
+    return parsed.spec.keyword if parsed.spec else 'UNKNOWN'
+
+
+def make_sender(args, app):
+    if args.driver == 'http':
+        import requests
+        session = requests.Session()
+        url = args.url.rstrip('/') + '/api/sms/process-incoming'
+
+        def send(phone, body):
+            response = session.post(url, json={'from_phone': phone, 'to_phone': '22141',
+                                               'message_body': body, 'direction': 'incoming'}, timeout=60)
+            return response.status_code >= 500
+        return send
+
+    if args.driver == 'client':
+        client = app.test_client()
+
+        def send(phone, body):
+            response = client.post('/api/sms/process-incoming', json={
+                'from_phone': phone, 'to_phone': '22141', 'message_body': body, 'direction': 'incoming'})
+            return response.status_code >= 500
+        return send
+
+    from app.services.smsContext import SmsContext
+    from app.services.smsMessagesService import SmsService
+
+    def send(phone, body):
+        with app.app_context():
+            SmsService().process_incoming_sms(phone, body, SmsContext(phone, body))
+        return False
+    return send
+
+
+def run_flow(send, recorder, phone, messages):
+    for body in messages:
+        recorder.local.queries = 0
+        recorder.local.active = True
+        started = time.perf_counter()
+        error = False
+        try:
+            error = send(phone, body)
+        except Exception as e:
+            error = True
+            sys.__stderr__.write(f"{body[:20]!r} from {phone}: {type(e).__name__}: {e}\n")
+        elapsed = time.perf_counter() - started
+        recorder.local.active = False
+        recorder.record(command_label(body), elapsed, recorder.local.queries, error)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def print_report(recorder, elapsed, count_queries):
+    order = ['PENZI', 'START', 'DETAILS', 'MYSELF', 'MATCH', 'NEXT', 'DESCRIBE', 'YES', 'NO']
+    commands = sorted(recorder.samples, key=lambda c: order.index(c) if c in order else len(order))
+    total = sum(len(samples) for samples in recorder.samples.values())
+    total_queries = sum(q for samples in recorder.samples.values() for _, q in samples)
+
+    print(f"\n{'command':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}")
+    for command in commands:
+        samples = recorder.samples[command]
+        latencies = sorted(seconds * 1000 for seconds, _ in samples)
+        queries = f"{sum(q for _, q in samples) / len(samples):8.1f}" if count_queries else f"{'n/a':>8}"
+        print(f"{command:<10} {len(samples):>7} {percentile(latencies, 0.50):>9.2f} "
+              f"{percentile(latencies, 0.95):>9.2f} {percentile(latencies, 0.99):>9.2f} "
+              f"{queries} {recorder.errors.get(command, 0):>7}")
+
+    print(f"\n{total} messages in {elapsed:.2f}s = {total / elapsed:,.1f} msgs/s", end='')
+    if count_queries and total:
+        print(f", {total_queries / total:.1f} queries/msg")
+    else:
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--driver', choices=['service', 'client', 'http'], default='service')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--yes-rate', type=float, default=0.6, help='share of described users answering YES')
+    parser.add_argument('--verbose', action='store_true', help='keep the app\'s DEBUG prints')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = build_population(args.users, args.seed)
+    targets = pick_targets(users, rng)
+    print(f"Population: {len(users)} users, "
+          f"{sum(u.gender == 'Female' for u in users)} female, {len(set(u.county for u in users))} counties")
+
+    app = None
+    count_queries = args.driver != 'http'
+    recorder = Recorder()
+    if args.driver != 'http':
+        os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{tempfile.mkdtemp()}/sms_load.db'
+        os.environ.setdefault('SMS_ENGINE_MODE', 'off')
+        print(f"Database: {os.environ['DATABASE_URL']}")
+
+        from sqlalchemy import event
+        from app import create_app
+        from app.extensions import db
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            event.listen(db.engine, 'before_cursor_execute', recorder.count_query)
+
+    send = make_sender(args, app)
+    described = {}
+    phases = [
+        ('registration', {user.phone: user.registration_flow(rng) for user in users}),
+        ('search', {}),
+        ('responses', {}),
+    ]
+    for user in users:
+        target = targets[user.local]
+        phases[1][1][user.phone] = user.search_flow(rng, target)
+        if target is not None:
+            described.setdefault(target.phone, target)
+    phases[2] = ('responses', {
+        phone: ['YES' if rng.random() < args.yes_rate else 'NO'] for phone in described
+    })
+
+    devnull = open(os.devnull, 'w')
+    started = time.perf_counter()
+    for name, flows in phases:
+        phase_started = time.perf_counter()
+        # The app prints DEBUG lines for every message; keep them out of the report
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                for phone, messages in flows.items():
+                    executor.submit(run_flow, send, recorder, phone, messages)
+        sys.stdout.write(f"phase {name:<12} {sum(len(m) for m in flows.values()):>6} msgs "
+                         f"{time.perf_counter() - phase_started:7.2f}s\n")
+    elapsed = time.perf_counter() - started
+
+    print_report(recorder, elapsed, count_queries)
+
+    if app is not None:
+        from app.services.smsLogService import sms_log_writer
+        sms_log_writer.stop()
+
+
+if __name__ == '__main__':
+    main()
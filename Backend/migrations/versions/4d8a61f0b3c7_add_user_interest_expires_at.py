@@ -0,0 +1,38 @@
+"""Add expires_at to user_interests
+
+Revision ID: 4d8a61f0b3c7
+Revises: 9f3d2c7a1e68
+Create Date: 2026-10-16 11:24:05.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8a61f0b3c7'
+down_revision = '9f3d2c7a1e68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    # Existing interests keep the 24 hour window they were created with
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE user_interests SET expires_at = created_at + INTERVAL '24 hours'")
+    else:
+        op.execute("UPDATE user_interests SET expires_at = datetime(created_at, '+24 hours')")
+
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_user_interests_pending_expiry', ['expires_at'], unique=False,
+                              postgresql_where=sa.text('response_received = false AND expired_notification_sent = false'))
+
+
+def downgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_interests_pending_expiry')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,38 @@
+"""Add candidate snapshot and cursor to match_requests
+
+Revision ID: 5a0f3e8b7d21
+Revises: e2b7c9d4f160
+Create Date: 2026-10-16 13:02:36.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0f3e8b7d21'
+down_revision = 'e2b7c9d4f160'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('match_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('candidate_ids', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('total_matches_found', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('current_position', sa.Integer(), nullable=False, server_default='0'))
+
+    # Existing requests keep their Match rows (candidate_ids stays NULL); record their totals
+    op.execute(
+        "UPDATE match_requests SET "
+        "total_matches_found = (SELECT COUNT(*) FROM matches WHERE matches.request_id = match_requests.id), "
+        "current_position = (SELECT COUNT(*) FROM matches "
+        "WHERE matches.request_id = match_requests.id AND matches.is_sent = true)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('match_requests', schema=None) as batch_op:
+        batch_op.drop_column('current_position')
+        batch_op.drop_column('total_matches_found')
+        batch_op.drop_column('candidate_ids')
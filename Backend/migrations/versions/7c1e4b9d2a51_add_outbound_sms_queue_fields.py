@@ -0,0 +1,35 @@
+"""Add outbound SMS queue fields
+
+Revision ID: 7c1e4b9d2a51
+Revises: 3accdb3f6ca0
+Create Date: 2026-10-16 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4b9d2a51'
+down_revision = '3accdb3f6ca0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('sent_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_error', sa.Text(), nullable=True))
+        batch_op.create_index('ix_sms_messages_dispatch_queue', ['status', 'next_attempt_at'], unique=False,
+                              postgresql_where=sa.text("status IN ('pending', 'sending')"))
+
+
+def downgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_sms_messages_dispatch_queue')
+        batch_op.drop_column('last_error')
+        batch_op.drop_column('sent_at')
+        batch_op.drop_column('next_attempt_at')
+        batch_op.drop_column('attempts')
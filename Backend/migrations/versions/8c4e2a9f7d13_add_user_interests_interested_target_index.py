@@ -0,0 +1,27 @@
+"""Add composite index on user_interests (interested_user_id, target_user_id)
+
+Revision ID: 8c4e2a9f7d13
+Revises: 5a0f3e8b7d21
+Create Date: 2026-10-16 14:05:37.618205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2a9f7d13'
+down_revision = '5a0f3e8b7d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.create_index('ix_user_interests_interested_target',
+                              ['interested_user_id', 'target_user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_interests_interested_target')
@@ -0,0 +1,30 @@
+"""Add gateway message id and stored response to sms_messages
+
+Revision ID: 9f3d2c7a1e68
+Revises: 7c1e4b9d2a51
+Create Date: 2026-10-16 10:02:17.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3d2c7a1e68'
+down_revision = '7c1e4b9d2a51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('gateway_message_id', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('response_body', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_sms_messages_gateway_message_id'), ['gateway_message_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sms_messages_gateway_message_id'))
+        batch_op.drop_column('response_body')
+        batch_op.drop_column('gateway_message_id')
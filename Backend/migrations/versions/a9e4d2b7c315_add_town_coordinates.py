@@ -0,0 +1,100 @@
+"""Add town coordinates and load the bundled Kenyan gazetteer
+
+Revision ID: a9e4d2b7c315
+Revises: f1a7c3e95b08
+Create Date: 2026-10-16 20:03:27.540119
+
+"""
+import csv
+import os
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4d2b7c315'
+down_revision = 'f1a7c3e95b08'
+branch_labels = None
+depends_on = None
+
+BUNDLED_TOWNS = os.path.join(os.path.dirname(__file__), '..', '..', 'app', 'data', 'kenya_towns.csv')
+
+
+def normalize_place(name):
+    # Same rule as app.models.townModel.normalize_place
+    return ' '.join(re.sub(r"[^\w\s]", ' ', (name or '').lower()).split())
+
+
+def _has_extension(bind, name):
+    return bind.execute(sa.text('SELECT 1 FROM pg_extension WHERE extname = :name'), {'name': name}).first() is not None
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    with op.batch_alter_table('towns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+    with open(BUNDLED_TOWNS, newline='', encoding='utf-8') as handle:
+        bundled = list(csv.DictReader(handle))
+
+    by_key, by_name = {}, {}
+    for town in bundled:
+        point = (float(town['latitude']), float(town['longitude']))
+        by_key[(normalize_place(town['name']), normalize_place(town['county']))] = point
+        by_name.setdefault(normalize_place(town['name']), point)
+
+    # Existing towns: same name and county, else same name
+    existing = bind.execute(sa.text('SELECT id, normalized_name, normalized_county FROM towns')).fetchall()
+    params = []
+    for row in existing:
+        point = by_key.get((row.normalized_name, row.normalized_county)) or by_name.get(row.normalized_name)
+        if point:
+            params.append({'latitude': point[0], 'longitude': point[1], 'row_id': row.id})
+    if params:
+        bind.execute(sa.text('UPDATE towns SET latitude = :latitude, longitude = :longitude WHERE id = :row_id'),
+                     params)
+
+    # Bundled towns nobody lives in yet, so radius searches can reach across them
+    towns = sa.table('towns',
+        sa.column('name', sa.String), sa.column('county', sa.String),
+        sa.column('normalized_name', sa.String), sa.column('normalized_county', sa.String),
+        sa.column('latitude', sa.Float), sa.column('longitude', sa.Float),
+        sa.column('created_at', sa.DateTime))
+    known = {(row.normalized_name, row.normalized_county) for row in existing}
+    now = datetime.utcnow()
+    new_towns = [{
+        'name': town['name'],
+        'county': town['county'],
+        'normalized_name': normalize_place(town['name']),
+        'normalized_county': normalize_place(town['county']),
+        'latitude': float(town['latitude']),
+        'longitude': float(town['longitude']),
+        'created_at': now
+    } for town in bundled if (normalize_place(town['name']), normalize_place(town['county'])) not in known]
+    if new_towns:
+        op.bulk_insert(towns, new_towns)
+
+    # Indexes for the optional Postgres radius backends (GEO_BACKEND), when their extension is installed
+    if bind.dialect.name == 'postgresql':
+        if _has_extension(bind, 'earthdistance'):
+            op.execute('CREATE INDEX ix_towns_earth ON towns USING gist (ll_to_earth(latitude, longitude))')
+        if _has_extension(bind, 'postgis'):
+            op.execute('CREATE INDEX ix_towns_geography ON towns '
+                       'USING gist (geography(ST_MakePoint(longitude, latitude)))')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_towns_geography')
+        op.execute('DROP INDEX IF EXISTS ix_towns_earth')
+
+    # Bundled towns stay: users may have been placed in them since
+    with op.batch_alter_table('towns', schema=None) as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,26 @@
+"""Add claim timestamp for gateway message deduplication to sms_messages
+
+Revision ID: b2d6e9f4a817
+Revises: e8b4f2c6d019
+Create Date: 2026-10-16 23:47:52.318640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6e9f4a817'
+down_revision = 'e8b4f2c6d019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('sms_messages', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -0,0 +1,35 @@
+"""Add user_seen_sets
+
+Revision ID: c5d1e8a3f274
+Revises: a9e4d2b7c315
+Create Date: 2026-10-16 21:07:44.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d1e8a3f274'
+down_revision = 'a9e4d2b7c315'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No backfill: a user's filter is built from match and interest history on first use
+    op.create_table('user_seen_sets',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('bits', sa.LargeBinary(), nullable=False),
+        sa.Column('num_hashes', sa.Integer(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('reset_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_seen_sets')
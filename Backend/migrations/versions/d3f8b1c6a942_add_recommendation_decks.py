@@ -0,0 +1,46 @@
+"""Add recommendation_decks and an index on users.updated_at
+
+Revision ID: d3f8b1c6a942
+Revises: 8c4e2a9f7d13
+Create Date: 2026-10-16 16:42:11.305918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8b1c6a942'
+down_revision = '8c4e2a9f7d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recommendation_decks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('age_min', sa.Integer(), nullable=False),
+        sa.Column('age_max', sa.Integer(), nullable=False),
+        sa.Column('town_key', sa.String(length=100), nullable=False),
+        sa.Column('town_id', sa.Integer(), nullable=True),
+        sa.Column('candidate_keys', sa.LargeBinary(), nullable=False),
+        sa.Column('total_candidates', sa.Integer(), nullable=False),
+        sa.Column('is_stale', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_recommendation_decks_criteria', 'recommendation_decks',
+                    ['town_id', 'age_min', 'age_max'], unique=False)
+
+    # The deck builder picks up changed users by updated_at every pass
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_updated_at'))
+
+    op.drop_index('ix_recommendation_decks_criteria', table_name='recommendation_decks')
+    op.drop_table('recommendation_decks')
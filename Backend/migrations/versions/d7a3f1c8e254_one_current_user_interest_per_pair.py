@@ -0,0 +1,45 @@
+"""One current interest per (interested_user_id, target_user_id) on user_interests
+
+Revision ID: d7a3f1c8e254
+Revises: b2d6e9f4a817
+Create Date: 2026-10-17 00:41:26.503918
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f1c8e254'
+down_revision = 'b2d6e9f4a817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('superseded_at', sa.DateTime(), nullable=True))
+
+    # Pairs with several interests keep all of them; the latest answered one (else the latest) stays
+    # current and the rest are marked superseded, so responses, payments and counts are not lost
+    op.get_bind().execute(sa.text(
+        'UPDATE user_interests SET superseded_at = :now WHERE id <> ('
+        'SELECT kept.id FROM user_interests AS kept '
+        'WHERE kept.interested_user_id = user_interests.interested_user_id '
+        'AND kept.target_user_id = user_interests.target_user_id '
+        'ORDER BY kept.response_received DESC, kept.id DESC LIMIT 1)'
+    ), {'now': datetime.utcnow()})
+
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.create_index('ix_user_interests_current_pair', ['interested_user_id', 'target_user_id'],
+                              unique=True, postgresql_where=sa.text('superseded_at IS NULL'),
+                              sqlite_where=sa.text('superseded_at IS NULL'))
+
+
+def downgrade():
+    # No rows were removed on upgrade, so dropping the marker restores the previous table
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_interests_current_pair')
+        batch_op.drop_column('superseded_at')
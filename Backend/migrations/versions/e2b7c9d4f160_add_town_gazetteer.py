@@ -0,0 +1,142 @@
+"""Add town gazetteer and town_id on users and match requests
+
+Revision ID: e2b7c9d4f160
+Revises: 4d8a61f0b3c7
+Create Date: 2026-10-16 12:10:48.227514
+
+"""
+import csv
+import difflib
+import os
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c9d4f160'
+down_revision = '4d8a61f0b3c7'
+branch_labels = None
+depends_on = None
+
+BUNDLED_TOWNS = os.path.join(os.path.dirname(__file__), '..', '..', 'app', 'data', 'kenya_towns.csv')
+
+
+def normalize_place(name):
+    # Same rule as app.models.townModel.normalize_place
+    return ' '.join(re.sub(r"[^\w\s]", ' ', (name or '').lower()).split())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.create_table('towns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('county', sa.String(length=100), nullable=True),
+        sa.Column('normalized_name', sa.String(length=100), nullable=False),
+        sa.Column('normalized_county', sa.String(length=100), nullable=False, server_default=''),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('normalized_name', 'normalized_county', name='uq_towns_name_county')
+    )
+    op.create_index('ix_towns_normalized_name_trgm', 'towns', ['normalized_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'normalized_name': 'gin_trgm_ops'})
+
+    op.create_table('town_aliases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('alias', sa.String(length=100), nullable=False),
+        sa.Column('town_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['town_id'], ['towns.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('alias')
+    )
+    op.create_index(op.f('ix_town_aliases_town_id'), 'town_aliases', ['town_id'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('town_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_town_id'), ['town_id'], unique=False)
+        batch_op.create_foreign_key('fk_users_town_id_towns', 'towns', ['town_id'], ['id'])
+
+    with op.batch_alter_table('match_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('town_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_match_requests_town_id'), ['town_id'], unique=False)
+        batch_op.create_foreign_key('fk_match_requests_town_id_towns', 'towns', ['town_id'], ['id'])
+
+    # Seed: the bundled Kenyan towns are the canonical list; users' free text is resolved against it
+    towns = sa.table('towns',
+        sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('county', sa.String),
+        sa.column('normalized_name', sa.String), sa.column('normalized_county', sa.String),
+        sa.column('created_at', sa.DateTime))
+    with open(BUNDLED_TOWNS, newline='', encoding='utf-8') as handle:
+        bundled = list(csv.DictReader(handle))
+
+    now = datetime.utcnow()
+    new_towns = {}
+    for town in bundled:
+        key = (normalize_place(town['name']), normalize_place(town['county']))
+        new_towns.setdefault(key, {
+            'name': town['name'],
+            'county': town['county'],
+            'normalized_name': key[0],
+            'normalized_county': key[1],
+            'created_at': now
+        })
+    op.bulk_insert(towns, list(new_towns.values()))
+
+    town_ids = {}
+    ids_by_name = {}
+    for row in bind.execute(sa.text('SELECT id, normalized_name, normalized_county FROM towns ORDER BY id')):
+        town_ids[(row.normalized_name, row.normalized_county)] = row.id
+        ids_by_name.setdefault(row.normalized_name, row.id)
+
+    def resolve(town, county=None):
+        # Exact town and county, else the name (or the closest name, as LocationService does); None if unknown
+        key = (normalize_place(town), normalize_place(county))
+        if key in town_ids:
+            return town_ids[key]
+        names = difflib.get_close_matches(key[0], list(ids_by_name), n=1, cutoff=0.75) if key[0] else []
+        name = key[0] if key[0] in ids_by_name else next(iter(names), None)
+        return town_ids.get((name, key[1])) or ids_by_name.get(name)
+
+    # Users whose town does not resolve keep a NULL town_id and are matched by their town text
+    users = bind.execute(sa.text('SELECT id, town, county FROM users WHERE town IS NOT NULL')).fetchall()
+    user_params = [
+        {'town_id': town_id, 'row_id': user.id}
+        for user in users
+        for town_id in [resolve(user.town, user.county)]
+        if town_id is not None
+    ]
+    if user_params:
+        bind.execute(sa.text('UPDATE users SET town_id = :town_id WHERE id = :row_id'), user_params)
+
+    requests = bind.execute(sa.text('SELECT id, preferred_town FROM match_requests')).fetchall()
+    request_params = [
+        {'town_id': town_id, 'row_id': request.id}
+        for request in requests
+        for town_id in [resolve(request.preferred_town)]
+        if town_id is not None
+    ]
+    if request_params:
+        bind.execute(sa.text('UPDATE match_requests SET town_id = :town_id WHERE id = :row_id'), request_params)
+
+
+def downgrade():
+    with op.batch_alter_table('match_requests', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_match_requests_town_id_towns', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_match_requests_town_id'))
+        batch_op.drop_column('town_id')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_users_town_id_towns', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_users_town_id'))
+        batch_op.drop_column('town_id')
+
+    op.drop_index(op.f('ix_town_aliases_town_id'), table_name='town_aliases')
+    op.drop_table('town_aliases')
+    op.drop_index('ix_towns_normalized_name_trgm', table_name='towns')
+    op.drop_table('towns')
@@ -0,0 +1,37 @@
+"""Add indexes for the conversation list on matches and chat_messages
+
+Revision ID: e8b4f2c6d019
+Revises: c5d1e8a3f274
+Create Date: 2026-10-16 22:31:09.846102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4f2c6d019'
+down_revision = 'c5d1e8a3f274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.create_index('ix_matches_requester_matched', ['requester_id', 'matched_user_id'], unique=False)
+        batch_op.create_index('ix_matches_matched_requester', ['matched_user_id', 'requester_id'], unique=False)
+
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_messages_match_created', ['match_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_chat_messages_receiver_unread', ['receiver_id', 'match_id'], unique=False,
+                              postgresql_where=sa.text('is_read = false AND is_deleted = false'))
+
+
+def downgrade():
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_messages_receiver_unread')
+        batch_op.drop_index('ix_chat_messages_match_created')
+
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.drop_index('ix_matches_matched_requester')
+        batch_op.drop_index('ix_matches_requester_matched')
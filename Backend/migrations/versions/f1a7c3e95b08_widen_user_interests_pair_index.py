@@ -0,0 +1,31 @@
+"""Extend the user_interests (interested_user_id, target_user_id) index with response
+
+Revision ID: f1a7c3e95b08
+Revises: d3f8b1c6a942
+Create Date: 2026-10-16 18:20:54.117632
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7c3e95b08'
+down_revision = 'd3f8b1c6a942'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The wider index serves every query the pair index did, so it replaces it
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.create_index('ix_user_interests_interested_target_response',
+                              ['interested_user_id', 'target_user_id', 'response'], unique=False)
+        batch_op.drop_index('ix_user_interests_interested_target')
+
+
+def downgrade():
+    with op.batch_alter_table('user_interests', schema=None) as batch_op:
+        batch_op.create_index('ix_user_interests_interested_target',
+                              ['interested_user_id', 'target_user_id'], unique=False)
+        batch_op.drop_index('ix_user_interests_interested_target_response')
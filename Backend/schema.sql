@@ -1,4 +1,145 @@
 -- Database schema for penzi
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Town gazetteer: canonical towns that users and searches resolve to
+CREATE TABLE towns (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    county VARCHAR(100),
+    normalized_name VARCHAR(100) NOT NULL,
+    normalized_county VARCHAR(100) DEFAULT '' NOT NULL,
+    latitude FLOAT,
+    longitude FLOAT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_towns_name_county UNIQUE (normalized_name, normalized_county)
+);
+
+-- Bundled gazetteer (app/data/kenya_towns.csv)
+INSERT INTO towns (name, county, normalized_name, normalized_county, latitude, longitude) VALUES
+    ('Nairobi', 'Nairobi', 'nairobi', 'nairobi', -1.2864, 36.8172),
+    ('Westlands', 'Nairobi', 'westlands', 'nairobi', -1.2676, 36.8108),
+    ('Parklands', 'Nairobi', 'parklands', 'nairobi', -1.2610, 36.8170),
+    ('Kilimani', 'Nairobi', 'kilimani', 'nairobi', -1.2900, 36.7830),
+    ('Kileleshwa', 'Nairobi', 'kileleshwa', 'nairobi', -1.2800, 36.7830),
+    ('Lavington', 'Nairobi', 'lavington', 'nairobi', -1.2780, 36.7700),
+    ('Karen', 'Nairobi', 'karen', 'nairobi', -1.3197, 36.7073),
+    ('Langata', 'Nairobi', 'langata', 'nairobi', -1.3450, 36.7620),
+    ('Kibera', 'Nairobi', 'kibera', 'nairobi', -1.3133, 36.7892),
+    ('South B', 'Nairobi', 'south b', 'nairobi', -1.3100, 36.8330),
+    ('South C', 'Nairobi', 'south c', 'nairobi', -1.3200, 36.8250),
+    ('Imara Daima', 'Nairobi', 'imara daima', 'nairobi', -1.3250, 36.8750),
+    ('Embakasi', 'Nairobi', 'embakasi', 'nairobi', -1.3190, 36.8950),
+    ('Eastleigh', 'Nairobi', 'eastleigh', 'nairobi', -1.2740, 36.8500),
+    ('Kasarani', 'Nairobi', 'kasarani', 'nairobi', -1.2219, 36.8986),
+    ('Roysambu', 'Nairobi', 'roysambu', 'nairobi', -1.2180, 36.8860),
+    ('Kahawa', 'Nairobi', 'kahawa', 'nairobi', -1.1830, 36.9230),
+    ('Githurai', 'Nairobi', 'githurai', 'nairobi', -1.2010, 36.9140),
+    ('Dagoretti', 'Nairobi', 'dagoretti', 'nairobi', -1.2930, 36.7370),
+    ('Kawangware', 'Nairobi', 'kawangware', 'nairobi', -1.2850, 36.7500),
+    ('Kiambu', 'Kiambu', 'kiambu', 'kiambu', -1.1714, 36.8356),
+    ('Thika', 'Kiambu', 'thika', 'kiambu', -1.0333, 37.0693),
+    ('Ruiru', 'Kiambu', 'ruiru', 'kiambu', -1.1460, 36.9600),
+    ('Juja', 'Kiambu', 'juja', 'kiambu', -1.1020, 37.0140),
+    ('Kikuyu', 'Kiambu', 'kikuyu', 'kiambu', -1.2460, 36.6630),
+    ('Limuru', 'Kiambu', 'limuru', 'kiambu', -1.1136, 36.6421),
+    ('Ruaka', 'Kiambu', 'ruaka', 'kiambu', -1.2050, 36.7800),
+    ('Githunguri', 'Kiambu', 'githunguri', 'kiambu', -1.0580, 36.7770),
+    ('Kitengela', 'Kajiado', 'kitengela', 'kajiado', -1.4760, 36.9620),
+    ('Ongata Rongai', 'Kajiado', 'ongata rongai', 'kajiado', -1.3960, 36.7440),
+    ('Ngong', 'Kajiado', 'ngong', 'kajiado', -1.3527, 36.6699),
+    ('Kajiado', 'Kajiado', 'kajiado', 'kajiado', -1.8520, 36.7760),
+    ('Namanga', 'Kajiado', 'namanga', 'kajiado', -2.5450, 36.7900),
+    ('Machakos', 'Machakos', 'machakos', 'machakos', -1.5177, 37.2634),
+    ('Athi River', 'Machakos', 'athi river', 'machakos', -1.4560, 36.9780),
+    ('Syokimau', 'Machakos', 'syokimau', 'machakos', -1.3600, 36.9300),
+    ('Kangundo', 'Machakos', 'kangundo', 'machakos', -1.3050, 37.3480),
+    ('Wote', 'Makueni', 'wote', 'makueni', -1.7833, 37.6333),
+    ('Emali', 'Makueni', 'emali', 'makueni', -2.0790, 37.4750),
+    ('Kitui', 'Kitui', 'kitui', 'kitui', -1.3667, 38.0106),
+    ('Mwingi', 'Kitui', 'mwingi', 'kitui', -0.9330, 38.0600),
+    ('Mombasa', 'Mombasa', 'mombasa', 'mombasa', -4.0435, 39.6682),
+    ('Nyali', 'Mombasa', 'nyali', 'mombasa', -4.0220, 39.7200),
+    ('Bamburi', 'Mombasa', 'bamburi', 'mombasa', -3.9960, 39.7200),
+    ('Likoni', 'Mombasa', 'likoni', 'mombasa', -4.0830, 39.6600),
+    ('Changamwe', 'Mombasa', 'changamwe', 'mombasa', -4.0260, 39.6310),
+    ('Kilifi', 'Kilifi', 'kilifi', 'kilifi', -3.6305, 39.8499),
+    ('Malindi', 'Kilifi', 'malindi', 'kilifi', -3.2192, 40.1169),
+    ('Mtwapa', 'Kilifi', 'mtwapa', 'kilifi', -3.9400, 39.7450),
+    ('Watamu', 'Kilifi', 'watamu', 'kilifi', -3.3540, 40.0190),
+    ('Kwale', 'Kwale', 'kwale', 'kwale', -4.1740, 39.4520),
+    ('Ukunda', 'Kwale', 'ukunda', 'kwale', -4.2870, 39.5660),
+    ('Diani', 'Kwale', 'diani', 'kwale', -4.3170, 39.5750),
+    ('Voi', 'Taita Taveta', 'voi', 'taita taveta', -3.3961, 38.5561),
+    ('Wundanyi', 'Taita Taveta', 'wundanyi', 'taita taveta', -3.4000, 38.3667),
+    ('Taveta', 'Taita Taveta', 'taveta', 'taita taveta', -3.4000, 37.6830),
+    ('Lamu', 'Lamu', 'lamu', 'lamu', -2.2717, 40.9020),
+    ('Hola', 'Tana River', 'hola', 'tana river', -1.5000, 40.0300),
+    ('Garissa', 'Garissa', 'garissa', 'garissa', -0.4532, 39.6461),
+    ('Wajir', 'Wajir', 'wajir', 'wajir', 1.7471, 40.0573),
+    ('Mandera', 'Mandera', 'mandera', 'mandera', 3.9366, 41.8670),
+    ('Marsabit', 'Marsabit', 'marsabit', 'marsabit', 2.3284, 37.9899),
+    ('Moyale', 'Marsabit', 'moyale', 'marsabit', 3.5167, 39.0584),
+    ('Isiolo', 'Isiolo', 'isiolo', 'isiolo', 0.3546, 37.5822),
+    ('Meru', 'Meru', 'meru', 'meru', 0.0470, 37.6490),
+    ('Maua', 'Meru', 'maua', 'meru', 0.2330, 37.9400),
+    ('Chuka', 'Tharaka Nithi', 'chuka', 'tharaka nithi', -0.3333, 37.6500),
+    ('Embu', 'Embu', 'embu', 'embu', -0.5310, 37.4500),
+    ('Runyenjes', 'Embu', 'runyenjes', 'embu', -0.4220, 37.5730),
+    ('Kerugoya', 'Kirinyaga', 'kerugoya', 'kirinyaga', -0.4989, 37.2803),
+    ('Kutus', 'Kirinyaga', 'kutus', 'kirinyaga', -0.5650, 37.3270),
+    ('Murang''a', 'Murang''a', 'murang a', 'murang a', -0.7210, 37.1526),
+    ('Kenol', 'Murang''a', 'kenol', 'murang a', -0.8900, 37.1300),
+    ('Nyeri', 'Nyeri', 'nyeri', 'nyeri', -0.4201, 36.9476),
+    ('Karatina', 'Nyeri', 'karatina', 'nyeri', -0.4830, 37.1280),
+    ('Othaya', 'Nyeri', 'othaya', 'nyeri', -0.5500, 36.9500),
+    ('Nanyuki', 'Laikipia', 'nanyuki', 'laikipia', 0.0167, 37.0667),
+    ('Nyahururu', 'Laikipia', 'nyahururu', 'laikipia', 0.0380, 36.3640),
+    ('Ol Kalou', 'Nyandarua', 'ol kalou', 'nyandarua', -0.2700, 36.3800),
+    ('Nakuru', 'Nakuru', 'nakuru', 'nakuru', -0.3031, 36.0800),
+    ('Naivasha', 'Nakuru', 'naivasha', 'nakuru', -0.7167, 36.4333),
+    ('Gilgil', 'Nakuru', 'gilgil', 'nakuru', -0.4990, 36.3190),
+    ('Molo', 'Nakuru', 'molo', 'nakuru', -0.2490, 35.7320),
+    ('Njoro', 'Nakuru', 'njoro', 'nakuru', -0.3300, 35.9440),
+    ('Narok', 'Narok', 'narok', 'narok', -1.0780, 35.8600),
+    ('Kilgoris', 'Narok', 'kilgoris', 'narok', -1.0040, 34.8760),
+    ('Bomet', 'Bomet', 'bomet', 'bomet', -0.7820, 35.3420),
+    ('Kericho', 'Kericho', 'kericho', 'kericho', -0.3677, 35.2831),
+    ('Litein', 'Kericho', 'litein', 'kericho', -0.5830, 35.1900),
+    ('Eldoret', 'Uasin Gishu', 'eldoret', 'uasin gishu', 0.5143, 35.2698),
+    ('Iten', 'Elgeyo Marakwet', 'iten', 'elgeyo marakwet', 0.6703, 35.5081),
+    ('Kapsabet', 'Nandi', 'kapsabet', 'nandi', 0.2039, 35.1050),
+    ('Kabarnet', 'Baringo', 'kabarnet', 'baringo', 0.4919, 35.7430),
+    ('Eldama Ravine', 'Baringo', 'eldama ravine', 'baringo', 0.0500, 35.7200),
+    ('Maralal', 'Samburu', 'maralal', 'samburu', 1.0968, 36.6980),
+    ('Kitale', 'Trans Nzoia', 'kitale', 'trans nzoia', 1.0157, 35.0062),
+    ('Kapenguria', 'West Pokot', 'kapenguria', 'west pokot', 1.2389, 35.1119),
+    ('Lodwar', 'Turkana', 'lodwar', 'turkana', 3.1191, 35.5973),
+    ('Kakamega', 'Kakamega', 'kakamega', 'kakamega', 0.2827, 34.7519),
+    ('Mumias', 'Kakamega', 'mumias', 'kakamega', 0.3350, 34.4880),
+    ('Bungoma', 'Bungoma', 'bungoma', 'bungoma', 0.5635, 34.5606),
+    ('Webuye', 'Bungoma', 'webuye', 'bungoma', 0.6070, 34.7700),
+    ('Busia', 'Busia', 'busia', 'busia', 0.4608, 34.1115),
+    ('Malaba', 'Busia', 'malaba', 'busia', 0.6350, 34.2810),
+    ('Mbale', 'Vihiga', 'mbale', 'vihiga', 0.0800, 34.7200),
+    ('Kisumu', 'Kisumu', 'kisumu', 'kisumu', -0.0917, 34.7680),
+    ('Ahero', 'Kisumu', 'ahero', 'kisumu', -0.1740, 34.9190),
+    ('Siaya', 'Siaya', 'siaya', 'siaya', 0.0607, 34.2881),
+    ('Bondo', 'Siaya', 'bondo', 'siaya', -0.1000, 34.2700),
+    ('Homa Bay', 'Homa Bay', 'homa bay', 'homa bay', -0.5273, 34.4571),
+    ('Mbita', 'Homa Bay', 'mbita', 'homa bay', -0.4330, 34.2080),
+    ('Migori', 'Migori', 'migori', 'migori', -1.0634, 34.4731),
+    ('Awendo', 'Migori', 'awendo', 'migori', -0.9030, 34.5320),
+    ('Kisii', 'Kisii', 'kisii', 'kisii', -0.6817, 34.7667),
+    ('Nyamira', 'Nyamira', 'nyamira', 'nyamira', -0.5633, 34.9358),
+    ('Keroka', 'Nyamira', 'keroka', 'nyamira', -0.7760, 34.9460);
+
+-- Alternative spellings of a town
+CREATE TABLE town_aliases (
+    id SERIAL PRIMARY KEY,
+    alias VARCHAR(100) UNIQUE NOT NULL,
+    town_id INTEGER NOT NULL REFERENCES towns(id) ON DELETE CASCADE
+);
+
 -- Users table 
 CREATE TABLE users (
     id SERIAL PRIMARY KEY,
@@ -8,6 +149,7 @@ CREATE TABLE users (
     gender VARCHAR(10) NOT NULL CHECK (gender IN ('Male', 'Female')),
     county VARCHAR(100) NOT NULL,
     town VARCHAR(100) NOT NULL,
+    town_id INTEGER REFERENCES towns(id),
     -- Additional details 
     level_of_education VARCHAR(100),
     profession VARCHAR(100),
@@ -20,7 +162,8 @@ CREATE TABLE users (
         registration_stage IN ('initial', 'details_pending', 'description_pending', 'completed')
     ),
     is_active BOOLEAN DEFAULT true,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Match search requests
@@ -30,8 +173,10 @@ CREATE TABLE match_requests (
     age_min INTEGER NOT NULL,
     age_max INTEGER NOT NULL,
     preferred_town VARCHAR(100) NOT NULL,
-    total_matches_found INTEGER DEFAULT 0,
-    current_position INTEGER DEFAULT 0, -- For NEXT command
+    town_id INTEGER REFERENCES towns(id),
+    candidate_ids BYTEA, -- ranked candidate snapshot, materialized into matches as they are sent
+    total_matches_found INTEGER DEFAULT 0 NOT NULL,
+    current_position INTEGER DEFAULT 0 NOT NULL, -- For NEXT command
     status VARCHAR(20) DEFAULT 'active' CHECK (status IN ('active', 'completed')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -52,15 +197,44 @@ CREATE TABLE user_interests (
     id SERIAL PRIMARY KEY,
     interested_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     target_user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    interest_type VARCHAR(20) DEFAULT 'details' CHECK (interest_type IN ('details', 'describe')),
+    interest_type VARCHAR(20) DEFAULT 'details' CHECK (interest_type IN ('details', 'describe', 'paid_match')),
     -- Target user notification and response
     notification_sent BOOLEAN DEFAULT false, -- "Hi Maria, Jamal is interested..."
+    notification_sent_at TIMESTAMP,
     response_received BOOLEAN DEFAULT false,
     response VARCHAR(10) CHECK (response IN ('YES', 'NO', NULL)),
     response_at TIMESTAMP,
     -- Feedback to requester
     feedback_sent BOOLEAN DEFAULT false,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    expired_notification_sent BOOLEAN DEFAULT false NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL, -- unanswered interests expire after UserInterest.TTL_HOURS
+    payment_transaction_id INTEGER, -- paid_match interests; foreign key added after payment_transactions
+    superseded_at TIMESTAMP -- older duplicates of a pair, kept as history
+);
+
+-- Precomputed ranked candidates per user, kept fresh by the deck builder
+CREATE TABLE recommendation_decks (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    age_min INTEGER NOT NULL,
+    age_max INTEGER NOT NULL,
+    town_key VARCHAR(100) NOT NULL,
+    town_id INTEGER,
+    candidate_keys BYTEA NOT NULL,
+    total_candidates INTEGER NOT NULL,
+    is_stale BOOLEAN DEFAULT false NOT NULL,
+    built_at TIMESTAMP NOT NULL
+);
+
+-- Bloom filter of profiles already shown to each user
+CREATE TABLE user_seen_sets (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    bits BYTEA NOT NULL,
+    num_hashes INTEGER NOT NULL,
+    capacity INTEGER NOT NULL,
+    item_count INTEGER NOT NULL,
+    reset_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL
 );
 
 -- All SMS messages in the system
@@ -71,9 +245,18 @@ CREATE TABLE sms_messages (
     message_body TEXT NOT NULL,
     direction VARCHAR(10) NOT NULL CHECK (direction IN ('incoming', 'outgoing')),
     message_type VARCHAR(50), -- 'activation', 'registration', 'match_request', 'interest', etc.
-    status VARCHAR(20) DEFAULT 'processed' CHECK (status IN ('pending', 'processed', 'sent', 'failed')),
+    status VARCHAR(20) DEFAULT 'processed' CHECK (status IN ('pending', 'sending', 'processed', 'sent', 'failed')),
     related_user_id INTEGER REFERENCES users(id),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Outbound dispatch queue
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    next_attempt_at TIMESTAMP, -- retry time for 'pending', lease expiry for 'sending'
+    sent_at TIMESTAMP,
+    last_error TEXT,
+    -- Inbound retry deduplication
+    gateway_message_id VARCHAR(100),
+    response_body TEXT, -- reply replayed to gateway retries
+    claimed_at TIMESTAMP
 );
 
 -- User photos table
@@ -137,17 +320,37 @@ CREATE TABLE payment_transactions (
     expires_at TIMESTAMP
 );
 
+ALTER TABLE user_interests ADD FOREIGN KEY (payment_transaction_id) REFERENCES payment_transactions(id);
+
 -- INDEXES for performance optimization
 CREATE INDEX idx_users_phone ON users(phone_number);
 CREATE INDEX idx_users_location ON users(county, town, gender);
 CREATE INDEX idx_users_age_gender ON users(age, gender, is_active);
+CREATE INDEX ix_users_town_id ON users(town_id);
+CREATE INDEX ix_users_updated_at ON users(updated_at);
 CREATE INDEX idx_match_requests_user ON match_requests(user_id, status);
+CREATE INDEX ix_match_requests_town_id ON match_requests(town_id);
+CREATE INDEX ix_towns_normalized_name_trgm ON towns USING gin (normalized_name gin_trgm_ops);
+CREATE INDEX ix_town_aliases_town_id ON town_aliases(town_id);
+CREATE INDEX ix_recommendation_decks_criteria ON recommendation_decks(town_id, age_min, age_max);
 CREATE INDEX idx_matches_request ON matches(request_id, position);
+CREATE INDEX ix_matches_requester_matched ON matches(requester_id, matched_user_id);
+CREATE INDEX ix_matches_matched_requester ON matches(matched_user_id, requester_id);
 CREATE INDEX idx_user_interests_target ON user_interests(target_user_id, notification_sent);
+CREATE INDEX ix_user_interests_pending_expiry ON user_interests(expires_at)
+    WHERE response_received = false AND expired_notification_sent = false;
+CREATE INDEX ix_user_interests_interested_target_response ON user_interests(interested_user_id, target_user_id, response);
+CREATE UNIQUE INDEX ix_user_interests_current_pair ON user_interests(interested_user_id, target_user_id)
+    WHERE superseded_at IS NULL;
 CREATE INDEX idx_sms_messages_phone ON sms_messages(to_phone, from_phone);
+CREATE INDEX ix_sms_messages_dispatch_queue ON sms_messages(status, next_attempt_at)
+    WHERE status IN ('pending', 'sending');
+CREATE UNIQUE INDEX ix_sms_messages_gateway_message_id ON sms_messages(gateway_message_id);
 
 -- Additional indexes for new tables
 CREATE INDEX idx_user_photos_user ON user_photos(user_id, is_deleted);
 CREATE INDEX idx_user_photos_primary ON user_photos(user_id, is_primary);
 CREATE INDEX idx_chat_messages_match ON chat_messages(match_id, created_at);
+CREATE INDEX ix_chat_messages_receiver_unread ON chat_messages(receiver_id, match_id)
+    WHERE is_read = false AND is_deleted = false;
 CREATE INDEX idx_payment_transactions_user ON payment_transactions(user_id, payment_status);
\ No newline at end of file
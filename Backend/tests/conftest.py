@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# Must be set before the app is imported: create_app reads it once
+_DB_DIR = tempfile.mkdtemp(prefix='penzi-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def statements(app_context):
+    """SQL statements (statement, parameters) executed while the test runs"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
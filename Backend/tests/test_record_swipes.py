@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.userInterestModel import UserInterest
+from app.models.userModel import Gender, User
+from app.services.matchService import MatchService
+from app.services.mutualMatchService import MutualMatchService
+
+
+def _users(count, first):
+    users = [User(phone_number=f'+2547127{i:05d}', name=f'Swiper {i}', age=25,
+                  gender=Gender.MALE if i == first else Gender.FEMALE, town='Nairobi')
+             for i in range(first, first + count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def _interest(interested_user_id, target_user_id, response=None, days_ago=3):
+    interest = UserInterest(interested_user_id, target_user_id, 'details')
+    interest.created_at = datetime.utcnow() - timedelta(days=days_ago)
+    interest.expires_at = interest.created_at + timedelta(hours=UserInterest.TTL_HOURS)
+    interest.notification_sent = True
+    if response:
+        interest.record_response(response)
+    db.session.add(interest)
+    db.session.commit()
+    return interest
+
+
+def test_swipes_insert_new_pairs_and_renew_unanswered_ones(app_context):
+    user_id, expired_id, new_id = _users(3, 0)
+
+    # An earlier like that nobody answered and that has long expired
+    interest = _interest(user_id, expired_id)
+
+    started = datetime.utcnow()
+    MatchService.record_swipes(user_id, {expired_id: 'pass', new_id: 'like'})
+    MatchService.record_swipes(user_id, {new_id: 'like'})
+    db.session.expire_all()
+
+    interests = {row.target_user_id: row for row in UserInterest.query.filter_by(interested_user_id=user_id)}
+    assert sorted(interests) == sorted([expired_id, new_id])
+
+    renewed = interests[expired_id]
+    assert renewed.id == interest.id
+    assert renewed.interest_type == 'describe'
+    assert renewed.created_at >= started
+    assert renewed.expires_at >= started + timedelta(hours=UserInterest.TTL_HOURS)
+    assert not renewed.notification_sent and not renewed.response_received
+
+    assert interests[new_id].interest_type == 'details'
+
+
+def test_yes_survives_a_reswipe_and_a_redescribe(app_context):
+    user_id, target_id = _users(2, 10)
+
+    # Both said YES to each other's interest
+    interest = _interest(user_id, target_id, 'YES')
+    _interest(target_id, user_id, 'YES')
+    answered_at, created_at = interest.response_at, interest.created_at
+
+    result = MatchService.record_swipes(user_id, {target_id: 'like'})
+    assert result['mutual'] == [target_id]
+    UserInterest.renew(user_id, target_id, 'describe')
+    db.session.commit()
+    db.session.expire_all()
+
+    kept = UserInterest.query.filter_by(interested_user_id=user_id, target_user_id=target_id).one()
+    assert kept.interest_type == 'describe'
+    assert kept.response_received and kept.response == 'YES'
+    assert kept.response_at == answered_at and kept.created_at == created_at
+
+    matches, _ = MutualMatchService.get_mutual_matches(user_id)
+    assert [match['user_id'] for match in matches] == [target_id]
@@ -0,0 +1,35 @@
+from app.services.smsMessagesService import SmsService
+
+SENDER = '0712800001'
+
+LADIES = [
+    ('0712800002', 'start#Amina Otieno#24#Female#Kisumu#Kisumu'),
+    ('0712800003', 'start#Beth Achieng#25#Female#Kisumu#Kisumu'),
+    ('0712800004', 'start#Cate Atieno#40#Female#Kisumu#Kisumu'),
+]
+
+
+def _register(service, phone, start):
+    for body in ('PENZI', start, 'details#Graduate#IT#Single#Christian#Luo', 'MYSELF kind'):
+        service.process_incoming_sms(phone, body)
+
+
+def _reply(service, body):
+    return service.process_incoming_sms(SENDER, body)['message']
+
+
+def test_count_and_no_match_reply_leave_out_profiles_already_sent(app_context):
+    service = SmsService()
+    for phone, start in LADIES:
+        _register(service, phone, start)
+    _register(service, SENDER, 'start#Otieno Omondi#30#Male#Kisumu#Kisumu')
+
+    assert _reply(service, 'count#20-30#Kisumu').startswith('2 ladies aged 20-30 in Kisumu.')
+
+    _reply(service, 'match#20-30#Kisumu')
+    assert _reply(service, 'count#20-30#Kisumu') == (
+        'You have already been sent all 2 ladies aged 20-30 in Kisumu. '
+        'Nearest: 1 aged 30-40. Send match#30-40#Kisumu to see them.')
+    assert _reply(service, 'count#18-50#Kisumu').startswith(
+        '1 ladies aged 18-50 in Kisumu (2 already sent to you).')
+    assert _reply(service, 'match#20-30#Kisumu').endswith('Try match#30-40#Kisumu (1 new).')
@@ -0,0 +1,24 @@
+from app.extensions import db
+from app.models.matchModel import Match
+from app.models.userInterestModel import UserInterest
+from app.models.userModel import Gender, User
+from app.services.seenSetService import seen_sets
+from app.utils.bloom import BloomFilter
+
+
+def test_unseen_drops_only_hits_confirmed_by_history(app_context, monkeypatch):
+    users = [User(phone_number=f'07129000{i:02d}', name=f'Seen {i}', age=30, gender=Gender.FEMALE, town='Kitui')
+             for i in range(4)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_id, sent_id, liked_id, never_id = [user.id for user in users]
+
+    match = Match(user_id, sent_id)
+    match.is_sent = True
+    db.session.add_all([match, UserInterest(user_id, liked_id)])
+    db.session.commit()
+
+    # Every profile tests as seen: the never-shown one is a false positive
+    monkeypatch.setattr(BloomFilter, 'contains_many', lambda self, ids: [True] * len(ids))
+
+    assert seen_sets.unseen(user_id, [never_id, sent_id, liked_id]) == [never_id]
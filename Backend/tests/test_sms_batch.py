@@ -0,0 +1,81 @@
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+from app.models.userModel import Gender, User
+from app.services.smsBatchService import SmsBatchService
+from app.services.smsMessagesService import SmsService
+from app.services.userEvents import user_events
+
+PHONES = ['0712400001', '0712400002']
+START = 'start#Batch Tester#24#Female#Nairobi#Nairobi'
+
+
+def _message(phone, body):
+    return {'from_phone': phone, 'to_phone': '22141', 'message_body': body, 'direction': 'incoming'}
+
+
+def test_each_group_commits_once_and_failed_messages_roll_back_alone(app_context, monkeypatch):
+    process_incoming_sms = SmsService.process_incoming_sms
+
+    def process(self, from_phone, message_body, context=None):
+        if message_body == 'BOOM':
+            db.session.add(SmsMessage(from_phone=from_phone, to_phone='22141', message_body='BOOM',
+                                      direction='incoming', status='processed'))
+            db.session.flush()
+            raise RuntimeError('boom')
+        return process_incoming_sms(self, from_phone, message_body, context)
+
+    monkeypatch.setattr(SmsService, 'process_incoming_sms', process)
+
+    messages = []
+    for phone in PHONES:
+        messages += [_message(phone, 'PENZI'), _message(phone, 'BOOM'), _message(phone, START)]
+
+    commits = []
+    listener = lambda conn: commits.append(conn)  # noqa: E731
+    event.listen(db.engine, 'commit', listener)
+    try:
+        results = SmsBatchService(max_workers=1).process_batch(messages)
+    finally:
+        event.remove(db.engine, 'commit', listener)
+
+    assert [result['status'] for result in results] == ['processed', 'sms_service_exception', 'processed'] * 2
+    assert len(commits) == len(PHONES)
+    assert db.session.query(SmsMessage).filter(SmsMessage.message_body == 'BOOM').count() == 0
+    # Writes before and after the failed message were kept
+    assert db.session.query(SmsMessage).filter(
+        SmsMessage.direction == 'incoming', SmsMessage.message_body == START).count() == len(PHONES)
+
+
+def test_failed_message_changes_are_not_published(app_context, monkeypatch):
+    process_incoming_sms = SmsService.process_incoming_sms
+
+    def process(self, from_phone, message_body, context=None):
+        if message_body == 'GHOST':
+            # Commits (releasing its savepoint) like a handler would, then fails
+            db.session.add(User(phone_number='0712400099', name='Ghost', age=30, gender=Gender.MALE))
+            db.session.commit()
+            published_early.extend(published)
+            db.session.add(User(phone_number='0712400098', name='Ghost 2', age=30, gender=Gender.MALE))
+            db.session.flush()
+            raise RuntimeError('ghost')
+        return process_incoming_sms(self, from_phone, message_body, context)
+
+    monkeypatch.setattr(SmsService, 'process_incoming_sms', process)
+
+    published, published_early = [], []
+    user_events.subscribe(published.append)
+    try:
+        results = SmsBatchService(max_workers=1).process_batch(
+            [_message('0712400003', 'PENZI'), _message('0712400003', 'GHOST')])
+    finally:
+        user_events.unsubscribe(published.append)
+
+    assert [result['status'] for result in results] == ['processed', 'sms_service_exception']
+    # Nothing is published before the group's real commit
+    assert published_early == []
+    phones = {change.after.get('phone_number') for change in published if change.after}
+    # The write before the failure was committed with the group; the rolled-back one never happened
+    assert '0712400099' in phones and '0712400098' not in phones
+    assert db.session.query(User).filter(User.phone_number == '0712400098').count() == 0
@@ -0,0 +1,52 @@
+from app.services.smsMessagesService import SmsService
+
+SENDER = '0712300001'
+SENDER_FORMATS = ('+254712300001', '254712300001')
+
+OTHERS = [
+    ('0712300002', 'start#Jane Doe#24#Female#Nairobi#Nairobi'),
+    ('0712300003', 'start#Mary Ann#26#Female#Nairobi#Nairobi'),
+]
+
+# Every command of the registration and matching flow, in the order a user sends them
+COMMANDS = [
+    'PENZI',
+    'start#John Kamau#27#Male#Nairobi#Nairobi',
+    'details#Graduate#IT#Single#Christian#Kikuyu',
+    'MYSELF tall and kind',
+    'IMAGES',
+    'count#20-30#Nairobi',
+    'match#20-30#Nairobi',
+    'NEXT',
+    'DESCRIBE 0712300002',
+    'STATS',
+    'HISTORY',
+    'blah',
+    'STOP',
+]
+
+
+def _register(service, phone, start):
+    for body in ('PENZI', start, 'details#Graduate#IT#Single#Christian#Kikuyu', 'MYSELF kind'):
+        service.process_incoming_sms(phone, body)
+
+
+def _sender_lookups(statements):
+    """SELECTs on users filtered by the sender's phone number"""
+    return [
+        statement for statement, parameters in statements
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM users' in statement
+        and 'phone_number' in statement
+        and any(phone in str(parameters) for phone in SENDER_FORMATS)
+    ]
+
+
+def test_each_sms_looks_up_its_sender_once(app_context, statements):
+    service = SmsService()
+    for phone, start in OTHERS:
+        _register(service, phone, start)
+
+    for body in COMMANDS:
+        statements.clear()
+        service.process_incoming_sms(SENDER, body)
+        assert len(_sender_lookups(statements)) == 1, body
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.smsMessagesModel import SmsMessage
+from app.services.smsDedupService import sms_deduplicator
+
+
+def _claim(gateway_message_id):
+    return sms_deduplicator.claim(gateway_message_id, '0712500001', '22141', 'STATS')
+
+
+def test_expired_claim_is_taken_over_once(app_context):
+    assert _claim('gw-lease-1') is None
+    assert _claim('gw-lease-1').status_code == 202
+
+    # The first holder died before storing a reply
+    expired = datetime.utcnow() - timedelta(seconds=sms_deduplicator.claim_lease_s + 1)
+    db.session.query(SmsMessage).filter(SmsMessage.gateway_message_id == 'gw-lease-1').update(
+        {SmsMessage.claimed_at: expired})
+    db.session.commit()
+
+    assert _claim('gw-lease-1') is None
+    assert _claim('gw-lease-1').status_code == 202
+
+    sms_deduplicator.record('gw-lease-1', {'success': True}, 200)
+    assert _claim('gw-lease-1') == ({'success': True}, 200)
@@ -0,0 +1,29 @@
+from app.extensions import db
+from app.models.userModel import Gender, User
+from app.models.userPhotoModel import UserPhoto
+
+
+def _deck(size, offset):
+    users = [User(phone_number=f'+2547126{offset + i:05d}', name=f'Swipe User {i}', age=25,
+                  gender=Gender.FEMALE, town='Nairobi', county='Nairobi') for i in range(size)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all(UserPhoto(user.id, f'https://photos.example/{user.id}/{order}.jpg',
+                                 is_primary=order == 1, upload_order=order)
+                       for user in users for order in (1, 2))
+    db.session.commit()
+    # Loaded up front so only the profile building is measured
+    return User.query.filter(User.id.in_([user.id for user in users])).all()
+
+
+def test_swipe_profiles_query_count_does_not_grow_with_deck_size(app_context, statements):
+    counts = []
+    for size, offset in ((1, 0), (20, 100)):
+        deck = _deck(size, offset)
+        statements.clear()
+        profiles = User.to_swipe_profiles(deck)
+        counts.append(len(statements))
+        assert len(profiles) == size
+        assert all(len(profile['photos']) == 2 for profile in profiles)
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,51 @@
+from app.extensions import db
+from app.models.townModel import Town
+from app.models.userModel import Gender, RegistrationStage, User
+from app.services.candidateIndexService import candidate_index
+from app.services.demographicsService import demographic_histogram
+from app.services.locationService import location_service
+from app.utils.gazetteer import load_bundled_towns
+
+
+def _seed_gazetteer():
+    if not Town.query.count():
+        db.session.add_all(Town(name, county) for name, county, _, _ in load_bundled_towns())
+        db.session.commit()
+    location_service.reload()
+
+
+def _register(phone, town, county=None):
+    user = User(phone_number=phone, name=f'Resident of {town}', age=61, gender=Gender.FEMALE, town=town,
+                county=county, registration_stage=RegistrationStage.COMPLETED)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_user_towns_resolve_to_the_gazetteer_without_adding_towns(app_context):
+    _seed_gazetteer()
+    towns = Town.query.count()
+    nairobi = location_service.resolve_one('Nairobi')
+
+    misspelt = _register('0712500001', 'Nairobii')
+    unknown = _register('0712500002', 'Kwa Mwangi Village')
+
+    assert misspelt.town_id == nairobi
+    assert unknown.town_id is None
+    assert Town.query.count() == towns
+
+
+def test_searches_keep_substring_recall_for_unresolved_towns(app_context):
+    _seed_gazetteer()
+    nairobi = _register('0712500011', 'Nairobi')
+    # Not in the gazetteer: left unplaced and found by its town text
+    west = _register('0712500012', 'Nairobi West')
+    kisumu = _register('0712500013', 'Kisumu')
+    assert west.town_id is None
+
+    found = candidate_index.search(Gender.FEMALE, 61, 61, 'Nairobi')
+    assert nairobi.id in found and west.id in found and kisumu.id not in found
+    assert demographic_histogram.count(Gender.FEMALE, 61, 61, 'Nairobi') == len(found)
+
+    assert nairobi.id in candidate_index.search(Gender.FEMALE, 61, 61, 'nairobbi')
+    assert candidate_index.search(Gender.FEMALE, 61, 61, 'west') == [west.id]